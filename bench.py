@@ -0,0 +1,220 @@
+"""
+bench.py times loading the library on synthetic music libraries so runs can be compared across commits.
+
+    python bench.py --sizes 1000 10000 100000 --output bench.json
+
+Libraries are generated with mutagen (the same size and seed always give the same files) and kept in --cache for later
+runs: tiny silent MP3s and WAVs with ID3 tags, covers on about half the albums, '/' separated artists and missing fields.
+Every size runs in a scratch working directory, so the real index, art cache and preferences are never touched. The
+track list is timed on stub widgets so it's measured without a display, and in a hidden window too where there is one
+"""
+import argparse, contextlib, io, json, os, platform, random, shutil, subprocess, sys, tempfile, time, wave
+import pathlib as pl
+from mutagen.id3 import ID3, APIC, TALB, TCON, TDRC, TIT2, TPE1, TPE2, TRCK
+from mutagen.wave import WAVE
+from PIL import Image
+
+REPO = pl.Path(__file__).resolve().parent
+sys.path.insert(0, str(REPO))
+WORDS = ("night", "blue", "river", "echo", "glass", "paper", "summer", "ghost", "electric", "velvet", "café", "north",
+         "golden", "static", "wild", "young", "hollow", "neon", "silver", "Björk", "crystal", "ocean", "fire", "dust")
+GENRES = ("Rock", "Pop", "Jazz", "Electronic", "Hip-Hop", "Classical", "Folk")
+FRAME = b'\xff\xfb\x90\x64' + bytes(413) # one silent MPEG-1 layer III frame
+
+def phrase(rng: random.Random, lo:int = 1, hi:int = 3) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(lo, hi))).title()
+
+def generate(directory: pl.Path, tracks: int, seed:int = 0, wavs:float = 0.1, art:float = 0.5) -> None:
+    rng = random.Random(seed)
+    covers = list()
+    for c in range(64):
+        data = io.BytesIO()
+        Image.new('RGB', (96, 96), (c*4, 255 - c*4, (c*37) % 256)).save(data, 'JPEG')
+        covers.append(data.getvalue())
+    artists = [f"{phrase(rng)} {i}" for i in range(max(10, tracks//50))]
+    albums = [(rng.choice(artists), f"{phrase(rng)} {i}", rng.random() < art) for i in range(max(1, tracks//10))]
+    for i in range(tracks):
+        artist, album, has_art = albums[a := i % len(albums)]
+        number = i // len(albums) + 1
+        title = phrase(rng, 1, 4)
+        folder = directory/artist/album
+        folder.mkdir(parents=True, exist_ok=True)
+        tags = ID3()
+        tags.add(TIT2(encoding=3, text=title))
+        tags.add(TPE1(encoding=3, text=artist + (f"/{rng.choice(artists)}" if rng.random() < 0.1 else "")))
+        if rng.random() < 0.7: tags.add(TPE2(encoding=3, text=artist))
+        if rng.random() < 0.9: tags.add(TALB(encoding=3, text=album))
+        if (r := rng.random()) < 0.5: tags.add(TRCK(encoding=3, text=str(number)))
+        elif r < 0.95: tags.add(TRCK(encoding=3, text=f"{number}/{tracks//len(albums) + 1}"))
+        tags.add(TCON(encoding=3, text=rng.choice(GENRES)))
+        tags.add(TDRC(encoding=3, text=str(rng.randint(1960, 2024))))
+        if has_art: tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='', data=covers[a % len(covers)]))
+        if rng.random() < wavs:
+            path = folder/f"{number:03d} {title}.wav"
+            with wave.open(str(path), 'wb') as w:
+                w.setnchannels(1); w.setsampwidth(2); w.setframerate(8000)
+                w.writeframes(bytes(800))
+            audio = WAVE(path)
+            audio.add_tags()
+            for frame in tags.values(): audio.tags.add(frame)
+            audio.save()
+        else:
+            path = folder/f"{number:03d} {title}.mp3"
+            path.write_bytes(FRAME*8)
+            tags.save(path)
+
+def workspace(library: pl.Path) -> pl.Path:
+    """Scratch working directory with preferences pointing at library"""
+    ws = pl.Path(tempfile.mkdtemp(prefix="bench-"))
+    (ws/"data").mkdir()
+    (ws/"assets/img/albums").mkdir(parents=True)
+    shutil.copy(REPO/"data/reference.json", ws/"data")
+    shutil.copy(REPO/"assets/img/albums/default.png", ws/"assets/img/albums")
+    with open(REPO/"data/preferences.json", "r") as f: prefs = json.load(f)
+    prefs.update({'music_directories': [str(library)], 'extensions': [".mp3", ".wav"]})
+    with open(ws/"data/preferences.json", "w") as f: json.dump(prefs, f)
+    return ws
+
+@contextlib.contextmanager
+def timed(results: dict, name: str):
+    start = time.perf_counter()
+    yield
+    results[name] = round(time.perf_counter() - start, 4)
+
+def best(fn, repeat: int) -> float:
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return round(min(times), 4)
+
+def sort_all(store) -> None:
+    """Sorts a store by every column from scratch"""
+    from data_sort import SortIndex
+    sorts = SortIndex()
+    for row in range(len(store)): sorts.add(row, store.record(row))
+    sorts.merge()
+
+class StubWidget:
+    """Stands in for the Treeview and scrollbar so the track list's own work can be timed without a display. Items are
+    kept like a Treeview keeps them, every other call does nothing"""
+    def __init__(self, *args, **kwargs):
+        self.items: dict[str, dict] = dict()
+        self.selected: tuple[str, ...] = ()
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+    def lookup(self, *args) -> str:
+        return "20"
+    def get_children(self) -> tuple[str, ...]:
+        return tuple(self.items)
+    def insert(self, parent: str, index: str, iid: str) -> None:
+        self.items[iid] = dict()
+    def delete(self, *iids: str) -> None:
+        for iid in iids: del self.items[iid]
+    def item(self, iid: str, **options) -> None:
+        self.items[iid] = options
+    def selection_set(self, iid: str) -> None:
+        self.selected = (iid,)
+    def selection(self) -> tuple[str, ...]:
+        return self.selected
+    def selection_remove(self, *iids: str) -> None:
+        self.selected = ()
+
+def fill(df, order) -> float:
+    """Time to fill the track list and scroll through it, on stub widgets so it runs headless"""
+    from types import SimpleNamespace
+    from unittest import mock
+    import tracklist
+    stub = SimpleNamespace(Style=StubWidget, Scrollbar=StubWidget, Treeview=StubWidget, Frame=StubWidget)
+    with mock.patch.object(tracklist, 'ttk', stub):
+        start = time.perf_counter()
+        tracks = tracklist.TrackList(stub.Frame())
+        tracks.set_data(df, order)
+        tracks.select(0)
+        for _ in range(100): tracks.scroll(tracks.visible) # a page at a time, like holding Page Down
+        return round(time.perf_counter() - start, 4)
+
+def fill_tk(df, order) -> float|None:
+    """Time to fill the track list in a hidden window, None without a display"""
+    import tkinter as tk
+    from tkinter import ttk
+    import tracklist
+    try: root = tk.Tk()
+    except tk.TclError: return None
+    try:
+        root.withdraw()
+        start = time.perf_counter()
+        tracks = tracklist.TrackList(ttk.Frame(root))
+        tracks.set_data(df, order)
+        tracks.select(0)
+        root.update_idletasks()
+        return round(time.perf_counter() - start, 4)
+    finally: root.destroy()
+
+def run(size: int, args) -> dict:
+    import data_easy, data_processing, metrics
+    results = {'tracks': size}
+    library = args.cache/f"{size}-{args.seed}"
+    if not (library/".complete").exists():
+        shutil.rmtree(library, ignore_errors=True)
+        with timed(results, 'generate_s'): generate(library, size, args.seed)
+        (library/".complete").touch()
+    ws, cwd = workspace(library), os.getcwd()
+    metrics.reset()
+    os.chdir(ws)
+    try:
+        with timed(results, 'library_cold_s'): lib = data_easy.Library()
+        lib.cancel()
+        lib.save()
+        lib.index.close()
+        snapshot = pl.Path(lib.index.snapshot)
+        snapshot.rename(hidden := snapshot.with_suffix('.hidden'))
+        with timed(results, 'library_index_s'): data_easy.Library(scan=False).index.close() # without the snapshot
+        hidden.rename(snapshot)
+        with timed(results, 'library_warm_s'): lib = data_easy.Library(scan=False) # restored from the snapshot
+        with timed(results, 'library_check_s'): lib.update_library() # compared with the disk, in the background in the player
+        lib.cancel()
+        results['found'] = len(lib.store)
+        results['tracks_df_s'] = best(lib._Library__construct_tracks_df, args.repeat)
+        df = lib.tracks_df
+        results['list_sort_s'] = best(lambda: sort_all(lib.store), args.repeat)
+        results['list_fill_s'] = min(fill(df, lib.sorts.order('album')) for _ in range(args.repeat))
+        results['list_fill_tk_s'] = fill_tk(df, lib.sorts.order('album')) # with Tk's own drawing, needs a display
+        if 'processing' not in args.skip:
+            with timed(results, 'processing_library_s'): processing = data_processing.Library()
+            results['load_df_s'] = best(processing.load_df, args.repeat)
+        results['metrics'] = metrics.snapshot()
+        try:
+            import resource
+            results['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024, 1)
+        except ImportError: pass
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(ws, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Time library loading on synthetic libraries")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="runs of the repeatable steps, the best is kept")
+    parser.add_argument('--cache', type=pl.Path, default=pl.Path(tempfile.gettempdir())/"music-player-bench",
+                        help="where generated libraries are kept between runs")
+    parser.add_argument('--skip', nargs='*', default=[], choices=['processing'],
+                        help="leave out data_processing, which reads every tag on every run")
+    parser.add_argument('--output', type=pl.Path, help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+    try: commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True, text=True).stdout.strip()
+    except OSError: commit = None
+    report = {'commit': commit or None, 'python': platform.python_version(), 'platform': platform.platform(),
+              'cpus': os.cpu_count(), 'runs': list()}
+    for size in args.sizes:
+        report['runs'].append(run(size, args))
+        print(f"{size} tracks done", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output: args.output.write_text(text)
+    else: print(text)
+
+if __name__ == "__main__":
+    main()
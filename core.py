@@ -0,0 +1,296 @@
+"""
+core.py is the player without its window: starting tracks from the play queue, pausing, seeking and moving on when a
+track ends, driven through a Backend that does the actual playing.
+
+    VlcBackend    plays through libVLC (playback.Playback)
+    NullBackend   plays nothing, a clock stands in for the audio so tracks still take time, end and move on
+
+The Tk player is a View of a PlayerCore: it forwards buttons and the time slider to the core and the core calls the
+view back with what to show. Without a window or a sound card,
+
+    python core.py --tracks 10000 --transitions 5000
+
+runs thousands of next, seek and end-of-track transitions on NullBackend and prints their latencies
+"""
+import abc, argparse, json, random, sys, time
+import metrics
+
+class Backend(abc.ABC):
+    """What PlayerCore needs from something that plays audio. Events come back through drain() on the core's thread"""
+    @abc.abstractmethod
+    def load(self, path: str) -> int:
+        """Makes path the current track and returns its length in ms, 0 if it isn't known yet"""
+    @abc.abstractmethod
+    def play(self) -> None: ...
+    @abc.abstractmethod
+    def pause(self, paused: bool) -> None: ...
+    @abc.abstractmethod
+    def stop(self) -> None: ...
+    @abc.abstractmethod
+    def seek(self, ms: int) -> None: ...
+    @abc.abstractmethod
+    def volume(self, volume: int) -> None: ...
+    def prepare(self, path: str) -> None:
+        """Hint that path plays next, so load() can be quick"""
+    @abc.abstractmethod
+    def drain(self) -> dict[str,]:
+        """Newest value of each kind of event since the last drain: 'time' and 'length' in ms, 'state' ('playing' or
+        'paused'), 'end' and 'error'"""
+
+class VlcBackend(Backend):
+    def __init__(self, instance):
+        from playback import Playback
+        self.playback = Playback(instance)
+        self.player = self.playback.player
+
+    def load(self, path: str) -> int:
+        media, length = self.playback.media(path)
+        self.player.set_media(media)
+        self.playback.clear() # events of the previous track
+        return length
+
+    def play(self) -> None:
+        self.player.play()
+
+    def pause(self, paused: bool) -> None:
+        self.player.set_pause(int(paused))
+
+    def stop(self) -> None:
+        self.player.stop()
+
+    def seek(self, ms: int) -> None:
+        self.player.set_time(ms)
+
+    def volume(self, volume: int) -> None:
+        self.player.audio_set_volume(volume)
+
+    def prepare(self, path: str) -> None:
+        self.playback.prepare(path)
+
+    def drain(self) -> dict[str,]:
+        return self.playback.drain()
+
+class NullBackend(Backend):
+    """Plays silence on a clock: time passes, seeks land and tracks end, but nothing is decoded. lengths gives a track's
+    length in ms, and clock can be swapped for one the caller moves on by hand"""
+    def __init__(self, lengths=None, clock=time.perf_counter):
+        self.lengths = lengths or (lambda path: 180000)
+        self.clock = clock
+        self.path: str|None = None
+        self.prepared: str|None = None
+        self.length = 0
+        self.offset = 0.0 # ms into the track when started was taken
+        self.started: float|None = None # clock() when playing last (re)started, None while paused or stopped
+        self.level = 100
+        self.events: dict[str,] = dict()
+
+    def position(self) -> int:
+        if self.started is None: return int(self.offset)
+        return int(min(self.length, self.offset + (self.clock() - self.started)*1e3))
+
+    def load(self, path: str) -> int:
+        self.path, self.offset, self.started = path, 0.0, None
+        self.length = self.lengths(path)
+        self.events.clear()
+        known, self.prepared = self.prepared == path, None
+        return self.length if known else 0 # like VLC, only a parsed track knows its length up front
+
+    def play(self) -> None:
+        if self.path is None or self.started is not None: return
+        self.started = self.clock()
+        self.events.update(state='playing', length=self.length)
+
+    def pause(self, paused: bool) -> None:
+        if paused and self.started is not None:
+            self.offset, self.started = self.position(), None
+            self.events['state'] = 'paused'
+        elif not paused: self.play()
+
+    def stop(self) -> None:
+        self.offset, self.started = 0.0, None
+
+    def seek(self, ms: int) -> None:
+        self.offset = float(max(0, min(ms, self.length)))
+        if self.started is not None: self.started = self.clock()
+
+    def volume(self, volume: int) -> None:
+        self.level = volume
+
+    def prepare(self, path: str) -> None:
+        self.prepared = path
+
+    def drain(self) -> dict[str,]:
+        if self.started is not None:
+            self.events['time'] = position = self.position()
+            if position >= self.length:
+                self.offset, self.started = float(self.length), None
+                self.events['end'] = 'endreached'
+        events, self.events = self.events, dict()
+        return events
+
+class View:
+    """What a PlayerCore shows, all no-ops so a headless core needs no view"""
+    def show_track(self, id: int, path: str, length: int) -> None: pass
+    def show_next(self, id: int, path: str) -> None: pass
+    def show_length(self, length: int) -> None: pass
+    def show_time(self, t: int) -> None: pass
+    def show_state(self, playing: bool) -> None: pass
+    def show_stopped(self) -> None: pass
+
+class PlayerCore:
+    def __init__(self, backend: Backend, queue, locate, view: View|None = None):
+        self.backend = backend
+        self.queue = queue # play_queue.PlayQueue
+        self.locate = locate # id -> path, None once a track has left the library
+        self.view = view or View()
+        self.stopped = True
+        self.playing = False
+        self.length = 0 # ms, 0 until known
+        self.path: str|None = None
+        self.level = 50 # volume before gain
+        self.gain = 0.0 # dB on top of the volume for the current track
+
+    def current(self) -> str|None:
+        """Path of the queue's current track, skipping tracks that left the library"""
+        for _ in range(len(self.queue) + 1):
+            if self.queue.current is not None and (path := self.locate(self.queue.current)) is not None: return path
+            if self.queue.next() is None: break
+        return None
+
+    @metrics.timed('player.switch')
+    def setup_track(self) -> bool:
+        if (path := self.current()) is None: return False
+        self.path = path
+        self.length = self.backend.load(path)
+        self.backend.play()
+        self.view.show_track(self.queue.current, path, self.length)
+        self.prepare_next()
+        return True
+
+    def prepare_next(self) -> None:
+        if (id := self.queue.peek()) is None or (path := self.locate(id)) is None: return
+        self.backend.prepare(path)
+        self.view.show_next(id, path)
+
+    def play(self) -> bool:
+        if self.stopped:
+            if not self.setup_track(): return False
+        else: self.backend.pause(False)
+        self.stopped = False
+        self.set_state(True)
+        return True
+
+    def pause(self) -> None:
+        self.backend.pause(True)
+        self.set_state(False)
+
+    def play_pause(self) -> None:
+        if self.playing: self.pause()
+        else: self.play()
+
+    def stop(self) -> None:
+        self.backend.stop()
+        self.set_state(False)
+        self.stopped = True
+        self.length = 0
+        self.view.show_stopped()
+
+    @metrics.timed('player.next')
+    def next(self) -> bool:
+        self.stop()
+        self.queue.next()
+        return self.play()
+
+    @metrics.timed('player.prev')
+    def prev(self) -> bool:
+        self.stop()
+        self.queue.prev()
+        return self.play()
+
+    @metrics.timed('player.advance')
+    def advance(self) -> bool:
+        # the finished track needs no stop(), go straight to swapping in the prepared one
+        self.stopped = True
+        self.queue.next()
+        return self.play()
+
+    @metrics.timed('player.seek')
+    def seek(self, ms: int) -> None:
+        self.backend.seek(ms)
+
+    def set_volume(self, level: float, gain:float|None = None) -> None:
+        """Volume in % (VLC goes up to 200), with gain dB on top when given"""
+        self.level = level
+        if gain is not None: self.gain = gain
+        # the analysis keeps the gain low enough that this doesn't clip
+        self.backend.volume(min(200, round(float(level) * 10**(self.gain/20))))
+
+    def set_state(self, playing: bool) -> None:
+        if playing == self.playing: return
+        self.playing = playing
+        self.view.show_state(playing)
+
+    def pump(self, seeking:bool = False) -> bool:
+        """Applies the backend's events, True while a track is playing. Times are held back while seeking"""
+        events = self.backend.drain()
+        if (length := events.get('length')) is not None and length > 0 and length != self.length:
+            self.length = length
+            self.view.show_length(length)
+        if (t := events.get('time')) is not None and not seeking: self.view.show_time(t)
+        if 'error' in events or 'end' in events:
+            self.advance()
+            return self.playing
+        if 'state' in events: self.set_state(events['state'] == 'playing')
+        return self.playing
+
+class ManualClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self) -> float:
+        return self.now
+
+def bench(tracks: int, transitions: int, seed:int = 0) -> dict:
+    """Latencies of next, prev, seek and end-of-track transitions over a simulated library"""
+    from play_queue import PlayQueue
+    rng = random.Random(seed)
+    clock = ManualClock()
+    lengths = {id: rng.randint(30000, 600000) for id in range(tracks)}
+    backend = NullBackend(lambda path: lengths[int(path)], clock)
+    queue = PlayQueue()
+    core = PlayerCore(backend, queue, lambda id: str(id) if id in lengths else None)
+    queue.play(list(range(tracks)), 0)
+    metrics.reset()
+    core.play()
+    for i in range(transitions):
+        match rng.random():
+            case r if r < 0.4: # play to the end
+                clock.now += (backend.length - backend.position())/1e3 + 0.001
+                core.pump()
+            case r if r < 0.7: core.next()
+            case r if r < 0.8: core.prev()
+            case r if r < 0.9:
+                core.seek(rng.randrange(max(1, backend.length)))
+                clock.now += 0.05
+                core.pump()
+            case r if r < 0.95:
+                core.play_pause()
+                core.play_pause()
+            case _: queue.set_shuffle(not queue.shuffle)
+        if not core.playing or backend.path != core.path or backend.path != str(queue.current):
+            raise AssertionError(f"player out of step after {i} transitions")
+    snapshot = metrics.snapshot()['timers']
+    return {'tracks': tracks, 'transitions': transitions,
+            **{name: snapshot[name] for name in ('player.next', 'player.prev', 'player.advance', 'player.seek',
+                                                  'player.switch') if name in snapshot}}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the player's control path on a simulated backend")
+    parser.add_argument('--tracks', type=int, default=10000)
+    parser.add_argument('--transitions', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    json.dump(bench(args.tracks, args.transitions, args.seed), sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+covers.py turns cached album art into PhotoImages for the player.
+
+Covers are only decoded when a track needs them. Ready PhotoImages are kept in a small LRU and the next track's cover is
+decoded ahead of time on a background thread, so changing tracks never waits on a JPEG decode in the Tk main loop.
+
+A track whose cover is still only in its file comes as (path, frames) instead of an art key. Its APIC frame is loaded
+and put in the art cache on the worker as well, the default cover shows until it's there. The art keys found that way
+come out of drain() so the library can keep them
+"""
+import os, queue, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import mutagen
+from PIL import Image
+from PIL import ImageTk as itk
+from data_art import ArtCache
+from data_frames import FrameLoader
+import log, metrics
+
+class CoverLoader:
+    def __init__(self, art: ArtCache, frames: FrameLoader, size:int = 32, prefetched:int = 4):
+        self.art = art
+        self.frames = frames
+        self.keys: OrderedDict[tuple[str,str], str] = OrderedDict() # (path, frames) -> art key
+        self.resolved = queue.SimpleQueue() # ((path, frames), art key) not drained yet
+        self.size = size
+        self.prefetched = prefetched
+        self.photos: OrderedDict[str, itk.PhotoImage] = OrderedDict() # only touched on the Tk thread
+        self.decoded: OrderedDict[str, Image.Image] = OrderedDict() # filled by the worker
+        self.lock = threading.Lock()
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="covers")
+
+    def get(self, key: str|tuple[str,str]|None) -> itk.PhotoImage:
+        """The cover's PhotoImage, the default one while a cover only in its file is read, see known()"""
+        if isinstance(key, tuple):
+            if (known := self.known(key)) is None: self.prefetch(key)
+            key = known
+        key = self.key(key)
+        if key in self.photos:
+            self.photos.move_to_end(key)
+            return self.photos[key]
+        with self.lock: image = self.decoded.pop(key, None)
+        photo = itk.PhotoImage(self.decode(key) if image is None else image)
+        self.photos[key] = photo
+        if len(self.photos) > self.size: self.photos.popitem(last=False)
+        return photo
+
+    def prefetch(self, key: str|tuple[str,str]|None) -> None:
+        if not isinstance(key, tuple): key = self.key(key)
+        with self.lock:
+            if isinstance(key, tuple): key = self.keys.get(key, key) # resolved on the worker if it hasn't been yet
+            if isinstance(key, str) and (key in self.photos or key in self.decoded): return
+        self.worker.submit(self._prefetch, key)
+
+    def known(self, source: tuple[str,str]) -> str|None:
+        with self.lock: return self.keys.get(source)
+
+    def drain(self) -> list[tuple[tuple[str,str], str]]:
+        """Covers read from their files since the last drain, as ((path, frames), art key)"""
+        resolved = list()
+        while True:
+            try: resolved.append(self.resolved.get_nowait())
+            except queue.Empty: return resolved
+
+    def key(self, key: str|None) -> str:
+        return key if isinstance(key, str) and key else self.art.default # tracks without art are NaN in tracks_df
+
+    @metrics.timed('covers.resolve')
+    def resolve(self, source: tuple[str,str]) -> str:
+        """Art key of the cover in a file's APIC frame"""
+        with self.lock:
+            if (key := self.keys.get(source)) is not None: return key
+        key = None
+        try:
+            if data := self.frames.picture(*source): key = self.art.store(data)
+        except (OSError, ValueError, mutagen.MutagenError) as e:
+            log.warning(f"[{os.path.basename(source[0])}] Couldn't read cover: {e}", key="cover")
+        if key is not None: self.resolved.put((source, key)) # unreadable ones are tried again next session
+        with self.lock:
+            self.keys[source] = key = key or self.art.default
+            if len(self.keys) > 1024: self.keys.popitem(last=False)
+        return key
+
+    def _prefetch(self, key: str|tuple[str,str]) -> None:
+        key = self.key(self.resolve(key) if isinstance(key, tuple) else key)
+        image = self.decode(key)
+        with self.lock:
+            self.decoded[key] = image
+            if len(self.decoded) > self.prefetched: self.decoded.popitem(last=False)
+
+    @metrics.timed('covers.decode')
+    def decode(self, key: str) -> Image.Image:
+        image = Image.open(self.art.path(key))
+        image.load()
+        return image
@@ -0,0 +1,178 @@
+"""
+data_analysis.py measures each track's loudness and a waveform overview for the seek slider.
+
+Samples are read through a memory map (WAV natively, other formats once ffmpeg has decoded them to a temporary file) and
+reduced with NumPy a chunk at a time, so a long track never sits in memory whole. Every track gets its peak, its RMS, a
+gain that brings the RMS to TARGET without clipping and a min/max waveform of RESOLUTION columns.
+
+Results are fixed-size records in one binary file keyed by a hash of the file's path, size and mtime, so a track is only
+analysed again when it changes. Records of files that changed or left the library are dropped when the library is next
+analysed
+"""
+import concurrent.futures as cf
+import hashlib, math, os, shutil, struct, subprocess, tempfile, threading
+import numpy as np
+import metrics
+
+RESOLUTION = 256 # waveform columns
+TARGET = -18.0 # dBFS RMS every track is brought to
+CHUNK = 1 << 20 # frames reduced at once
+MAGIC = b'MPA' + bytes([1])
+RECORD = np.dtype([('key', 'V16'), ('peak', '<f4'), ('rms', '<f4'), ('gain', '<f4'), ('wave', 'i1', (2, RESOLUTION))])
+
+def db(x: float) -> float:
+    return 20*math.log10(x) if x > 0 else -math.inf
+
+def wav_samples(path: str) -> tuple[np.ndarray, object]:
+    """Memory map over a PCM WAV's samples as (frames, channels, ...) and the function turning a slice into floats"""
+    with open(path, 'rb') as f:
+        if (riff := f.read(12))[:4] != b'RIFF' or riff[8:12] != b'WAVE': raise ValueError("not a WAV file")
+        fmt = offset = None
+        while len(header := f.read(8)) == 8:
+            chunk, size = header[:4], struct.unpack('<I', header[4:])[0]
+            if chunk == b'fmt ': fmt = f.read(size)[:40]
+            elif chunk == b'data':
+                offset = f.tell()
+                break
+            else: f.seek(size + size % 2, os.SEEK_CUR)
+    if fmt is None or offset is None: raise ValueError("WAV without fmt or data chunk")
+    tag, channels, _, _, _, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if tag == 0xFFFE and len(fmt) >= 26: tag = struct.unpack('<H', fmt[24:26])[0] # WAVE_FORMAT_EXTENSIBLE
+    size = min(size, os.path.getsize(path) - offset) # streamed WAVs leave the size at 0 or 0xFFFFFFFF
+    frames = size // (bits//8 * channels)
+    match (tag, bits):
+        case (1, 8): dtype, convert = 'u1', lambda x: (x.astype(np.float32) - 128)/128
+        case (1, 16): dtype, convert = '<i2', lambda x: x.astype(np.float32)/(1 << 15)
+        case (1, 24): dtype, convert = 'u1', lambda x: int24(x)/(1 << 23)
+        case (1, 32): dtype, convert = '<i4', lambda x: x.astype(np.float32)/(1 << 31)
+        case (3, 32) | (3, 64): dtype, convert = ('<f4' if bits == 32 else '<f8'), lambda x: x.astype(np.float32)
+        case _: raise ValueError(f"unsupported WAV format {tag} with {bits} bit samples")
+    if not frames: return np.zeros((0, channels), dtype=np.float32), convert
+    shape = (frames, channels, 3) if bits == 24 else (frames, channels)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape), convert
+
+def int24(x: np.ndarray) -> np.ndarray:
+    value = x[..., 0].astype(np.int32) | (x[..., 1].astype(np.int32) << 8) | (x[..., 2].astype(np.int32) << 16)
+    return (value - ((value & 0x800000) << 1)).astype(np.float32)
+
+def reduce(samples: np.ndarray, convert) -> np.ndarray:
+    """Peak, RMS, gain and waveform of (frames, channels) samples as a RECORD"""
+    record = np.zeros(1, dtype=RECORD)
+    frames, channels = samples.shape[:2]
+    if not frames: return record
+    edges = np.arange(RESOLUTION+1, dtype=np.int64) * frames // RESOLUTION
+    lo, hi = np.zeros(RESOLUTION, dtype=np.float32), np.zeros(RESOLUTION, dtype=np.float32)
+    squares, peak = 0.0, 0.0
+    step = max(1, CHUNK // max(1, frames // RESOLUTION)) # columns per chunk
+    for a in range(0, RESOLUTION, step):
+        b = min(a + step, RESOLUTION)
+        start, stop = int(edges[a]), int(edges[b])
+        if stop <= start: continue
+        block = convert(np.asarray(samples[start:stop]))
+        squares += float(np.square(block, dtype=np.float64).sum())
+        top, bottom = block.max(axis=1), block.min(axis=1)
+        peak = max(peak, float(top.max()), -float(bottom.min()))
+        if frames >= RESOLUTION: # every column has at least one frame
+            hi[a:b] = np.maximum.reduceat(top, edges[a:b] - start)
+            lo[a:b] = np.minimum.reduceat(bottom, edges[a:b] - start)
+    rms = math.sqrt(squares / (frames*channels))
+    record['peak'], record['rms'] = peak, rms
+    record['gain'] = min(TARGET - db(rms), -db(peak)) if rms > 0 else 0.0
+    record['wave'][0, 0], record['wave'][0, 1] = (np.clip(np.round(w*127), -127, 127) for w in (lo, hi))
+    return record
+
+def analyze(path: str) -> np.ndarray:
+    """RECORD for one file, without its key. Module level so it can run in a process pool"""
+    try: return reduce(*wav_samples(path))
+    except ValueError:
+        if not (ffmpeg := shutil.which('ffmpeg')): raise
+    # not a WAV we can map, decode it to 16 bit stereo and map that instead
+    fd, raw = tempfile.mkstemp(suffix=".pcm")
+    os.close(fd)
+    try:
+        subprocess.run([ffmpeg, '-v', 'error', '-nostdin', '-y', '-i', path, '-f', 's16le', '-ac', '2', '-ar', '44100', raw],
+                       check=True, capture_output=True)
+        if not (frames := os.path.getsize(raw) // 4): return np.zeros(1, dtype=RECORD)
+        samples = np.memmap(raw, dtype='<i2', mode='r', shape=(frames, 2))
+        record = reduce(samples, lambda x: x.astype(np.float32)/(1 << 15))
+        del samples
+        return record
+    except subprocess.CalledProcessError as e: raise ValueError(e.stderr.decode(errors='replace').strip()) from None
+    finally: os.remove(raw)
+
+class AnalysisCache:
+    def __init__(self, directory:str = "./data/analysis.bin"):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.records = np.zeros(0, dtype=RECORD) # read from disk
+        self.added: dict[bytes, np.void] = dict() # analysed since
+        self.rows: dict[bytes, int] = dict()
+        self.worker = cf.ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+        try:
+            with open(directory, 'rb') as f:
+                if f.read(len(MAGIC)) == MAGIC and struct.unpack('<H', f.read(2))[0] == RESOLUTION:
+                    self.records = np.memmap(directory, dtype=RECORD, mode='r', offset=len(MAGIC)+2)
+        except (OSError, ValueError): pass # no cache yet or a damaged one, it gets rewritten
+        self.rows = {key.tobytes(): row for row, key in enumerate(self.records['key'])}
+        if not len(self.records): self.write_header()
+
+    def __len__(self):
+        return len(self.rows) + len(self.added)
+
+    @staticmethod
+    def key(path: str, stat: tuple[int,int]) -> bytes:
+        return hashlib.blake2b(f"{path}\0{stat[0]}\0{stat[1]}".encode(errors='surrogateescape'), digest_size=16).digest()
+
+    def write_header(self) -> None:
+        os.makedirs(os.path.dirname(self.directory) or '.', exist_ok=True)
+        with open(self.directory, 'wb') as f: f.write(MAGIC + struct.pack('<H', RESOLUTION))
+
+    def get(self, path: str, stat: tuple[int,int]) -> np.void|None:
+        key = self.key(path, stat)
+        with self.lock:
+            if (record := self.added.get(key)) is not None: return record
+            if (row := self.rows.get(key)) is not None: return self.records[row]
+        return None
+
+    def add(self, path: str, stat: tuple[int,int], record: np.ndarray) -> np.void:
+        record = record.copy()
+        record['key'] = np.void(key := self.key(path, stat))
+        with self.lock:
+            if key in self.added or key in self.rows: return record[0]
+            with open(self.directory, 'ab') as f: f.write(record.tobytes())
+            self.added[key] = record[0]
+        return record[0]
+
+    def request(self, path: str, stat: tuple[int,int]) -> cf.Future:
+        """Analyses one track now on a background thread, ahead of a library pass"""
+        def run() -> np.void:
+            if (record := self.get(path, stat)) is not None: return record
+            return self.add(path, stat, analyze(path))
+        return self.worker.submit(run)
+
+    def compact(self, tracks: list[tuple[str, tuple[int,int]]]) -> int:
+        """Rewrites the file with only the records of tracks (path, stat), returns how many were dropped"""
+        keep = {self.key(path, stat) for path, stat in tracks}
+        with self.lock:
+            rows = sorted(row for key, row in self.rows.items() if key in keep)
+            added = [record for key, record in self.added.items() if key in keep]
+            if not (dropped := len(self) - len(rows) - len(added)): return 0
+            records = np.concatenate([np.array(self.records[rows]), np.array(added, dtype=RECORD)])
+            tmp = f"{self.directory}.tmp"
+            with open(tmp, 'wb') as f: f.write(MAGIC + struct.pack('<H', RESOLUTION) + records.tobytes())
+            try: os.replace(tmp, self.directory)
+            except OSError: # still mapped on Windows, it's compacted next session
+                os.remove(tmp)
+            self.records, self.added = records, dict()
+            self.rows = {key.tobytes(): row for row, key in enumerate(records['key'])}
+        return dropped
+
+    def fill(self, tracks: list[tuple[str, tuple[int,int]]], workers) -> None:
+        """Analyses every (path, stat) that isn't cached through a WorkerPool, meant for a background thread"""
+        metrics.count('analysis.dropped', self.compact(tracks))
+        decodable = shutil.which('ffmpeg') is not None
+        jobs = [(path,) for path, stat in tracks
+                if (decodable or path.lower().endswith('.wav')) and self.get(path, stat) is None]
+        stats = dict(tracks)
+        for (path,), record in workers.map(analyze, jobs):
+            if not isinstance(record, Exception): self.add(path, stats[path], record)
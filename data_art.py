@@ -0,0 +1,42 @@
+"""
+data_art.py stores album covers by the hash of their bytes.
+
+Every unique cover is resized once to a thumbnail and written once, so an album's tracks all share one file and the
+cache survives restarts. Tracks only keep the hash
+"""
+import hashlib, io, os, threading
+import pathlib as pl
+from PIL import Image
+import metrics
+
+class ArtCache:
+    def __init__(self, directory:str = "assets/img/albums", size:int = 250, default:str = "assets/img/albums/default.png"):
+        self.directory = pl.Path(directory)
+        self.size = size
+        self.default_path = pl.Path(default)
+        self._default: str|None = None
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    @property
+    def default(self) -> str:
+        if self._default is None: self._default = self.store(self.default_path.read_bytes())
+        return self._default
+
+    def path(self, key: str|None) -> pl.Path:
+        return self.directory/f"{key or self.default}.jpg"
+
+    def store(self, data: bytes) -> str:
+        key = self.key(data)
+        if (path := self.path(key)).exists():
+            metrics.count('art.hits')
+            return key
+        with metrics.timed('art.write'):
+            image = Image.open(io.BytesIO(data)).convert('RGB').resize((self.size, self.size))
+            # other workers may be writing the same cover, so write to a private file and swap it in
+            tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            image.save(tmp, 'JPEG', quality=90)
+            os.replace(tmp, path)
+        return key
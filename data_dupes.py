@@ -0,0 +1,141 @@
+"""
+data_dupes.py finds tracks that hold the same recording under different tags or file names.
+
+Only the audio payload is compared: ID3v2/ID3v1/APE tags around MP3 data, every chunk but 'data' in a WAV and every
+atom but 'mdat' in an MP4, so a retagged copy or one with new cover art still matches. Files are narrowed down in steps:
+
+    payload length    from the headers alone, files with a length nobody else has are done
+    partial hash      the first PARTIAL bytes of the payload
+    full hash         the whole payload, streamed in BLOCK sized reads
+
+Whatever was measured is kept in the library index keyed by path, size and mtime, so later runs only look at new or
+changed files
+"""
+import hashlib, os, sqlite3
+from collections import defaultdict
+from data_tags import sniff, synchsafe
+import metrics
+
+PARTIAL = 1 << 16
+BLOCK = 1 << 20
+
+def payload(path: str) -> list[tuple[int,int]]:
+    """(start, stop) byte ranges of a file's audio, without its tags"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        match sniff(header):
+            case "mp4": return containers(f, size, 0, 8, b'mdat', '>')
+            case "wav": return containers(f, size, 12, 8, b'data', '<')
+        start, end = 0, size
+        while header[:3] == b'ID3' and len(header) >= 10: # tags can be stacked at the start
+            start += 10 + synchsafe(header[6:10]) + (10 if header[5] & 0x10 else 0)
+            f.seek(start)
+            header = f.read(12)
+        f.seek(max(0, end - 128))
+        if f.read(3) == b'TAG': end -= 128 # ID3v1
+        f.seek(max(0, end - 32))
+        if (footer := f.read(32))[:8] == b'APETAGEX':
+            end -= int.from_bytes(footer[12:16], 'little') + (32 if footer[23] & 0x80 else 0)
+        f.seek(max(0, end - 10))
+        if (footer := f.read(10))[:3] == b'3DI': end -= 20 + synchsafe(footer[6:10]) # ID3v2.4 appended with a footer
+    return [(start, end)] if end > start else []
+
+def containers(f, size: int, offset: int, header: int, name: bytes, order: str) -> list[tuple[int,int]]:
+    """Payload ranges of the top level MP4 atoms (order '>') or RIFF chunks (order '<') called name"""
+    ranges = list()
+    while offset + header <= size:
+        f.seek(offset)
+        data = f.read(header)
+        start = offset + header
+        if order == '>':
+            length, kind = int.from_bytes(data[:4], 'big'), data[4:8]
+            if length == 1: # 64 bit atom size
+                length = int.from_bytes(f.read(8), 'big')
+                start += 8
+            elif length == 0: length = size - offset # the atom runs to the end of the file
+            stop, following = offset + length, offset + length
+            if length < header: break
+        else:
+            kind, length = data[:4], int.from_bytes(data[4:8], 'little')
+            stop, following = start + length, start + length + length % 2 # chunks are word aligned
+        if kind == name: ranges.append((start, min(stop, size)))
+        offset = following
+    return ranges
+
+def measure(path: str) -> int:
+    return sum(stop - start for start, stop in payload(path))
+
+def digest(path: str, limit:int|None = None) -> bytes:
+    """blake2b of the first limit bytes of a file's payload, or all of it"""
+    h, left = hashlib.blake2b(digest_size=16), limit
+    with open(path, 'rb') as f:
+        for start, stop in payload(path):
+            f.seek(start)
+            while start < stop and left != 0:
+                n = min(BLOCK, stop - start, left if left is not None else BLOCK)
+                if not (data := f.read(n)): break
+                h.update(data)
+                start += len(data)
+                if left is not None: left -= len(data)
+    return h.digest()
+
+class DupeIndex:
+    def __init__(self, directory:str = "./data/library.db"):
+        self.conn = sqlite3.connect(directory, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS payloads (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                          "mtime INTEGER NOT NULL, length INTEGER NOT NULL, partial BLOB, digest BLOB)")
+        self.conn.commit()
+
+    def load(self) -> dict[str, list]:
+        rows = self.conn.execute("SELECT path, size, mtime, length, partial, digest FROM payloads")
+        return {path: [size, mtime, length, partial, digest] for path, size, mtime, length, partial, digest in rows}
+
+    def update(self, entries: dict[str, list]) -> None:
+        self.conn.executemany("INSERT OR REPLACE INTO payloads VALUES (?, ?, ?, ?, ?, ?)",
+                              [(path, *entry) for path, entry in entries.items()])
+        self.conn.commit()
+
+    def remove(self, paths) -> None:
+        self.conn.executemany("DELETE FROM payloads WHERE path = ?", [(p,) for p in paths])
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    @metrics.timed('dupes.find')
+    def find(self, tracks: dict[str, tuple[int,int]], workers) -> list[list[str]]:
+        """Groups of paths in tracks (path -> (size, mtime)) with the same audio, largest first"""
+        cached, changed = self.load(), dict()
+        self.remove([path for path in cached if path not in tracks])
+        entries = dict()
+        for path, stat in tracks.items():
+            if (entry := cached.get(path)) is not None and tuple(entry[:2]) == tuple(stat): entries[path] = entry
+            else: entries[path] = changed[path] = [*stat, None, None, None]
+
+        def fill(paths: list[str], column: int, fn, *args) -> None:
+            paths = [p for p in paths if entries[p][column] is None]
+            for (path, *_), result in workers.map(fn, [(p, *args) for p in paths]):
+                if isinstance(result, Exception): result = -1 if column == 2 else b'' # unreadable, never matches (nor does an empty payload)
+                entries[path][column] = result
+                changed[path] = entries[path]
+            metrics.count(('dupes.measured', 'dupes.partial', 'dupes.hashed')[column-2], len(paths))
+
+        def split(paths, column: int) -> list[list[str]]:
+            groups = defaultdict(list)
+            for path in paths:
+                if (value := entries[path][column]) not in (-1, 0, b''): groups[tuple(entries[path][2:column+1])].append(path)
+            return [group for group in groups.values() if len(group) > 1]
+
+        fill(list(tracks), 2, measure)
+        groups = [path for group in split(tracks, 2) for path in group]
+        fill(groups, 3, digest, PARTIAL)
+        groups = [path for group in split(groups, 3) for path in group]
+        for path in groups: # the partial hash already covered short payloads whole
+            if entries[path][4] is None and entries[path][2] <= PARTIAL:
+                entries[path][4] = entries[path][3]
+                changed[path] = entries[path]
+        fill(groups, 4, digest)
+        groups = split(groups, 4)
+        if changed: self.update(changed)
+        return sorted((sorted(group) for group in groups), key=lambda group: (-len(group), group[0]))
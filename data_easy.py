@@ -1,24 +1,29 @@
 """
-data_easy.py uses the EasyID3 module of mutagen and is simpler than the dynamic tag reading attempted in data_processing. 
+data_easy.py uses EasyID3 style tags (read by data_tags) and is simpler than the dynamic tag reading attempted in data_processing. 
 
 This is used to make a basic version of the app so I don't spend all my time stabilizing the more complex code
 """
 import json, os
 import pathlib as pl
-from mutagen.easyid3 import EasyID3
-import mutagen.id3
 import itertools
+import mutagen
 import pandas as pd
-import base64, binascii, io
-from PIL import Image
-import pickle, threading, time
-
-T = dict()
-
-def update_T(name, t):
-    if not T.get(name): T[name] = [0,0]
-    c_t, c_ct = T[name]
-    T.update({name: [c_t+t, c_ct+1]})
+import queue, threading, time
+from data_analysis import AnalysisCache
+from data_art import ArtCache
+from data_dupes import DupeIndex
+from data_edit import write_tags
+from data_frames import FrameLoader, encode
+from data_groups import Artist, Groups
+from data_index import LibraryIndex
+from data_scan import Discovery
+from data_search import SearchIndex
+from data_sort import SortIndex
+from data_store import TrackStore
+from data_tags import read_tags
+from data_watch import Watcher
+from data_workers import WorkerPool
+import log, metrics
 
 class Preferences:
     def __init__(self, directory:str = "./data/preferences.json"):
@@ -29,48 +34,17 @@ class Preferences:
             prefs = json.load(f)
             self.music_dirs = set(prefs['music_directories'])
             self.exts = set(prefs['extensions'])
+            self.workers: int|None = prefs.get('scan_workers') # defaults to the cpu count
+            self.pool: str = prefs.get('scan_pool', 'thread') # 'thread' or 'process'
+            self.watch_interval: float = prefs.get('watch_interval', 5) # seconds between polls where inotify can't be used
+            self.normalize: bool = prefs.get('normalize_volume', True) # play every track at the same loudness
 
-class Artist: # currently working on the assumption that artist names are unique
-    def __init__(self, name: str):
-        self.name = name
-    def __hash__(self):
-        return hash(self.name)
-    def __le__(self, other):
-        return self.name <= (other.name if isinstance(other, Artist) else "")
-    def __lt__(self, other):
-        return self.name < (other.name if isinstance(other, Artist) else "")
-    def __ge__(self, other):
-        return self.name >= (other.name if isinstance(other, Artist) else "")
-    def __gt__(self, other):
-        return self.name > (other.name if isinstance(other, Artist) else "")
-    def __eq__(self, other):
-        return self.name == (other.name if isinstance(other, Artist) else "")
-    def __str__(self):
-        return self.name
-    def __repr__(self):
-        return f"Artist('{self.name}')"
-
-
-class Track:
+class Track: # a view of one row of the library's TrackStore
+    __slots__ = ('store', 'row')
     ID_GEN = itertools.count(100000)
-    def __init__(self, path: pl.Path, image_size:int = 250):
-        self.threads: list[threading.Thread] = list()
-        self.active_threads = 0
-        self.image_size = image_size
-        self.image_path = pl.Path('assets/img/albums/default.png')
-        self.id = str(next(self.ID_GEN))
-        self.path = path
-        self.filename = self.path.name
-        self.albumartist_obj: Artist = None
-        self.albumartist_id: str = None
-        self.artists_objs: list[Artist] = []
-        self.artists_ids: list[str] = []
-        self.metadata = self.read_metadata()
-        self.complete_track()
-        for thread in self.threads:
-            thread.join()
-        self.metadata.update({'image':self.image})
-        self._update_attr()
+    def __init__(self, store: TrackStore, row: int):
+        self.store = store
+        self.row = row
     
     def __repr__(self):
         return(f"Track('{self.filename}')")
@@ -78,101 +52,405 @@ class Track:
     def __str__(self):
         return "{0} ({1})".format(self.title, "; ".join(self.artists))
 
-    def complete_track(self):
-        self.title: str = self.metadata.get('title') or self.filename
-        self.artists = self.metadata.get('artist') or ["None"]
-        if isinstance(self.artists, str):
-            if self.artists == '': self.artists = ["None"]
-            elif '/' in self.artists:  self.artists = self.artists.split('/')
-            else: self.artists = [self.artists]
-        #TODO: Find a better way of setting album artist
-        self.albumartist = self.metadata.get('albumartist') or self.artists[0]
-        self.tracknumber = self.metadata.get('tracknumber') or 0
-        self.metadata.update({'path':self.path, 'id': self.id, 'title':self.title, 'artists':self.artists,
-                              'image_path': self.image_path, 'albumartist':self.albumartist,
-                              'tracknumber': self.tracknumber})
-                              
-    def create_album_image(self):
-        if not self.image_path == pl.Path('assets/img/albums/default.png'):
-            buffer = io.BytesIO(self.image_data)
-            with open(self.image_path, 'wb') as img:
-                img.write(buffer.getvalue())
-        self.image = Image.open(pl.Path(self.image_path))
-        self.image = self.image.resize((self.image_size,self.image_size))
-        self.active_threads -= 1
-
-    def attach_artist(self, artist: Artist, main:bool= False):
-        if main:
-            self.albumartist_obj = artist
-            self.metadata.update({'albumartist_obj': self.albumartist_obj})
-        else:
-            self.artists_objs.append(artist)
-            self.metadata.update({'artists_objs': self.artists_objs})
-    
-    def read_metadata(self):
-        meta: dict[str,] = dict()
-        audio = mutagen.File(self.path)
-        self.threads.append(th_image := threading.Thread(target=self.create_album_image))
-        if 'APIC:' in audio.keys():
-            self.image_path = f'assets/img/albums/{self.id}.jpg'
-            self.image_data = audio.tags.getall('APIC:')[0].data
-            meta.update({'image_data': self.image_data})
-        self.active_threads += 1
-        th_image.start()
-        meta = {k:('',v[0],v)[min(2,len(v))] for k, v in EasyID3(self.path).items()}
-        return meta
-
-    def _update_attr(self):
-        self.__dict__.update(self.metadata)
-    
+    def __getattr__(self, name):
+        try: return self.store.value(self.row, name)
+        except KeyError: raise AttributeError(name) from None
+
+    @property
+    def path(self) -> pl.Path:
+        return pl.Path(self.store.path(self.row))
+
+    @property
+    def filename(self) -> str:
+        return self.store.value(self.row, 'name')
+
+    @property
+    def id(self) -> str:
+        return str(self.store.value(self.row, 'id'))
+
+    @property
+    def stat(self) -> tuple[int,int]:
+        return self.store.stat(self.row)
+
+    @property
+    def artists(self) -> list[str]:
+        return split_artists(self.store.value(self.row, 'artist'))
+
+    @property
+    def metadata(self) -> dict[str,]:
+        return {**self.to_record(), 'path': self.path, 'id': self.id, 'artists': self.artists}
+
+    def to_record(self) -> dict[str,]:
+        return self.store.record(self.row)
+
+def split_artists(artist: str|None) -> list[str]:
+    return artist.split('/') if artist else ["None"]
+
+def complete_track(path: pl.Path, meta: dict[str,]) -> dict[str,]:
+    """Fills in the title, album artist and track number a track is listed by"""
+    meta = {k: '/'.join(v) if isinstance(v, list) else v for k, v in meta.items()}
+    meta['title'] = meta.get('title') or path.name
+    #TODO: Find a better way of setting album artist
+    meta['albumartist'] = meta.get('albumartist') or split_artists(meta.get('artist'))[0]
+    tracknumber = str(meta.get('tracknumber') or 0)
+    meta['tracknumber'] = int(tracknumber) if tracknumber.isdigit() else 0
+    return meta
+
+# module level so it can run in a process pool
+def read_metadata(path: pl.Path, art_cache: ArtCache|None = None) -> dict[str,]:
+    with metrics.timed('scan.tags'): fields, art, frames = read_tags(path)
+    meta = {k:('',v[0],v)[min(2,len(v))] for k, v in fields.items()}
+    if frames: meta['frames'] = encode(frames) # loaded when asked for, by Library.frames
+    if art:
+        try: meta['art'] = (art_cache or ArtCache()).store(art[0][1])
+        except OSError as e: log.warning(f"[{path.name}] Couldn't read cover: {e}", key="cover")
+    return meta
+
+# module level so it can run in a process pool
+def edit_file(path: pl.Path, edits: dict[str,], art_cache: ArtCache|None = None) -> tuple[tuple[int,int], dict[str,]]:
+    """Writes edits to path and reads its tags back the way a scan would, returns (stat, metadata)"""
+    stat = write_tags(path, edits)
+    return stat, read_metadata(path, art_cache)
+
+def file_stat(path: pl.Path) -> tuple[int, int]:
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
+
 class Library:
-    def __init__(self):
-        self.threads: list[threading.Thread] = list()
-        self.active_threads = 0
+    def __init__(self, scan:bool = True):
         self.prefs: Preferences = Preferences()
-        self.tracks: list[Track] = list()
-        self.artists: list[Artist] = list()
-        self.track_paths: set[pl.Path] = set()
-        self.update_library()
+        self.index: LibraryIndex = LibraryIndex()
+        self.dupes: DupeIndex = DupeIndex()
+        self.art: ArtCache = ArtCache()
+        self.frames: FrameLoader = FrameLoader()
+        self.analysis: AnalysisCache = AnalysisCache()
+        self.store: TrackStore = TrackStore()
+        self.search: SearchIndex = SearchIndex()
+        self.sorts: SortIndex = SortIndex()
+        self.discovery: Discovery = None
+        self.watcher: Watcher = None
+        self.analyzer: WorkerPool = None
+        self.workers: WorkerPool = WorkerPool(self.prefs.workers, self.prefs.pool)
+        self.parsed: list[Track] = list() # tracks read from disk since the index was last written
+        self.groups: Groups = Groups() # tracks by artist and by album artist and album
+        self.updating: threading.Thread|None = None # a rescan or a read of changed files, see apply_changes
+        self.updates = queue.SimpleQueue() # its batches, then None
+        self.deferred: list[tuple] = list() # watcher events held back until it's done
+        self.scanning = False # a scan's batches are still coming, so the store is somewhere between the index and the disk
+        self.restore()
+        if scan: self.update_library() # otherwise the caller streams scan() into apply_scan itself
+        else: self.update_frame()
+
+    @property
+    def tracks(self) -> list[Track]:
+        return [Track(self.store, row) for row in range(len(self.store))]
     
-    def update_track_paths(self) -> set[pl.Path]:
-        return({track.path for track in self.tracks})
+    def update_track_paths(self) -> set[str]:
+        return set(self.store.paths())
 
     def update_tracks(self):
-        files = set()
-        for d in self.prefs.music_dirs:
-            if '~' in d:
-                d = pl.Path(d).expanduser()
-            for ext in self.prefs.exts:
-                files = files.union({f for f in pl.Path(d).rglob(f'*{ext}') if f.is_file()})
-        self.tracks = [track for track in self.tracks if not track.path in self.track_paths - files] # remove missing tracks
-        
-        for path in files-self.track_paths:
-            self.threads.append(th := threading.Thread(target=self.add_track, args=(path,)))
-            self.active_threads += 1
-            th.start()
-    
-    def add_track(self, path: pl.Path):
-        track = Track(path)
-        self.update_artists(track)
-        self.tracks.append(track)
-        self.active_threads -= 1
+        for batch in self.scan(): self.apply_scan(batch)
+
+    @metrics.timed('library.restore')
+    def restore(self) -> None:
+        """Fills the library with what it held last time: the snapshot saved when the player closed if the index hasn't
+        been written since, otherwise every track in the index in one go"""
+        if (state := self.index.load_snapshot()) is not None:
+            self.store, self.search, self.sorts, self.groups = state
+        elif indexed := self.index.load():
+            self.add_tracks([(path, (size, mtime), (id, meta)) for path, (size, mtime, id, meta) in indexed.items()])
+        if len(self.store): Track.ID_GEN = itertools.count(int(self.store.numbers['id'][:len(self.store)].max())+1)
+
+    def save(self) -> None:
+        """Writes what's pending to the index and snapshots the library for a quick start next time, unless a scan is
+        still under way"""
+        if self.scanning or self.updating is not None: return
+        self.index.update(self.parsed)
+        self.parsed.clear()
+        self.index.save_snapshot((self.store, self.search, self.sorts, self.groups))
+
+    def scan(self, batch:int = 256, known:dict[str, tuple[tuple[int,int], int]]|None = None, progress=None):
+        """Compares the music directories with the library and yields what changed in batches instead of changing the
+        library: ('remove', paths) of tracks that are gone or changed on disk, then ('add', tracks) as new and changed
+        files are read. The batches can be applied (in order, with apply_scan) on another thread while the rest are
+        read. Only the start looks at the store, or not even that when known (from known_tracks) is given. Files read again
+        keep their track's id.
+        progress(done, total) is called as files are read"""
+        self.scanning = True
+        if known is None: known = self.known_tracks()
+        self.discovery = Discovery(self.prefs.music_dirs, self.prefs.exts)
+        files: dict[str, tuple[int,int]] = dict()
+        with metrics.timed('scan.discovery'):
+            for path, stat in self.discovery:
+                if self.workers.cancelled.is_set(): return
+                files[str(path)] = stat
+        if stale := [path for path, (stat, _) in known.items() if files.get(path) != stat]: yield ('remove', stale)
+        self.index.remove(path for path in stale if path not in files) # changed ones are replaced once read
+        jobs = [(pl.Path(path), self.art) for path, stat in files.items() if path not in known or known[path][0] != stat]
+        metrics.count('scan.files', len(files))
+        metrics.count('scan.reads', len(jobs))
+
+        parsed = list()
+        for (path, _), meta in self.workers.map(read_metadata, jobs, progress=progress):
+            if isinstance(meta, Exception):
+                metrics.count('scan.failed')
+                log.warning(f"[{path.name}] Couldn't read metadata: {meta}", key="metadata")
+                continue
+            id = known[str(path)][1] if str(path) in known else next(Track.ID_GEN)
+            parsed.append((str(path), files[str(path)], (str(id), complete_track(path, meta))))
+            if len(parsed) == batch:
+                yield ('add', parsed)
+                parsed = list()
+        if parsed: yield ('add', parsed)
+
+    def known_tracks(self) -> dict[str, tuple[tuple[int,int], int]]:
+        """path -> (stat, id) of every track in the store"""
+        return {path: (self.store.stat(row), self.store.value(row, 'id')) for path, row in self.store.paths().items()}
+
+    @metrics.timed('scan.apply')
+    def apply_scan(self, batch: tuple[str, list]) -> None:
+        match batch:
+            case ('remove', paths):
+                paths = set(paths)
+                self.remove_rows(row for path, row in self.store.paths().items() if path in paths)
+            case ('add', tracks): self.parsed += self.add_tracks(tracks)
+
+    def finish_scan(self) -> None:
+        """Writes what a scan read to the index and rebuilds tracks_df"""
+        self.index.update(self.parsed)
+        self.parsed.clear()
+        self.scanning = False
+        self.store.compact()
+        self.update_frame()
+
+    def cancel(self) -> None:
+        """Stops scans, edits and analysis for good, e.g. when the player closes"""
+        self.workers.cancel()
+        if self.watcher: self.watcher.stop()
+        if self.analyzer: self.analyzer.cancel()
+
+    def analyze(self) -> threading.Thread:
+        """Analyses the loudness and waveform of every track not in the analysis cache on a background thread"""
+        tracks = [(path, self.store.stat(row)) for path, row in self.store.paths().items()]
+        self.analyzer = WorkerPool(max(1, (os.cpu_count() or 2)//2), "process") # leaves cores for playback
+        thread = threading.Thread(target=self.analysis.fill, args=(tracks, self.analyzer), name="analysis", daemon=True)
+        thread.start()
+        return thread
+
+    def background(self, batches, name: str) -> threading.Thread:
+        """Puts the batches a generator yields on self.updates from a background thread, apply_changes applies them"""
+        def run():
+            try:
+                for batch in batches: self.updates.put(batch)
+            except Exception as e: log.warning(f"Couldn't {name} the library: {e}", key=name)
+            finally: self.updates.put(None)
+        self.updating = threading.Thread(target=run, name=name, daemon=True)
+        self.updating.start()
+        return self.updating
+
+    def rescan(self) -> threading.Thread:
+        """Compares the music directories with the library again on a background thread, for when the watcher lost
+        events"""
+        return self.background(self.scan(known=self.known_tracks()), "rescan")
+
+    def read(self, jobs: list[tuple[pl.Path, ArtCache]], ids: dict[str, int], batch:int = 256):
+        """Reads files the watcher saw change and yields them in batches like scan. Tracks that were rewritten (path ->
+        id) keep their ids and stay as they were until they've been read"""
+        def batches(tracks):
+            if rewritten := [path for path, *_ in tracks if path in ids]: yield ('remove', rewritten)
+            yield ('add', tracks)
+        tracks = list()
+        for (path, _), meta in self.workers.map(read_metadata, jobs):
+            if isinstance(meta, Exception):
+                log.warning(f"[{path.name}] Couldn't read metadata: {meta}", key="metadata")
+                continue
+            try: stat = file_stat(path)
+            except OSError: continue
+            id = ids.get(str(path)) or next(Track.ID_GEN)
+            tracks.append((str(path), stat, (str(id), complete_track(path, meta))))
+            if len(tracks) == batch:
+                yield from batches(tracks)
+                tracks = list()
+        if tracks: yield from batches(tracks)
+
+    def apply_updates(self) -> bool:
+        """Applies the background update's batches that have arrived, then the events that came in meanwhile once it's
+        done"""
+        changed = False
+        while True:
+            try: batch = self.updates.get_nowait()
+            except queue.Empty: break
+            if batch is None:
+                self.updating = None
+                self.finish_scan()
+                events, self.deferred = self.deferred, list()
+                self.apply_changes(events)
+                return True
+            self.apply_scan(batch)
+            changed = True
+        if changed: self.update_frame()
+        return changed
+
+    def watch(self) -> Watcher:
+        """Starts watching the music directories, call apply_changes with the events to keep the library current"""
+        self.watcher = Watcher(self.prefs.music_dirs, self.prefs.exts, self.prefs.watch_interval)
+        self.watcher.start()
+        return self.watcher
+
+    @metrics.timed('library.changes')
+    def apply_changes(self, events) -> bool:
+        """Updates the store, search, index and tracks_df from watcher events, returns whether anything changed. Files
+        that have to be read are read on a background thread and added by later calls as they arrive, while the events
+        that come in meanwhile wait for them"""
+        if any(event[0] == 'rescan' for event in events) and self.updating is None: self.rescan()
+        if self.updating is not None:
+            self.deferred += events
+            return self.apply_updates()
+        if not events: return False
+        paths = self.store.paths()
+        pending: dict[str, str|tuple] = dict() # path -> 'read', 'remove' or ('move', old path)
+        exts = {ext.lower() for ext in self.prefs.exts}
+        def is_music(path: str) -> bool:
+            return os.path.splitext(path)[1].lower() in exts
+        def under(top: str) -> list[str]:
+            if top in paths or top in pending: return [top]
+            return [p for p in paths.keys() | pending.keys() if p.startswith(top + os.sep)]
+        for event in events:
+            match event:
+                case ('modify', path): pending[path] = 'read'
+                case ('remove', top):
+                    for path in under(top): pending[path] = 'remove'
+                case ('rename', old, new) if old in paths or old in pending: # a track, which stays one only as music
+                    if is_music(new): pending[new] = pending.get(old, ('move', old) if old in paths else 'read')
+                    pending[old] = 'remove'
+                case ('rename', old, new):
+                    # a directory, or a temp file renamed over a track which is read like any other write
+                    for path in under(old) or ([old] if is_music(new) else []):
+                        pending[new + path[len(old):]] = pending.get(path, ('move', path) if path in paths else 'read')
+                        pending[path] = 'remove'
+        def unchanged(path: str) -> bool: # e.g. tags this library wrote itself
+            try: return path in paths and file_stat(path) == self.store.stat(paths[path])
+            except OSError: return False
+        pending = {path: action for path, action in pending.items()
+                   if (action != 'remove' or path in paths) and not (action == 'read' and unchanged(path))}
+        if not pending: return False
+
+        # moved tracks keep their id and metadata, rewritten ones keep their id
+        moves, ids = dict(), dict()
+        for path, action in pending.items():
+            if isinstance(action, tuple): moves[path] = (self.store.value(paths[action[1]], 'id'), self.store.record(paths[action[1]]))
+            elif action == 'read' and path in paths: ids[path] = self.store.value(paths[path], 'id')
+        gone = [path for path, action in pending.items() if action != 'read' and path in paths]
+        self.remove_rows(paths[path] for path in gone)
+        self.index.remove(gone)
+        for path, (id, record) in moves.items():
+            try: self.parsed.append(self.add_track(path, file_stat(path), (str(id), record)))
+            except OSError: continue
+        if jobs := [(pl.Path(path), self.art) for path, action in pending.items() if action == 'read']:
+            self.background(self.read(jobs, ids), "read changes")
+        if not (gone or moves): return False # only files to read, which show up once they're read
+        self.finish_scan()
+        return True
     
-    def update_artists(self, track):
-        for artist in track.artists:
-            artist_obj = Artist(artist)
-            track.attach_artist(artist_obj, main=(artist == track.albumartist))
-            if not artist in self.artists:
-                self.artists.append(Artist(artist))
-        # remove duplicates that could occur due to threading
-        self.artists = list(set(self.artists))
+    @metrics.timed('library.edit')
+    def edit(self, edits: dict[str, dict[str,]]) -> tuple[dict[str, Exception], float]:
+        """Writes field edits (path -> {field: value or None to remove it}) to many files through the worker pool and
+        updates the store and index from the files just written rather than a rescan. Returns the files that failed
+        (paths that aren't in the library among them) and files/s"""
+        start = time.perf_counter()
+        paths = self.store.paths()
+        edits = {str(path): fields for path, fields in edits.items()}
+        failed = {path: LookupError(f"{path} isn't in the library") for path in edits if path not in paths}
+        written = dict()
+        jobs = [(pl.Path(path), fields, self.art) for path, fields in edits.items() if path in paths]
+        for (path, _, _), result in self.workers.map(edit_file, jobs):
+            if isinstance(result, Exception):
+                log.warning(f"[{path.name}] Couldn't write tags: {result}", key="tag write")
+                failed[str(path)] = result
+                continue
+            # the tags are read back rather than patched in, so the track looks just like a rescan would have it
+            stat, meta = result
+            row = paths[str(path)]
+            written[str(path)] = (row, stat, (str(self.store.value(row, 'id')), complete_track(path, meta)))
+        self.remove_rows(row for row, _, _ in written.values())
+        for path, (_, stat, record) in written.items(): self.parsed.append(self.add_track(path, stat, record))
+        self.finish_scan()
+        rate = len(jobs)/max(time.perf_counter() - start, 1e-9)
+        metrics.count('edit.files', len(written))
+        metrics.count('edit.failed', len(failed))
+        return failed, rate
+
+    def frame_refs(self, row: int) -> str|None:
+        return self.store.value(row, 'frames')
+
+    def cover(self, row: int) -> str|tuple[str,str]|None:
+        """A track's art key, or (path, frames) when its cover is still only in the file"""
+        if art := self.store.value(row, 'art'): return art
+        if (refs := self.frame_refs(row)) and 'APIC' in refs: return (self.store.path(row), refs)
+        return None
+
+    def keep_covers(self, covers: list[tuple[tuple[str,str], str]]) -> None:
+        """Stores art keys of covers read from their files ((path, frames), key), so they're never read again"""
+        tracks = list()
+        for (path, refs), key in covers:
+            if (row := self.store.row(path)) is None or self.frame_refs(row) != refs: continue # changed since
+            self.store.set(row, 'art', key)
+            tracks.append(Track(self.store, row))
+        self.index.update(tracks)
+
+    def lyrics(self, row: int) -> str|None:
+        try: return self.frames.lyrics(self.store.path(row), self.frame_refs(row))
+        except (OSError, ValueError, mutagen.MutagenError) as e:
+            log.warning(f"[{self.store.value(row, 'name')}] Couldn't read lyrics: {e}", key="lyrics")
+            return None
+
+    def comments(self, row: int) -> list[str]:
+        try: return self.frames.comments(self.store.path(row), self.frame_refs(row))
+        except (OSError, ValueError, mutagen.MutagenError) as e:
+            log.warning(f"[{self.store.value(row, 'name')}] Couldn't read comments: {e}", key="comments")
+            return list()
+
+    def duplicates(self) -> list[list[Track]]:
+        """Groups of tracks with the same audio whatever their tags or file names, biggest group first"""
+        paths = self.store.paths()
+        tracks = {path: self.store.stat(row) for path, row in paths.items()}
+        groups = self.dupes.find(tracks, WorkerPool(self.prefs.workers))
+        return [[Track(self.store, paths[path]) for path in group] for group in groups]
+
+    def add_track(self, path: str, stat:tuple[int,int], record:tuple[str,dict[str,]]) -> Track:
+        return self.add_tracks([(path, stat, record)])[0]
+
+    def add_tracks(self, tracks: list[tuple[str, tuple[int,int], tuple[str,dict[str,]]]]) -> list[Track]:
+        """Adds (path, stat, (id, metadata)) to the store, search, sorts and groups a batch at a time"""
+        rows = self.store.extend([(path, stat, int(id), meta) for path, stat, (id, meta) in tracks])
+        added = list()
+        for row, (_, _, (id, meta)) in zip(rows, tracks):
+            self.search.add(row, [meta.get(field) for field in SearchIndex.FIELDS])
+            self.sorts.add(row, meta)
+            self.groups.add(int(id), split_artists(artist) if (artist := meta.get('artist')) else [], meta)
+            added.append(Track(self.store, row))
+        return added
+
+    def remove_rows(self, rows) -> None:
+        rows = list(rows)
+        self.search.remove({row: [self.store.value(row, field) for field in SearchIndex.FIELDS] for row in rows})
+        for row in rows: self.groups.remove(self.store.value(row, 'id'))
+        self.sorts.remove(rows)
+        self.store.remove(rows)
+
+    @property
+    def artists(self) -> list[Artist]:
+        return sorted(self.groups.artists.values())
         
+    @metrics.timed('library.update')
     def update_library(self):
         self.update_tracks()
-        for thread in self.threads:
-            thread.join()
-        self.update_track_paths()
+        self.finish_scan()
+
+    def update_frame(self) -> pd.DataFrame:
         self.tracks_df = self.__construct_tracks_df()
+        return self.tracks_df
     
+    @metrics.timed('library.frame')
     def __construct_tracks_df(self):
-        return pd.DataFrame([t.metadata for t in self.tracks]).astype({'tracknumber': int})
\ No newline at end of file
+        return self.store.frame()
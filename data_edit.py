@@ -0,0 +1,104 @@
+"""
+data_edit.py writes tag edits back to audio files.
+
+Edits use the same field names tracks are read with (title, artist, album, ...), a list writes several values and None
+removes the field. A file is never left half written:
+
+    ID3 with room     the new tag is written over the old one and its padding, the audio doesn't move. The old tag
+                      block is kept in memory and written back if the write fails
+    anything else     the file is copied next to itself, the copy is tagged and synced, then replaces the original in
+                      one rename. A failure only ever loses the copy
+"""
+import os, shutil
+import pathlib as pl
+import mutagen.id3, mutagen.mp4, mutagen.wave
+from data_tags import ID3_KEYS, MP4_KEYS, sniff, synchsafe
+import metrics
+
+ID3_FRAMES = {key: frame for frame, key in ID3_KEYS.items()}
+MP4_ATOMS = {key: atom for atom, key in MP4_KEYS.items()}
+
+class NoRoom(Exception):
+    """The edited tag doesn't fit in the space the old one takes up"""
+
+def keep_size(info: mutagen.PaddingInfo) -> int:
+    if info.padding < 0: raise NoRoom
+    return info.padding
+
+def values(value) -> list[str]:
+    return [str(v) for v in value] if isinstance(value, (list, tuple)) else [str(value)]
+
+def edit_id3(tags: mutagen.id3.ID3, edits: dict[str,]) -> None:
+    for key, value in edits.items():
+        if (frame := ID3_FRAMES.get(key)) is None: raise ValueError(f"can't write {key} to ID3")
+        tags.delall(frame)
+        if value is not None: tags.add(mutagen.id3.Frames[frame](encoding=3, text=values(value)))
+
+def edit_mp4(tags: mutagen.mp4.MP4Tags, edits: dict[str,]) -> None:
+    for key, value in edits.items():
+        if (atom := MP4_ATOMS.get(key)) is None: raise ValueError(f"can't write {key} to MP4")
+        tags.pop(atom, None)
+        if value is None: continue
+        match atom:
+            case 'trkn' | 'disk': tags[atom] = [(int(v), 0) for v in values(value)]
+            case 'tmpo': tags[atom] = [int(v) for v in values(value)]
+            case _: tags[atom] = values(value)
+
+def in_place(path: pl.Path, tags: mutagen.id3.ID3, version: int) -> bool:
+    """Rewrites an MP3's ID3 tag without moving the audio, False when there's no room for it"""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if (header := f.read(10))[:3] != b'ID3' or len(header) < 10: return False
+        f.seek(0)
+        head = f.read(10 + synchsafe(header[6:10]) + (10 if header[5] & 0x10 else 0))
+        f.seek(max(0, size - 128))
+        tail = f.read() # an ID3v1 tag is updated too
+    try: tags.save(path, v2_version=version, padding=keep_size)
+    except NoRoom: return False
+    except BaseException:
+        with open(path, 'r+b') as f:
+            f.write(head)
+            f.seek(size - len(tail))
+            f.write(tail)
+            f.truncate(size)
+        raise
+    return True
+
+def rewrite(path: pl.Path, save) -> None:
+    """Calls save(copy) on a copy of path and swaps the copy in"""
+    tmp = path.with_name(f".{path.name}.edit")
+    try:
+        shutil.copyfile(path, tmp)
+        save(tmp)
+        with open(tmp, 'rb+') as f: os.fsync(f.fileno())
+        shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+# module level so it can run in a process pool
+@metrics.timed('edit.write')
+def write_tags(path: pl.Path, edits: dict[str,]) -> tuple[int,int]:
+    """Writes edits to path and returns its new (size, mtime)"""
+    with open(path, 'rb') as f: kind = sniff(f.read(12))
+    match kind:
+        case "id3":
+            try: tags = mutagen.id3.ID3(path)
+            except mutagen.id3.ID3NoHeaderError: tags = mutagen.id3.ID3()
+            version = 3 if tags.version[1] == 3 else 4 # v2.3 tags stay v2.3 for players that can't read v2.4
+            edit_id3(tags, edits)
+            if version == 3: tags.update_to_v23()
+            if not in_place(path, tags, version): rewrite(path, lambda tmp: tags.save(tmp, v2_version=version))
+        case "mp4":
+            audio = mutagen.mp4.MP4(path)
+            if audio.tags is None: audio.add_tags()
+            edit_mp4(audio.tags, edits)
+            rewrite(path, audio.save)
+        case "wav":
+            audio = mutagen.wave.WAVE(path)
+            if audio.tags is None: audio.add_tags()
+            edit_id3(audio.tags, edits)
+            rewrite(path, audio.save)
+    st = os.stat(path)
+    return (st.st_size, st.st_mtime_ns)
@@ -0,0 +1,72 @@
+"""
+data_frames.py loads the heavy ID3 frames (cover art, lyrics, comments) a scan skipped over.
+
+A scan keeps only where each one is in the file, packed into the track's 'frames' field as "APIC3:1234+5678,USLT3:..."
+(frame id, ID3 version, offset, length). Asking for one seeks there, reads that frame alone and decodes it. Decoded
+frames are kept in a small LRU, and a frame that moved since the scan (the tag was rewritten) is found again by walking
+the tag's frame headers
+"""
+import io, threading
+from collections import OrderedDict
+import mutagen.id3
+from data_tags import Frames, id3_header, read_tags
+import metrics
+
+def encode(frames: Frames) -> str|None:
+    return ','.join(f"{kind}{version}:{offset}+{length}" for kind, version, offset, length in frames) or None
+
+def decode(text: str|None) -> Frames:
+    if not isinstance(text, str) or not text: return list()
+    frames = list()
+    for ref in text.split(','):
+        head, _, span = ref.partition(':')
+        offset, _, length = span.partition('+')
+        frames.append((head[:4], int(head[4:]), int(offset), int(length)))
+    return frames
+
+def read_frame(f, kind: str, version: int, offset: int, length: int) -> mutagen.id3.Frame|None:
+    """Decodes the frame at offset, None if what's there isn't that frame any more"""
+    f.seek(offset)
+    if len(data := f.read(length)) != length or data[:4] != kind.encode(): return None
+    tag = mutagen.id3.ID3(io.BytesIO(id3_header(version, length) + data), load_v1=False)
+    return next(iter(tag.getall(kind)), None)
+
+@metrics.timed('frames.load')
+def load(path: str, text: str|None, kind: str) -> list[mutagen.id3.Frame]:
+    """A file's frames of one kind (APIC, USLT, COMM or GEOB) from its recorded offsets"""
+    refs = [ref for ref in decode(text) if ref[0] == kind]
+    with open(path, 'rb') as f:
+        frames = [read_frame(f, *ref) for ref in refs]
+        if None in frames: # the tag changed since it was scanned
+            metrics.count('frames.stale')
+            frames = [read_frame(f, *ref) for ref in read_tags(path)[2] if ref[0] == kind]
+    return [frame for frame in frames if frame is not None]
+
+class FrameLoader:
+    def __init__(self, size:int = 16):
+        self.size = size
+        self.frames: OrderedDict[tuple[str, str, str], list[mutagen.id3.Frame]] = OrderedDict()
+        self.lock = threading.Lock() # covers are loaded from their worker thread
+
+    def load(self, path: str, text: str|None, kind: str) -> list[mutagen.id3.Frame]:
+        if not isinstance(text, str) or kind not in text: return list()
+        with self.lock:
+            if (frames := self.frames.get(key := (path, text, kind))) is not None:
+                self.frames.move_to_end(key)
+                return frames
+        frames = load(path, text, kind)
+        with self.lock:
+            self.frames[key] = frames
+            if len(self.frames) > self.size: self.frames.popitem(last=False)
+        return frames
+
+    def picture(self, path: str, text: str|None) -> bytes|None:
+        """The front cover, or the first picture if there's none"""
+        pictures = sorted(self.load(path, text, 'APIC'), key=lambda pic: pic.type != mutagen.id3.PictureType.COVER_FRONT)
+        return pictures[0].data if pictures else None
+
+    def lyrics(self, path: str, text: str|None) -> str|None:
+        return '\n\n'.join(frame.text for frame in self.load(path, text, 'USLT') if frame.text) or None
+
+    def comments(self, path: str, text: str|None) -> list[str]:
+        return [str(t) for frame in self.load(path, text, 'COMM') for t in frame.text if t]
@@ -0,0 +1,112 @@
+"""
+data_groups.py groups the library's tracks by artist and by album artist and album, for browsing by either.
+
+Names are matched on a normalized key (case folded, accents and punctuation dropped, the same tokens search uses), so
+"Björk" and "bjork" are one artist and the name first seen is the one shown. Groups hold track ids rather than store
+rows, which shift when tracks are removed, and are kept up to date a track at a time as the library changes
+"""
+import bisect
+from data_search import tokenize
+
+def key(name: str|None) -> str:
+    return ' '.join(tokenize(name)) or (name or '').strip()
+
+def number(value) -> int:
+    # "2/3" -> 2, anything else that isn't a number sorts first
+    value = str(value or '').split('/')[0].strip()
+    return int(value) if value.isdigit() else 0
+
+class Artist:
+    __slots__ = ('key', 'name', 'tracks')
+    def __init__(self, name: str):
+        self.key = key(name)
+        self.name = name
+        self.tracks: dict[int, None] = dict() # ids in the order they were added
+    def __hash__(self):
+        return hash(self.key)
+    def __eq__(self, other):
+        return isinstance(other, Artist) and self.key == other.key
+    def __lt__(self, other):
+        return self.key < other.key
+    def __len__(self):
+        return len(self.tracks)
+    def __str__(self):
+        return self.name
+    def __repr__(self):
+        return f"Artist('{self.name}')"
+
+class Album:
+    __slots__ = ('key', 'name', 'artist', 'tracks')
+    def __init__(self, name: str, artist: str):
+        self.key = key(name)
+        self.name = name
+        self.artist = artist
+        self.tracks: list[tuple[int, int, str, int]] = list() # (disc, number, title, id), in album order
+    def __lt__(self, other):
+        return self.key < other.key
+    def __len__(self):
+        return len(self.tracks)
+    def __str__(self):
+        return self.name
+    def __repr__(self):
+        return f"Album('{self.name}', '{self.artist}')"
+    @property
+    def ids(self) -> list[int]:
+        return [entry[-1] for entry in self.tracks]
+
+class Groups:
+    def __init__(self):
+        self.artists: dict[str, Artist] = dict()
+        self.albumartists: dict[str, dict[str, Album]] = dict() # album artist key -> album key -> album
+        self.names: dict[str, str] = dict() # album artist key -> name shown
+        self.entries: dict[int, tuple] = dict() # id -> what it was filed under, to take it out again
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, id: int, artists: list[str], meta: dict[str,]) -> None:
+        """Files a track under each of its artists and its album artist's album"""
+        if id in self.entries: self.remove(id)
+        keys = list()
+        for name in artists:
+            if not (k := key(name)) or k in keys: continue # "Björk/bjork" is one artist
+            if (artist := self.artists.get(k)) is None: artist = self.artists[k] = Artist(name)
+            artist.tracks[id] = None
+            keys.append(k)
+        album = None
+        if (name := meta.get('album')) and (artist_key := key(owner := meta.get('albumartist') or '')):
+            albums = self.albumartists.setdefault(artist_key, dict())
+            self.names.setdefault(artist_key, owner)
+            if (album := albums.get(album_key := key(name))) is None: album = albums[album_key] = Album(name, owner)
+            bisect.insort(album.tracks, entry := (number(meta.get('discnumber')), number(meta.get('tracknumber')),
+                                                  meta.get('title') or '', id))
+            album = (artist_key, album_key, entry)
+        self.entries[id] = (keys, album)
+
+    def remove(self, id: int) -> None:
+        if (entry := self.entries.pop(id, None)) is None: return
+        keys, album = entry
+        for k in keys:
+            artist = self.artists[k]
+            artist.tracks.pop(id, None)
+            if not artist.tracks: del self.artists[k]
+        if album is None: return
+        artist_key, album_key, entry = album
+        albums = self.albumartists[artist_key]
+        tracks = albums[album_key].tracks
+        del tracks[bisect.bisect_left(tracks, entry)]
+        if tracks: return
+        del albums[album_key]
+        if not albums:
+            del self.albumartists[artist_key]
+            del self.names[artist_key]
+
+    def artist(self, name: str) -> Artist|None:
+        return self.artists.get(key(name))
+
+    def albums(self, albumartist: str) -> list[Album]:
+        """An album artist's albums by name"""
+        return sorted(self.albumartists.get(key(albumartist), dict()).values())
+
+    def album(self, albumartist: str, name: str) -> Album|None:
+        return self.albumartists.get(key(albumartist), dict()).get(key(name))
@@ -0,0 +1,89 @@
+"""
+data_index.py keeps a persistent SQLite index of the library so a launch only has to re-read files that changed.
+
+Rows are keyed by path and store the file size and mtime the metadata was extracted from. Every write bumps the index's
+generation, and the library built from it (store, search, sorts and groups) is pickled next to it when the player closes
+along with the generation it matches, so a launch after a clean exit loads that instead of building it all again
+"""
+import gc, json, os, pickle, sqlite3, threading
+import log, metrics
+
+class LibraryIndex:
+    VERSION = 4 # bump when the stored metadata changes shape, older indexes are rebuilt
+    SNAPSHOT = 2 # bump when the pickled classes change shape, older snapshots are ignored
+    def __init__(self, directory:str = "./data/library.db"):
+        self.directory = directory
+        self.snapshot = os.path.splitext(directory)[0] + ".snapshot"
+        # built on the loader thread and then used from the Tk thread, one at a time
+        self.conn = sqlite3.connect(directory, check_same_thread=False)
+        self.lock = threading.Lock()
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS tracks")
+            self.conn.execute(f"PRAGMA user_version = {self.VERSION}")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tracks (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                          "mtime INTEGER NOT NULL, id TEXT NOT NULL, metadata TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS generation (value INTEGER NOT NULL)")
+        if self.conn.execute("SELECT COUNT(*) FROM generation").fetchone()[0] == 0:
+            self.conn.execute("INSERT INTO generation VALUES (0)")
+        self.conn.commit()
+
+    def __len__(self):
+        with self.lock: return self.conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    @property
+    def generation(self) -> int:
+        with self.lock: return self.conn.execute("SELECT value FROM generation").fetchone()[0]
+
+    @metrics.timed('index.load')
+    def load(self) -> dict[str, tuple[int, int, str, dict[str,]]]:
+        with self.lock: rows = self.conn.execute("SELECT path, size, mtime, id, metadata FROM tracks").fetchall()
+        metas = json.loads(f"[{','.join(row[4] for row in rows)}]") # one decode instead of one per track
+        return {path: (size, mtime, id, meta) for (path, size, mtime, id, _), meta in zip(rows, metas)}
+
+    def write(self, sql: str, rows: list[tuple]) -> None:
+        if not rows: return
+        with self.lock:
+            self.conn.executemany(sql, rows)
+            self.conn.execute("UPDATE generation SET value = value + 1")
+            self.conn.commit()
+
+    @metrics.timed('index.update')
+    def update(self, tracks) -> None:
+        self.write("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?)",
+                   [(str(t.path), *t.stat, t.id, json.dumps(t.to_record())) for t in tracks])
+
+    def remove(self, paths) -> None:
+        self.write("DELETE FROM tracks WHERE path = ?", [(str(p),) for p in paths])
+
+    @metrics.timed('index.save_snapshot')
+    def save_snapshot(self, state) -> None:
+        """Pickles state, built from the index as it is now"""
+        tmp = f"{self.snapshot}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump((self.VERSION, self.SNAPSHOT, self.generation), f)
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.snapshot)
+        except OSError as e:
+            log.warning(f"Couldn't save the library snapshot: {e}", key="snapshot")
+            try: os.remove(tmp)
+            except OSError: pass
+
+    @metrics.timed('index.load_snapshot')
+    def load_snapshot(self):
+        """The state last saved, None if there's none or the index has been written since"""
+        try:
+            with open(self.snapshot, 'rb') as f:
+                if pickle.load(f) != (self.VERSION, self.SNAPSHOT, self.generation): return None
+                gc.disable() # collections triggered by the many small objects being loaded cost more than the load
+                try: return pickle.load(f)
+                finally:
+                    gc.freeze() # and they're there for good, so later collections can skip them
+                    gc.enable()
+        except FileNotFoundError: return None
+        except Exception as e: # cut short, or pickled from classes that have changed since
+            log.warning(f"Couldn't load the library snapshot: {e}", key="snapshot")
+            return None
+
+    def close(self) -> None:
+        with self.lock: self.conn.close()
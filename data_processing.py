@@ -1,11 +1,12 @@
 """
 main data processing module (TODO)
 """
-import json, mutagen, os
+import functools, hashlib, itertools, json, mutagen, os, pickle
 import pathlib as pl
 import mutagen.id3
 import pandas as pd
-import warnings, log
+import log
+from data_scan import Discovery
 
 def setup():
     lib = Library()
@@ -72,7 +73,7 @@ class ID3Tag:
                 case "map": return meta.getall(self.id)[0].text[0] # TODO: map values
                 case "struct": return meta.getall(self.id)[0] # TODO: implement struct
         except:
-            log.warning(f"Couldn't extract values for {self.id}")
+            log.warning(f"Couldn't extract values for {self.id}", key="tag value")
             return None
 
 class ID3TagList:
@@ -168,11 +169,11 @@ class Track:
     def to_dict(self):
         known_dict = {"Title": self.title, "Album Artist": self.album_artist, "Artists": "; ".join(self.artists),
                 "Album": self.album, "Track #": self.track_num or 0}
-        ref = make_id3_tags()
+        ref = compile_id3_tags()
         for key in self.metadata.tags.keys():
             if key in ['TIT2', 'TPE1', 'TPE2', 'TALB', 'TRCK']: continue
             tag = ref.get_tag_by_id(key)
-            if not tag: log.warning(f"[{self.title}] Can't find tag {key}"); continue
+            if not tag: log.warning(f"[{self.title}] Can't find tag {key}", key="unknown tag"); continue
             try: known_dict.update({tag.name:tag.get_value(self.metadata.tags)})
             except: continue
         return(known_dict)
@@ -192,20 +193,20 @@ class Library:
         return({track.path for track in self.tracks})
     
     def extract_albums(self) -> list[tuple[str, str]]:
-        {(track.album_artist[0], track.album) for track in self.tracks}
+        """(album artist, album) pairs, falling back on the first artist where there's no album artist"""
+        albums = {(track.album_artist or (track.artists[0] if track.artists else None), track.album)
+                  for track in self.tracks if track.album}
+        return sorted(albums, key=lambda album: (album[0] or "", album[1]))
 
     def update_library(self) -> list[Track]:
-        files = set()
-        for d in self.prefs.dirs:
-            for ext in self.prefs.exts:
-                files = files.union({f for f in pl.Path(d).rglob(f'*{ext}') if f.is_file()})
+        files = {path for path, _ in Discovery(self.prefs.dirs, self.prefs.exts)}
         self.tracks = [track for track in self.tracks if not track.path in self.track_paths - files] # remove missing tracks
         self.tracks += [Track(path) for path in files - self.track_paths] # add new tracks to list
         self.update_track_paths()
 
 def copy_tags(tag, base) -> ID3Tag:
     for key, val in base.__dict__.items():
-        if not "__" in key and not callable(base.__dict__[key]):
+        if not "__" in key and key not in ('id', 'depth') and not callable(base.__dict__[key]):
             tag.__dict__.update({key:val})
     return tag
 
@@ -219,4 +220,82 @@ def make_id3_tags(directory:str = "./data/reference.json") -> ID3TagList:
             if copy_tag: tag = copy_tags(tag, copy_tag)
             else:  log.warning(f"{tag.id} is a copy of {tag.copy_id}, but {tag.copy_id} doesn't exist at depth ({tag.copy_d})")
     
-    return tag_list
\ No newline at end of file
+    return tag_list
+
+def _get_str(id, meta): return meta.getall(id)[0].text[0]
+def _get_int(id, meta): return int(meta.getall(id)[0].text[0])
+def _get_list(id, meta): return meta.getall(id)[0].text[0].split('/')
+def _get_map(id, meta): return meta.getall(id)[0].text[0] # TODO: map values
+def _get_struct(id, meta): return meta.getall(id)[0] # TODO: implement struct
+EXTRACTORS = {"str": _get_str, "int": _get_int, "list": _get_list, "map": _get_map, "struct": _get_struct}
+
+class CompiledTag:
+    """Read-only ID3Tag with copies already resolved and its value extractor picked ahead of time"""
+    __slots__ = ('id', 'name', 'tag_type', 'depth', 'supported', 'map_values', 'subtags', 'extract')
+    def __init__(self, id:str, name:str, tag_type:str, depth:int, supported:bool,
+                 map_values:dict[str,str]|None = None, subtags:tuple = ()):
+        for key, val in zip(self.__slots__, (id, name, tag_type, depth, supported, map_values, subtags)):
+            object.__setattr__(self, key, val)
+        extract = EXTRACTORS.get(tag_type) if supported else None
+        object.__setattr__(self, 'extract', functools.partial(extract, id) if extract else None)
+
+    def __setattr__(self, key, val):
+        raise AttributeError(f"CompiledTag is read-only, can't set {key}")
+
+    def __reduce__(self):
+        return (CompiledTag, (self.id, self.name, self.tag_type, self.depth, self.supported, self.map_values, self.subtags))
+
+    def __repr__(self):
+        return f"CompiledTag('{self.id}', '{self.name}', '{self.tag_type}')"
+
+    @classmethod
+    def from_tag(cls, tag: ID3Tag) -> "CompiledTag":
+        subtags = tuple(cls.from_tag(t) for t in tag.subtags.tags) if tag.supported and tag.tag_type == "struct" else ()
+        return cls(tag.id, tag.name, tag.tag_type, tag.depth, tag.supported, tag.__dict__.get('map_values'), subtags)
+
+    def get_value(self, meta):
+        if self.extract is None: return None
+        try: return self.extract(meta)
+        except:
+            log.warning(f"Couldn't extract values for {self.id}", key="tag value")
+            return None
+
+class TagReference:
+    """Compiled ID3TagList, get_tag_by_id is a dict lookup at every depth"""
+    __slots__ = ('tags', 'index')
+    def __init__(self, tags: tuple[CompiledTag, ...]):
+        self.tags = tags
+        self.index: dict[tuple[str,int], CompiledTag] = dict()
+        # matches ID3TagList.get_tag_by_id: first tag wins, deeper tags are only reached through supported structs
+        level = list(tags)
+        for depth in itertools.count():
+            if not level: break
+            for tag in level: self.index.setdefault((tag.id, depth), tag)
+            level = [st for tag in level if tag.supported and tag.tag_type == "struct" for st in tag.subtags]
+
+    def __getstate__(self):
+        return self.tags
+
+    def __setstate__(self, tags):
+        self.__init__(tags)
+
+    def get_tag_by_id(self, id, depth:int=0) -> CompiledTag|None:
+        return self.index.get((id, depth))
+
+@functools.cache
+def compile_id3_tags(directory:str = "./data/reference.json", cache:str|None = "./data/reference.cache") -> TagReference:
+    """Compiles the tag reference once per process, reusing the on-disk copy while the JSON is unchanged"""
+    with open(directory, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    if cache and os.path.exists(cache):
+        try:
+            with open(cache, "rb") as f:
+                cached_digest, ref = pickle.load(f)
+            if cached_digest == digest: return ref
+        except Exception: pass # stale or unreadable, rebuild it
+    ref = TagReference(tuple(CompiledTag.from_tag(tag) for tag in make_id3_tags(directory).tags))
+    if cache:
+        with open(tmp := f"{cache}.{os.getpid()}.tmp", "wb") as f:
+            pickle.dump((digest, ref), f)
+        os.replace(tmp, cache)
+    return ref
@@ -0,0 +1,64 @@
+"""
+data_scan.py finds the music files in the library directories.
+
+Every root is walked once with os.scandir, matching all extensions in the same pass, and independent roots are walked
+concurrently. Paths are streamed out as they're found together with the (size, mtime) the library index is keyed on.
+Each root's file count and walk time go to metrics as scan.root.files:<root> and scan.root:<root>
+"""
+import os, queue, threading, time
+import pathlib as pl
+import metrics
+
+class Discovery:
+    def __init__(self, roots, exts):
+        self.roots: list[pl.Path] = list(dict.fromkeys(pl.Path(r).expanduser() for r in roots))
+        self.exts: set[str] = {e.lower() for e in exts}
+        self.stats: dict[pl.Path, tuple[int, float]] = dict() # root -> (files found, seconds)
+
+    def __iter__(self):
+        found = queue.SimpleQueue()
+        for root in self.roots:
+            threading.Thread(target=self.walk_root, args=(root, found), daemon=True).start()
+        done = 0
+        while done < len(self.roots):
+            if (items := found.get()) is None: done += 1
+            else: yield from items
+
+    def __str__(self):
+        return "\n".join("{:50s}{:>8d} files {:8.2f}s".format(str(r), *self.stats[r]) for r in self.roots if r in self.stats)
+
+    def walk_root(self, root: pl.Path, found: queue.SimpleQueue, batch:int = 256) -> None:
+        start, count, items = time.perf_counter(), 0, list()
+        try:
+            for item in self.walk(root):
+                items.append(item)
+                if len(items) == batch: # handing over one path at a time costs more than the walk
+                    found.put(items)
+                    count, items = count + len(items), list()
+            if items: found.put(items)
+            count += len(items)
+        finally:
+            self.stats[root] = (count, seconds := time.perf_counter()-start)
+            metrics.count(f'scan.root.files:{root}', count)
+            metrics.observe(f'scan.root:{root}', seconds*1e3)
+            found.put(None)
+
+    def walk(self, root: pl.Path):
+        dirs, seen = [str(root)], set()
+        try: seen.add(((st := os.stat(root)).st_dev, st.st_ino)) # a link back to the root isn't walked again either
+        except OSError: return
+        while dirs:
+            try: it = os.scandir(dirs.pop())
+            except OSError: continue
+            with it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            st = entry.stat()
+                            if (st.st_dev, st.st_ino) in seen: continue # symlink loop
+                            seen.add((st.st_dev, st.st_ino))
+                            dirs.append(entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in self.exts and entry.is_file():
+                            st = entry.stat()
+                            yield pl.Path(entry.path), (st.st_size, st.st_mtime_ns)
+                    except OSError: continue
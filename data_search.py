@@ -0,0 +1,86 @@
+"""
+data_search.py is the as-you-type search over the library.
+
+Titles, artists, album artists and albums are split into normalized tokens (case folded, accents stripped) and each
+token keeps the store rows it appears in. A sorted vocabulary turns every query word into a prefix range, so a query is a
+couple of bisects and array intersections no matter how big the library is. Results are TrackStore rows, which are also
+the rows of tracks_df
+"""
+import bisect, functools, re, unicodedata
+from array import array
+from collections import OrderedDict
+import numpy as np
+import metrics
+
+TOKEN = re.compile(r"\w+")
+
+@functools.lru_cache(maxsize=1<<16) # artists and albums repeat a lot
+def tokenize(text) -> tuple[str, ...]:
+    if not isinstance(text, str): return tuple()
+    if text.isascii(): return tuple(TOKEN.findall(text.lower()))
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return tuple(TOKEN.findall(''.join(c for c in text if not unicodedata.combining(c))))
+
+class SearchIndex:
+    FIELDS = ('title', 'artist', 'albumartist', 'album')
+    def __init__(self, cached:int = 64):
+        self.postings: dict[str, array] = dict() # token -> rows
+        self.vocab: list[str] = list() # sorted tokens
+        self.cached = cached
+        self.prefixes: OrderedDict[str, np.ndarray] = OrderedDict()
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def __getstate__(self):
+        return {**self.__dict__, 'prefixes': OrderedDict()} # cached results aren't worth saving
+
+    def add(self, row: int, texts) -> None:
+        for token in {t for text in texts for t in tokenize(text)}:
+            if (rows := self.postings.get(token)) is None:
+                rows = self.postings[token] = array('I')
+                bisect.insort(self.vocab, token)
+            rows.append(row)
+        self.prefixes.clear()
+
+    def remove(self, removed: dict[int, tuple]) -> None:
+        """Drops rows (row -> the texts it was added with) and shifts the rows after them down like TrackStore.remove"""
+        if not removed: return
+        for row, texts in removed.items():
+            for token in {t for text in texts for t in tokenize(text)}:
+                if (rows := self.postings.get(token)) is None: continue
+                rows.remove(row)
+                if not rows:
+                    del self.postings[token]
+                    del self.vocab[bisect.bisect_left(self.vocab, token)]
+        gone = np.array(sorted(removed), dtype=np.int64)
+        for token, rows in self.postings.items():
+            shifted = np.frombuffer(rows, dtype=np.uint32).astype(np.int64)
+            self.postings[token] = array('I', (shifted - np.searchsorted(gone, shifted)).astype(np.uint32).tobytes())
+        self.prefixes.clear()
+
+    def prefix(self, token: str) -> np.ndarray:
+        if (rows := self.prefixes.get(token)) is not None:
+            self.prefixes.move_to_end(token)
+            return rows
+        lo = bisect.bisect_left(self.vocab, token)
+        hi = bisect.bisect_left(self.vocab, token + '\U0010ffff', lo)
+        matches = [np.frombuffer(self.postings[t], dtype=np.uint32) for t in self.vocab[lo:hi]]
+        if not matches: rows = np.empty(0, dtype=np.uint32)
+        elif len(matches) == 1: rows = matches[0].copy() # views would pin the postings and block appends
+        else: rows = np.unique(np.concatenate(matches))
+        self.prefixes[token] = rows
+        if len(self.prefixes) > self.cached: self.prefixes.popitem(last=False)
+        return rows
+
+    @metrics.timed('search.query')
+    def query(self, text: str) -> np.ndarray|None:
+        """Rows matching every word of text as a prefix, None if text has no words"""
+        if not (tokens := tokenize(text)): return None
+        # rarest word first so the intersections stay small
+        found = sorted((self.prefix(t) for t in set(tokens)), key=len)
+        rows = found[0]
+        for other in found[1:]:
+            if not len(rows): break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
@@ -0,0 +1,87 @@
+"""
+data_sort.py keeps the library sorted by every column the track list can be sorted by.
+
+Each track gets a collation key per column when it's added: text is case folded and stripped of accents, a leading
+article ("The Beatles" sorts as "Beatles") and numbers compare by value, so "Track 2" comes before "Track 10". Every
+column keeps its keys in order with the store rows they belong to, and tracks that arrive are sorted among themselves
+and merged in with a binary search, so a column is never sorted from scratch and clicking a heading only looks up its
+permutation
+"""
+import functools, operator, re, unicodedata
+import numpy as np
+
+ARTICLES = ('the ', 'a ', 'an ')
+DIGITS = re.compile(r"\d+")
+MISSING = '\U0010ffff' # after every real key, tracks without a value go last
+
+@functools.lru_cache(maxsize=1<<16) # artists and albums repeat a lot
+def collate(text) -> str:
+    if not isinstance(text, str) or not (text := text.strip()): return MISSING
+    text = text.casefold()
+    if not text.isascii(): text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    for article in ARTICLES:
+        if text.startswith(article) and len(text) > len(article):
+            text = text[len(article):].lstrip()
+            break
+    return DIGITS.sub(lambda m: m.group().zfill(10), text)
+
+def number(value) -> int:
+    return int(value) if isinstance(value, int) and value > 0 else 1<<16 # no track number goes last
+
+class SortIndex:
+    # column -> fields compared in turn, the first one is what the column shows
+    COLUMNS = {'title': ('title', 'artist', 'album'),
+               'artist': ('artist', 'album', 'tracknumber', 'title'),
+               'album': ('albumartist', 'album', 'tracknumber', 'title'),
+               'tracknumber': ('tracknumber', 'albumartist', 'album', 'title')}
+    def __init__(self):
+        self.keys: dict[str, np.ndarray] = {column: np.empty(0, dtype=object) for column in self.COLUMNS} # sorted
+        self.orders: dict[str, np.ndarray] = {column: np.empty(0, dtype=np.int64) for column in self.COLUMNS}
+        self.pending: list[tuple[int, dict[str,]]] = list() # added since the last merge
+
+    def __len__(self):
+        return len(self.orders['title']) + len(self.pending)
+
+    def __getstate__(self):
+        self.merge()
+        return self.__dict__
+
+    @staticmethod
+    def collated(meta: dict[str,]) -> dict[str,]:
+        """A track's collation key for each field the columns compare"""
+        return {'title': collate(meta.get('title')), 'artist': collate(meta.get('artist')),
+                'albumartist': collate(meta.get('albumartist')), 'album': collate(meta.get('album')),
+                'tracknumber': number(meta.get('tracknumber'))}
+
+    def add(self, row: int, meta: dict[str,]) -> None:
+        self.pending.append((row, meta))
+
+    def merge(self) -> None:
+        if not self.pending: return
+        rows = np.fromiter((row for row, _ in self.pending), dtype=np.int64, count=len(self.pending))
+        collated = [self.collated(meta) for _, meta in self.pending]
+        for column, fields in self.COLUMNS.items():
+            keys = np.empty(len(rows), dtype=object)
+            keys[:] = list(map(operator.itemgetter(*fields), collated))
+            order = np.argsort(keys, kind='stable')
+            keys, added = keys[order], rows[order]
+            at = np.searchsorted(self.keys[column], keys, side='right')
+            self.keys[column] = np.insert(self.keys[column], at, keys)
+            self.orders[column] = np.insert(self.orders[column], at, added)
+        self.pending.clear()
+
+    def remove(self, rows) -> None:
+        """Drops rows and shifts the rows after them down like TrackStore.remove"""
+        self.merge()
+        if not len(gone := np.unique(np.fromiter(rows, dtype=np.int64))): return
+        for column in self.COLUMNS:
+            order = self.orders[column]
+            keep = ~np.isin(order, gone)
+            order = order[keep]
+            self.keys[column] = self.keys[column][keep]
+            self.orders[column] = order - np.searchsorted(gone, order)
+
+    def order(self, column: str, descending:bool = False) -> np.ndarray:
+        """Store rows sorted by a column"""
+        self.merge()
+        return self.orders[column][::-1] if descending else self.orders[column]
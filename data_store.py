@@ -0,0 +1,179 @@
+"""
+data_store.py holds the library's track metadata in columns instead of one dict and object per track.
+
+Text columns that repeat (directory, artist, album, albumartist, art and any other tag) are interned and stored as
+int32 codes, numbers live in numpy arrays and only the file name, title and frame offsets, which are different for
+every track, are kept as one string per track. The
+DataFrame the player uses is built over these arrays (categoricals share the codes) rather than from a list of dicts
+"""
+import os, sys
+import numpy as np
+import pandas as pd
+
+class Interned:
+    def __init__(self):
+        self.values: list[str] = list()
+        self.lookup: dict[str, int] = dict()
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value: str|None) -> int:
+        if value is None or value == '': return -1
+        if (code := self.lookup.get(value)) is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+    def value(self, code: int) -> str|None:
+        return None if code < 0 else self.values[code]
+
+class TrackStore:
+    TEXT = ('name', 'title', 'frames') # one string (or None) per track, nothing to share between tracks
+    NUMBERS = {'id': np.int32, 'tracknumber': np.uint16, 'size': np.int64, 'mtime': np.int64}
+    CATEGORIES = ('dir', 'artist', 'album', 'albumartist', 'art') # always present, other tags are added as they show up
+
+    def __init__(self, capacity:int = 1024):
+        self.n = 0
+        self.capacity = capacity
+        self.text: dict[str, np.ndarray] = {name: np.empty(capacity, dtype=object) for name in self.TEXT}
+        self.numbers: dict[str, np.ndarray] = {name: np.zeros(capacity, dtype=t) for name, t in self.NUMBERS.items()}
+        self.categories: dict[str, tuple[Interned, np.ndarray]] = dict()
+        self.ids: dict[int, int] = dict() # id -> row
+        self.orphans = False # interned values may have lost their last track, see compact
+        for name in self.CATEGORIES: self.add_category(name)
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, path: str):
+        return self.row(path) is not None
+
+    def row(self, path: str) -> int|None:
+        directory, name = os.path.split(path)
+        interned, codes = self.categories['dir']
+        if (code := interned.lookup.get(directory)) is None: return None
+        for row in np.flatnonzero(codes[:self.n] == code):
+            if self.text['name'][row] == name: return int(row)
+        return None
+
+    def find(self, id: int) -> int|None:
+        """Row of the track with an id"""
+        return self.ids.get(id)
+
+    def path(self, row: int) -> str:
+        return os.path.join(self.value(row, 'dir'), self.text['name'][row])
+
+    def paths(self) -> dict[str, int]:
+        """path -> row for every track, built on demand since it costs more than the store itself"""
+        dirs, codes = self.categories['dir']
+        return {os.path.join(dirs.values[code], name): row
+                for row, (code, name) in enumerate(zip(codes[:self.n].tolist(), self.text['name'][:self.n]))}
+
+    def add_category(self, name: str) -> None:
+        self.categories[name] = (Interned(), np.full(self.capacity, -1, dtype=np.int32))
+
+    def grow(self) -> None:
+        self.capacity += self.capacity//2
+        def grown(col: np.ndarray, fill) -> np.ndarray:
+            new = np.full(self.capacity, fill, dtype=col.dtype)
+            new[:self.n] = col[:self.n]
+            return new
+        self.text = {name: grown(col, None) for name, col in self.text.items()}
+        self.numbers = {name: grown(col, 0) for name, col in self.numbers.items()}
+        self.categories = {name: (interned, grown(codes, -1)) for name, (interned, codes) in self.categories.items()}
+
+    def append(self, path: str, stat: tuple[int,int], id: int, meta: dict[str,]) -> int:
+        """Adds a track from its completed metadata and returns its row, the path must not be in the store yet"""
+        return self.extend([(path, stat, id, meta)]).start
+
+    def extend(self, tracks: list[tuple[str, tuple[int,int], int, dict[str,]]]) -> range:
+        """Adds (path, stat, id, meta) for many tracks a column at a time and returns their rows"""
+        while self.n + len(tracks) > self.capacity: self.grow()
+        start, stop = self.n, self.n + len(tracks)
+        metas = [meta for *_, meta in tracks]
+        split = [os.path.split(path) for path, *_ in tracks]
+        self.text['name'][start:stop] = [name for _, name in split]
+        dirs, codes = self.categories['dir']
+        codes[start:stop] = [dirs.code(directory) for directory, _ in split]
+        for name in self.TEXT[1:]: self.text[name][start:stop] = [meta.get(name) for meta in metas]
+        self.numbers['id'][start:stop] = ids = [id for _, _, id, _ in tracks]
+        self.ids.update(zip(ids, range(start, stop)))
+        self.numbers['tracknumber'][start:stop] = [min(meta.get('tracknumber') or 0, 65535) for meta in metas]
+        self.numbers['size'][start:stop] = [stat[0] for _, stat, _, _ in tracks]
+        self.numbers['mtime'][start:stop] = [stat[1] for _, stat, _, _ in tracks]
+        for name in {name for meta in metas for name in meta}:
+            if name in self.TEXT or name in self.NUMBERS or name == 'dir': continue
+            if name not in self.categories: self.add_category(name)
+            interned, codes = self.categories[name]
+            codes[start:stop] = [interned.code(meta.get(name)) for meta in metas]
+        self.n = stop
+        return range(start, stop)
+
+    def remove(self, rows) -> None:
+        """Drops rows and compacts the columns, rows after the first removed one shift down"""
+        if not len(rows := list(rows)): return
+        keep = np.ones(self.n, dtype=bool)
+        keep[rows] = False
+        n = int(keep.sum())
+        for cols in (self.text, self.numbers):
+            for col in cols.values():
+                col[:n] = col[:self.n][keep]
+                if col.dtype == object: col[n:self.n] = None
+        for _, codes in self.categories.values():
+            codes[:n] = codes[:self.n][keep]
+            codes[n:self.n] = -1
+        self.n = n
+        self.ids = dict(zip(self.numbers['id'][:n].tolist(), range(n)))
+        self.orphans = True
+
+    def compact(self) -> None:
+        """Drops interned values no track uses any more (the artist of the last removed track and so on), codes change"""
+        if not self.orphans: return
+        for name, (interned, codes) in self.categories.items():
+            used = np.zeros(len(interned) + 1, dtype=bool) # the last one stands in for -1
+            used[codes[:self.n]] = True
+            if used[:-1].all(): continue
+            kept, remap = np.flatnonzero(used[:-1]), np.full(len(used), -1, dtype=np.int32)
+            remap[kept] = np.arange(len(kept), dtype=np.int32)
+            codes[:self.n] = remap[codes[:self.n]]
+            compacted = Interned()
+            compacted.values = [interned.values[code] for code in kept.tolist()]
+            compacted.lookup = dict(zip(compacted.values, range(len(kept))))
+            self.categories[name] = (compacted, codes)
+        self.orphans = False
+
+    def value(self, row: int, name: str):
+        if name in self.text: return self.text[name][row]
+        if name in self.numbers: return int(self.numbers[name][row])
+        if name in self.categories:
+            interned, codes = self.categories[name]
+            return interned.value(int(codes[row]))
+        raise KeyError(name)
+
+    def set(self, row: int, name: str, value: str|None) -> None:
+        """Changes one interned field of a track, e.g. art found after the scan"""
+        if name not in self.categories: self.add_category(name)
+        interned, codes = self.categories[name]
+        codes[row] = interned.code(value)
+        self.orphans = True
+
+    def stat(self, row: int) -> tuple[int,int]:
+        return (int(self.numbers['size'][row]), int(self.numbers['mtime'][row]))
+
+    def record(self, row: int) -> dict[str,]:
+        record = {'title': self.text['title'][row], 'tracknumber': int(self.numbers['tracknumber'][row])}
+        if (frames := self.text['frames'][row]) is not None: record['frames'] = frames
+        for name, (interned, codes) in self.categories.items():
+            if name != 'dir' and (value := interned.value(int(codes[row]))) is not None: record[name] = value
+        return record
+
+    def frame(self) -> pd.DataFrame:
+        """DataFrame of every track, copied so later changes to the store don't show up in frames already handed out"""
+        n = self.n
+        columns = {name: col[:n].copy() for name, col in self.text.items()}
+        columns.update({name: col[:n].copy() for name, col in self.numbers.items() if name not in ('size', 'mtime')})
+        for name, (interned, codes) in self.categories.items():
+            columns[name] = pd.Categorical.from_codes(codes[:n].copy(), categories=pd.Index(interned.values, dtype=object),
+                                                      validate=False)
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,134 @@
+"""
+data_tags.py reads the tags of an audio file with a single open.
+
+The parser is picked from the container header (ID3/MP3, MP4 atoms, RIFF/WAV) instead of the extension, and only the
+tag blocks are read, never the audio. Text fields come back with EasyID3 style keys so the rest of the app doesn't care
+which container a track came from.
+
+Heavy ID3 frames (HEAVY: cover art, lyrics, comments and embedded objects) aren't read at all. Their offset and length
+in the file are returned instead so data_frames can load one when it's asked for
+"""
+import io, struct
+import pathlib as pl
+import mutagen.id3, mutagen.mp4
+
+ID3_KEYS = {'TIT2': 'title', 'TPE1': 'artist', 'TPE2': 'albumartist', 'TALB': 'album', 'TRCK': 'tracknumber',
+            'TPOS': 'discnumber', 'TDRC': 'date', 'TDOR': 'originaldate', 'TCON': 'genre', 'TCOM': 'composer',
+            'TEXT': 'lyricist', 'TPE3': 'conductor', 'TBPM': 'bpm', 'TCOP': 'copyright', 'TENC': 'encodedby',
+            'TIT1': 'grouping', 'TIT3': 'version', 'TMED': 'media', 'TLAN': 'language', 'TSRC': 'isrc',
+            'TPUB': 'organization', 'TSST': 'discsubtitle', 'TCMP': 'compilation', 'TMOO': 'mood',
+            'TSOA': 'albumsort', 'TSOP': 'artistsort', 'TSO2': 'albumartistsort', 'TSOT': 'titlesort'}
+MP4_KEYS = {'\xa9nam': 'title', '\xa9ART': 'artist', 'aART': 'albumartist', '\xa9alb': 'album', 'trkn': 'tracknumber',
+            'disk': 'discnumber', '\xa9day': 'date', '\xa9gen': 'genre', '\xa9wrt': 'composer', '\xa9grp': 'grouping',
+            'cprt': 'copyright', 'tmpo': 'bpm', 'soal': 'albumsort', 'soar': 'artistsort', 'soaa': 'albumartistsort',
+            'sonm': 'titlesort'}
+RIFF_KEYS = {b'INAM': 'title', b'IART': 'artist', b'IPRD': 'album', b'ITRK': 'tracknumber', b'IPRT': 'tracknumber',
+             b'ICRD': 'date', b'IGNR': 'genre', b'ICOP': 'copyright'}
+HEAVY = (b'APIC', b'USLT', b'COMM', b'GEOB')
+MP4_MIME = {mutagen.mp4.MP4Cover.FORMAT_JPEG: 'image/jpeg', mutagen.mp4.MP4Cover.FORMAT_PNG: 'image/png'}
+
+def sniff(header: bytes) -> str:
+    if header[:3] == b'ID3': return "id3"
+    if header[4:8] == b'ftyp': return "mp4"
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE': return "wav"
+    return "id3" # bare MPEG audio, may still carry an ID3v1 tag at the end
+
+def synchsafe(data: bytes) -> int:
+    return data[0] << 21 | data[1] << 14 | data[2] << 7 | data[3]
+
+def id3_header(version: int, size: int) -> bytes:
+    """A bare ID3v2 header for size bytes of frames"""
+    return b'ID3' + bytes((version, 0, 0, size >> 21 & 0x7f, size >> 14 & 0x7f, size >> 7 & 0x7f, size & 0x7f))
+
+Frames = list[tuple[str, int, int, int]] # (frame id, ID3 version, offset, length) of the heavy frames left in the file
+
+def read_tags(path: pl.Path) -> tuple[dict[str, list[str]], list[tuple[str, bytes]], Frames]:
+    """Returns (fields, art, frames) where art is a list of (mime, data) with the front cover first. ID3 covers are
+    usually among the frames instead, only tags that have to be read whole put them in art"""
+    with open(path, 'rb') as f:
+        kind = sniff(f.read(12))
+        f.seek(0)
+        match kind:
+            case "id3": return from_id3(f)
+            case "mp4": return from_mp4(f)
+            case "wav": return from_riff(f)
+
+def from_id3(fileobj, base:int = 0) -> tuple[dict[str, list[str]], list[tuple[str, bytes]], Frames]:
+    """Reads the ID3v2 tag at base, only its light frames are read and handed to mutagen"""
+    fileobj.seek(base)
+    header = fileobj.read(10)
+    # v2.2 and tags unsynchronised as a whole are rare enough to just read whole
+    if len(header) < 10 or header[:3] != b'ID3' or header[3] not in (3, 4) or header[5] & 0x80:
+        fileobj.seek(base)
+        return from_id3_tag(fileobj if base == 0 else io.BytesIO(fileobj.read(10 + synchsafe(header[6:10])))) + (list(),)
+    version = header[3]
+    pos, end = base + 10, base + 10 + synchsafe(header[6:10])
+    if header[5] & 0x40: # extended header
+        size = fileobj.read(4)
+        pos += synchsafe(size) if version == 4 else 4 + int.from_bytes(size, 'big')
+    light, frames = list(), list()
+    while pos + 10 <= end:
+        fileobj.seek(pos)
+        frame = fileobj.read(10)
+        if len(frame) < 10 or not frame[:4].isalnum(): break # padding
+        size = synchsafe(frame[4:8]) if version == 4 else int.from_bytes(frame[4:8], 'big')
+        if pos + 10 + size > end: # a size mutagen would have to guess at
+            fileobj.seek(base)
+            return from_id3_tag(fileobj if base == 0 else io.BytesIO(fileobj.read(end - base))) + (list(),)
+        if frame[:4] in HEAVY: frames.append((frame[:4].decode(), version, pos, 10 + size))
+        else: light.append(frame + fileobj.read(size))
+        pos += 10 + size
+    tag = b''.join(light)
+    tag = id3_header(version, len(tag)) + tag
+    if base == 0: # an ID3v1 tag at the end fills in what the v2 tag lacks
+        fileobj.seek(0, io.SEEK_END)
+        if fileobj.tell() >= end + 128:
+            fileobj.seek(-128, io.SEEK_END)
+            if (v1 := fileobj.read(128))[:3] == b'TAG': tag += v1
+    fields, _ = from_id3_tag(io.BytesIO(tag))
+    return fields, list(), frames
+
+def from_id3_tag(fileobj) -> tuple[dict[str, list[str]], list[tuple[str, bytes]]]:
+    try: id3 = mutagen.id3.ID3(fileobj)
+    except mutagen.id3.ID3NoHeaderError: return dict(), list()
+    fields = {ID3_KEYS[frame.FrameID]: [str(t) for t in frame.text] for frame in id3.values() if frame.FrameID in ID3_KEYS}
+    pictures = sorted(id3.getall('APIC'), key=lambda pic: pic.type != mutagen.id3.PictureType.COVER_FRONT)
+    return normalize(fields), [(pic.mime, pic.data) for pic in pictures]
+
+def from_mp4(fileobj) -> tuple[dict[str, list[str]], list[tuple[str, bytes]], Frames]:
+    tags = mutagen.mp4.MP4(fileobj).tags or dict()
+    fields = dict()
+    for atom, key in MP4_KEYS.items():
+        if not (values := tags.get(atom)): continue
+        # trkn and disk are (number, total) pairs
+        fields[key] = [str(v[0]) if isinstance(v, tuple) else str(v) for v in values]
+    covers = [(MP4_MIME.get(cover.imageformat, 'image/jpeg'), bytes(cover)) for cover in tags.get('covr', [])]
+    return normalize(fields), covers, list()
+
+def from_riff(fileobj) -> tuple[dict[str, list[str]], list[tuple[str, bytes]], Frames]:
+    fields, art, frames = dict(), list(), list()
+    fileobj.seek(12)
+    while len(header := fileobj.read(8)) == 8:
+        chunk, size = struct.unpack('<4sI', header)
+        start = fileobj.tell()
+        if chunk in (b'id3 ', b'ID3 '):
+            id3_fields, art, frames = from_id3(fileobj, start)
+            fields.update(id3_fields)
+        elif chunk == b'LIST':
+            if fileobj.read(4) == b'INFO': fields = {**from_info(fileobj.read(size-4)), **fields}
+        fileobj.seek(start + size + size % 2) # the audio itself is skipped, not read. Chunks are word aligned
+    return normalize(fields), art, frames
+
+def from_info(data: bytes) -> dict[str, list[str]]:
+    fields, i = dict(), 0
+    while i + 8 <= len(data):
+        sub, size = struct.unpack_from('<4sI', data, i)
+        value = data[i+8:i+8+size].split(b'\x00')[0].decode('utf-8', 'replace')
+        if sub in RIFF_KEYS and value: fields[RIFF_KEYS[sub]] = [value]
+        i += 8 + size + size % 2
+    return fields
+
+def normalize(fields: dict[str, list[str]]) -> dict[str, list[str]]:
+    # "3/12" -> "3" so the track number can be sorted numerically
+    if fields.get('tracknumber'): fields['tracknumber'] = [fields['tracknumber'][0].split('/')[0].strip()]
+    return fields
@@ -0,0 +1,220 @@
+"""
+data_watch.py keeps an eye on the music directories so the library can update itself without rescanning.
+
+On Linux every directory gets an inotify watch. Where inotify isn't available or a mount doesn't support it (network
+shares, running out of watches) the root falls back to polling directory mtimes, which only lists a directory again when
+its mtime moves and checks a rotating slice of files for edits on each pass.
+
+Events are put on Watcher.events as tuples:
+    ('modify', path)         a music file was written or appeared, the library reads it if it is new or changed
+    ('remove', path)         a file or a whole directory is gone
+    ('rename', old, new)     a file or directory moved inside the watched roots
+    ('rescan', root)         events were lost, the root has to be compared with the library again
+"""
+import ctypes, ctypes.util, os, queue, select, struct, sys, threading
+import pathlib as pl
+
+IN_MODIFY, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x2, 0x8, 0x40, 0x80
+IN_CREATE, IN_DELETE, IN_DELETE_SELF, IN_MOVE_SELF = 0x100, 0x200, 0x400, 0x800
+IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR = 0x4000, 0x8000, 0x1000000, 0x40000000
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct('iIII')
+
+def load_libc():
+    if not sys.platform.startswith('linux'): return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch # make sure the symbols exist
+        return libc
+    except (OSError, AttributeError): return None
+
+class Watcher:
+    def __init__(self, roots, exts, interval:float = 5.0, polling:bool = False):
+        self.roots: list[pl.Path] = list(dict.fromkeys(pl.Path(r).expanduser() for r in roots))
+        self.exts: set[str] = {e.lower() for e in exts}
+        self.interval = interval
+        self.polling = polling
+        self.events = queue.SimpleQueue()
+        self.stopped = threading.Event()
+        self.watches: dict[pl.Path, InotifyWatch|PollingWatch] = dict()
+
+    def start(self) -> None:
+        """Watches every root from a thread of its own, which also walks the root to set the watch up"""
+        libc = None if self.polling else load_libc()
+        for root in self.roots:
+            threading.Thread(target=self.run, args=(root, libc), name=f"watch {root}", daemon=True).start()
+
+    def run(self, root: pl.Path, libc) -> None:
+        watch = None
+        if libc:
+            try: watch = InotifyWatch(self, root, libc)
+            except OSError: watch = None # unsupported mount or out of watches
+        self.watches[root] = watch = watch or PollingWatch(self, root)
+        try: watch.run()
+        except OSError: # inotify couldn't watch a new directory (out of watches), so poll the root from here on
+            self.watches[root] = watch = PollingWatch(self, root)
+            self.emit('rescan', root) # for whatever changed before polling took over
+            watch.run()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def drain(self) -> list[tuple]:
+        events = list()
+        while True:
+            try: events.append(self.events.get_nowait())
+            except queue.Empty: return events
+
+    def is_music(self, path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in self.exts
+
+    def emit(self, *event) -> None:
+        self.events.put(event)
+
+    def music_files(self, directory: str):
+        for dirpath, _, names in os.walk(directory):
+            yield from (os.path.join(dirpath, n) for n in names if self.is_music(n))
+
+class InotifyWatch:
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+    def __init__(self, watcher: Watcher, root: pl.Path, libc):
+        self.watcher = watcher
+        self.root = root
+        self.libc = libc
+        if (fd := libc.inotify_init1(IN_CLOEXEC)) < 0: raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.fd = fd
+        self.dirs: dict[int, str] = dict() # watch descriptor -> directory
+        try: self.add_tree(str(root))
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def add_tree(self, top: str) -> None:
+        for dirpath, _, _ in os.walk(top):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.MASK)
+            if wd < 0: raise OSError(ctypes.get_errno(), f"can't watch {dirpath}")
+            self.dirs[wd] = dirpath
+
+    def drop_tree(self, top: str) -> None:
+        for wd, d in list(self.dirs.items()):
+            if d == top or d.startswith(top + os.sep):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def move_tree(self, old: str, new: str) -> None:
+        for wd, d in self.dirs.items():
+            if d == old or d.startswith(old + os.sep): self.dirs[wd] = new + d[len(old):]
+
+    def run(self) -> None:
+        """Handles events until the watcher stops, raises OSError when a new directory can't be watched"""
+        try:
+            while not self.watcher.stopped.is_set():
+                if not select.select([self.fd], [], [], 1.0)[0]: continue
+                self.handle(os.read(self.fd, 1<<16))
+        finally: os.close(self.fd)
+
+    def handle(self, data: bytes) -> None:
+        moved: dict[int, tuple[str, bool]] = dict() # cookie -> (path, is_dir) waiting for its MOVED_TO
+        w, i = self.watcher, 0
+        while i < len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, i)
+            name = os.fsdecode(data[i+EVENT.size:i+EVENT.size+length].rstrip(b'\0'))
+            i += EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                w.emit('rescan', self.root)
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if (directory := self.dirs.get(wd)) is None or not name: continue
+            path, is_dir = os.path.join(directory, name), bool(mask & IN_ISDIR)
+            if mask & IN_MOVED_FROM: moved[cookie] = (path, is_dir)
+            elif mask & IN_MOVED_TO and cookie in moved:
+                old, _ = moved.pop(cookie)
+                if is_dir: self.move_tree(old, path)
+                if is_dir or w.is_music(old) or w.is_music(path): w.emit('rename', old, path)
+            elif is_dir and mask & (IN_CREATE | IN_MOVED_TO):
+                self.add_tree(path)
+                for file in w.music_files(path): w.emit('modify', file)
+            elif is_dir and mask & IN_DELETE: w.emit('remove', path)
+            elif not w.is_music(path): continue
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO): w.emit('modify', path)
+            elif mask & IN_DELETE: w.emit('remove', path)
+        # moved out of the watched tree
+        for path, is_dir in moved.values():
+            if is_dir: self.drop_tree(path)
+            w.emit('remove', path)
+
+class PollingWatch:
+    def __init__(self, watcher: Watcher, root: pl.Path, batch:int = 500):
+        self.watcher = watcher
+        self.root = str(root)
+        self.batch = batch # files checked for edits per pass, directories are all checked every pass
+        self.dirs: dict[str, int] = dict() # directory -> mtime
+        self.files: dict[str, dict[str, tuple[int,int]]] = dict() # directory -> {music file -> (size, mtime)}
+        self.cursor = 0
+        self.add_tree(self.root, emit=False)
+
+    def listing(self, directory: str) -> tuple[list[str], dict[str, tuple[int,int]]]:
+        subdirs, files = list(), dict()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(): subdirs.append(entry.path)
+                        elif self.watcher.is_music(entry.name):
+                            st = entry.stat()
+                            files[entry.path] = (st.st_size, st.st_mtime_ns)
+                    except OSError: continue
+        except OSError: pass
+        return subdirs, files
+
+    def add_tree(self, top: str, emit:bool = True) -> None:
+        dirs = [top]
+        while dirs:
+            directory = dirs.pop()
+            try: self.dirs[directory] = os.stat(directory).st_mtime_ns
+            except OSError: continue
+            subdirs, self.files[directory] = self.listing(directory)
+            dirs += subdirs
+            if emit:
+                for path in self.files[directory]: self.watcher.emit('modify', path)
+
+    def drop_tree(self, top: str) -> None:
+        for d in [d for d in self.dirs if d == top or d.startswith(top + os.sep)]:
+            del self.dirs[d]
+            self.files.pop(d, None)
+        self.watcher.emit('remove', top)
+
+    def run(self) -> None:
+        while not self.watcher.stopped.wait(self.watcher.interval):
+            self.poll()
+
+    def poll(self) -> None:
+        w = self.watcher
+        for directory, mtime in list(self.dirs.items()):
+            if directory not in self.dirs: continue # dropped with its parent
+            try: changed = os.stat(directory).st_mtime_ns != mtime
+            except OSError:
+                self.drop_tree(directory)
+                continue
+            if not changed: continue
+            self.dirs[directory] = os.stat(directory).st_mtime_ns
+            subdirs, files = self.listing(directory)
+            old = self.files.get(directory, dict())
+            for path in old.keys() - files.keys(): w.emit('remove', path)
+            for path, stat in files.items():
+                if old.get(path) != stat: w.emit('modify', path)
+            self.files[directory] = files
+            for sub in set(subdirs) - self.dirs.keys(): self.add_tree(sub)
+        # edits don't touch the directory mtime, so check a slice of the files each pass
+        files = [(d, p, s) for d, fs in self.files.items() for p, s in fs.items()]
+        if not files: return
+        self.cursor %= len(files)
+        for directory, path, stat in files[self.cursor:self.cursor+self.batch]:
+            try: st = os.stat(path)
+            except OSError: continue # the directory pass picks it up
+            if (st.st_size, st.st_mtime_ns) != stat:
+                self.files[directory][path] = (st.st_size, st.st_mtime_ns)
+                w.emit('modify', path)
+        self.cursor += self.batch
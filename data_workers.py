@@ -0,0 +1,46 @@
+"""
+data_workers.py runs per-file jobs (tag parsing, cover art) through a bounded thread or process pool.
+
+Only a few jobs per worker are in flight at once, so a first scan of a large library never holds more open files or
+results in memory than the pool can work through
+"""
+import multiprocessing, os, threading
+import concurrent.futures as cf
+
+class WorkerPool:
+    def __init__(self, workers:int|None = None, mode:str = "thread", start:str = "spawn"):
+        self.workers = workers or os.cpu_count() or 4
+        self.mode = mode
+        self.start = start # process start method, forking a process that already runs threads (Tk, the watcher) isn't safe
+        self.cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """Stops this and every later map() for good, so a cancel between runs isn't lost"""
+        self.cancelled.set()
+
+    def executor(self) -> cf.Executor:
+        if self.mode == "process":
+            return cf.ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(self.start))
+        return cf.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan")
+
+    def map(self, fn, jobs: list[tuple], window:int = 4, progress=None):
+        """Yields (job, result) as jobs finish, where result is the exception if fn raised. progress is called as
+        progress(done, total) on the consuming thread"""
+        total, done = len(jobs), 0
+        jobs = iter(jobs)
+        with self.executor() as ex:
+            pending: dict[cf.Future, tuple] = dict()
+            while True:
+                while not self.cancelled.is_set() and len(pending) < self.workers*window:
+                    if (job := next(jobs, None)) is None: break
+                    pending[ex.submit(fn, *job)] = job
+                if not pending: break
+                finished, _ = cf.wait(pending, return_when=cf.FIRST_COMPLETED)
+                for future in finished:
+                    job = pending.pop(future)
+                    done += 1
+                    if progress: progress(done, total)
+                    yield job, (future.exception() or future.result())
+                if self.cancelled.is_set():
+                    for future in pending: future.cancel()
+                    pending = {f: j for f, j in pending.items() if not f.cancelled()}
@@ -1,4 +1,4 @@
-import warnings
+import atexit, threading, time, warnings
 
 class pcol:
     HEADER = '\033[95m'
@@ -11,10 +11,32 @@ class pcol:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+RATE = 5.0 # seconds between warnings that share a key
+_held: dict[str, list] = dict() # key -> [warnings held back, when one was last shown]
+_lock = threading.Lock()
+
 def _fmt(message, category, filename, lineno, line=''):
         return "{0} ({1}): {2}\n".format(category.__name__, lineno, message)
 
 warnings.formatwarning = _fmt
 
-def warning(message, category=Warning, col=pcol.WARNING):
-    warnings.warn(f"{col}{message}{pcol.ENDC}", category=category, stacklevel=2)
\ No newline at end of file
+def warning(message, category=Warning, col=pcol.WARNING, key:str|None = None):
+    """Warnings sharing a key are shown at most once every RATE seconds, with a count of the ones held back"""
+    if key is not None:
+        now = time.monotonic()
+        with _lock:
+            entry = _held.setdefault(key, [0, -RATE])
+            if now - entry[1] < RATE:
+                entry[0] += 1
+                return
+            held, entry[0], entry[1] = entry[0], 0, now
+        if held: message = f"{message} (and {held} more {key} warnings)"
+    warnings.warn(f"{col}{message}{pcol.ENDC}", category=category, stacklevel=2)
+
+@atexit.register
+def flush():
+    with _lock:
+        held = {key: entry[0] for key, entry in _held.items() if entry[0]}
+        for entry in _held.values(): entry[0] = 0
+    for key, n in held.items():
+        warnings.warn(f"{pcol.WARNING}{n} more {key} warnings held back{pcol.ENDC}", stacklevel=2)
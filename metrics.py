@@ -0,0 +1,122 @@
+"""
+metrics.py collects counters, timers and latency histograms from anywhere in the app.
+
+    with metrics.timed('scan.discovery'): ...
+    @metrics.timed('library.frame')
+    metrics.count('art.hits')
+    metrics.observe('player.transition', ms)
+
+Everything goes into one registry behind a lock, so scan workers and VLC callbacks can record too (workers of a process
+pool record into their own copy, which isn't collected). Times are in ms and kept in logarithmic buckets, so percentiles
+come out without keeping every sample. dump() writes a JSON snapshot, and
+
+    python metrics.py [data/metrics.json]
+
+prints one with the stage that took the most time first
+"""
+import bisect, functools, json, math, sys, threading, time
+
+BUCKETS = tuple(0.01 * 2**(i/4) for i in range(100)) # upper bounds in ms, 0.01 ms to about 5 minutes
+
+class Histogram:
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0]*(len(BUCKETS)+1)
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+        self.buckets[bisect.bisect_left(BUCKETS, ms)] += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the pth percentile, never more than the largest sample"""
+        rank, seen = p/100*self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank: return min(BUCKETS[i] if i < len(BUCKETS) else self.max, self.max)
+        return self.max
+
+    def to_dict(self) -> dict[str, float]:
+        if not self.count: return {'count': 0}
+        return {'count': self.count, 'total_ms': round(self.total, 3), 'mean_ms': round(self.total/self.count, 3),
+                'min_ms': round(self.min, 3), 'p50_ms': round(self.percentile(50), 3),
+                'p90_ms': round(self.percentile(90), 3), 'p99_ms': round(self.percentile(99), 3),
+                'max_ms': round(self.max, 3)}
+
+class Timer:
+    """Times a with block or every call of a decorated function into a histogram"""
+    __slots__ = ('registry', 'name', 'start')
+    def __init__(self, registry: 'Registry', name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, (time.perf_counter() - self.start)*1e3)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try: return func(*args, **kwargs)
+            finally: self.registry.observe(self.name, (time.perf_counter() - start)*1e3)
+        return timed
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[str, int] = dict()
+        self.histograms: dict[str, Histogram] = dict()
+
+    def count(self, name: str, n:int = 1) -> None:
+        with self.lock: self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, ms: float) -> None:
+        with self.lock:
+            if (histogram := self.histograms.get(name)) is None: histogram = self.histograms[name] = Histogram()
+            histogram.add(ms)
+
+    def timed(self, name: str) -> Timer:
+        return Timer(self, name)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self.lock:
+            return {'counters': dict(sorted(self.counters.items())),
+                    'timers': {name: h.to_dict() for name, h in sorted(self.histograms.items())}}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def dump(self, path:str = "./data/metrics.json") -> None:
+        with open(path, "w") as f: json.dump(self.snapshot(), f, indent=2)
+
+registry = Registry()
+count, observe, timed = registry.count, registry.observe, registry.timed
+snapshot, reset, dump = registry.snapshot, registry.reset, registry.dump
+
+def report(snapshot: dict[str, dict]) -> str:
+    lines = ["{:28s}{:>8s}{:>12s}{:>10s}{:>10s}{:>10s}{:>10s}{:>10s}".format(
+             "timer", "count", "total ms", "mean", "p50", "p90", "p99", "max")]
+    timers = sorted(snapshot['timers'].items(), key=lambda item: item[1].get('total_ms', 0), reverse=True)
+    for name, t in timers:
+        if not t['count']: continue
+        lines.append("{:28s}{:>8d}{:>12.1f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}{:>10.2f}".format(
+                     name, t['count'], t['total_ms'], t['mean_ms'], t['p50_ms'], t['p90_ms'], t['p99_ms'], t['max_ms']))
+    if snapshot['counters']:
+        lines.append("")
+        lines += ["{:28s}{:>8d}".format(name, n) for name, n in snapshot['counters'].items()]
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    with open(sys.argv[1] if len(sys.argv) > 1 else "./data/metrics.json", "r") as f: print(report(json.load(f)))
@@ -0,0 +1,126 @@
+"""
+play_queue.py decides what plays next, independently of how the track list is sorted or filtered.
+
+Tracks are referred to by id, which survives rescans and re-sorts. Playing from the list takes a snapshot of the ids in
+the order they were shown (the context), tracks queued by hand play before the context continues and played tracks go
+into a bounded history for going back.
+
+Shuffle is a Fisher-Yates shuffle done one draw at a time: only the swapped positions are kept in a dict, so turning it
+on costs nothing and memory grows with the tracks actually played rather than the size of the context
+"""
+import base64, json, random, zlib
+from collections import deque
+import numpy as np
+
+class PlayQueue:
+    def __init__(self, history:int = 200):
+        self.context = np.empty(0, dtype=np.int32) # ids
+        self.position: int|None = None # index into context of the last context track played
+        self.current: int|None = None # id
+        self.upcoming: deque[int] = deque() # ids queued by hand
+        self.history: deque[int] = deque(maxlen=history)
+        self.shuffle = False
+        self.swaps: dict[int, int] = dict() # sparse Fisher-Yates state, index -> context index now there
+        self.drawn = 0 # shuffled indexes handed out so far
+        self.following: tuple[int, int]|None = None # (id, context index) of the context track coming up, once chosen
+        self.random = random.Random()
+
+    def __len__(self):
+        return len(self.upcoming) + len(self.context)
+
+    def play(self, context, index: int) -> int:
+        """Starts playing context (ids) at index"""
+        if self.current is not None: self.history.append(self.current)
+        self.context = np.asarray(context, dtype=np.int32)
+        self.position = index
+        self.current = int(self.context[index])
+        self.reshuffle()
+        return self.current
+
+    def enqueue(self, id: int) -> None:
+        self.upcoming.append(id)
+
+    def play_next(self, id: int) -> None:
+        self.upcoming.appendleft(id)
+
+    def dequeue(self) -> int|None:
+        """Takes the first track queued by hand off the queue"""
+        return self.upcoming.popleft() if self.upcoming else None
+
+    def set_shuffle(self, shuffle: bool) -> None:
+        self.shuffle = shuffle
+        self.reshuffle()
+
+    def reshuffle(self) -> None:
+        self.swaps.clear()
+        self.drawn = 0
+        self.following = None
+        if self.shuffle and self.position is not None: self.draw(self.position) # the current track doesn't come up again
+
+    def draw(self, index: int|None = None) -> int:
+        """Next context index of the shuffle, or index itself when given"""
+        if self.drawn >= len(self.context): self.swaps.clear(); self.drawn = 0 # every track played, start a new round
+        i = self.drawn
+        j = self.random.randrange(i, len(self.context)) if index is None else self.locate(index)
+        picked = self.swaps.get(j, j)
+        self.swaps[j] = self.swaps.pop(i, i)
+        self.drawn += 1
+        return picked
+
+    def locate(self, index: int) -> int:
+        """Where a context index currently sits among the undrawn ones"""
+        if self.swaps.get(index, index) == index: return index
+        return next(j for j, value in self.swaps.items() if value == index and j >= self.drawn)
+
+    def peek(self) -> int|None:
+        """Id of the track next() will return"""
+        if self.upcoming: return self.upcoming[0]
+        if not len(self.context): return None
+        if self.following is None:
+            # a shuffle draw can't be undone, so the pick is kept until it plays
+            index = self.draw() if self.shuffle else ((self.position or 0) + 1) % len(self.context)
+            self.following = (int(self.context[index]), index)
+        return self.following[0]
+
+    def next(self) -> int|None:
+        if self.current is not None: self.history.append(self.current)
+        if self.upcoming: self.current = self.upcoming.popleft()
+        elif self.peek() is None: self.current = None
+        else: (self.current, self.position), self.following = self.following, None
+        return self.current
+
+    def prev(self) -> int|None:
+        if self.history:
+            if self.current is not None: self.play_next(self.current) # next() comes back here
+            self.current = self.history.pop()
+        elif len(self.context) and not self.shuffle:
+            self.position = ((self.position or 0) - 1) % len(self.context)
+            self.current = int(self.context[self.position])
+            self.following = None
+        return self.current
+
+    def save(self, path:str = "./data/session.json") -> None:
+        def pack(array: np.ndarray) -> str:
+            return base64.b64encode(zlib.compress(array.astype(np.int32).tobytes())).decode('ascii')
+        session = {'context': pack(self.context), 'position': self.position, 'current': self.current,
+                   'upcoming': list(self.upcoming), 'history': list(self.history), 'shuffle': self.shuffle,
+                   'swaps': pack(np.array(list(self.swaps.items()), dtype=np.int32).reshape(-1)), 'drawn': self.drawn,
+                   'following': self.following}
+        with open(path, "w") as f: json.dump(session, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path:str = "./data/session.json", history:int = 200) -> 'PlayQueue':
+        def unpack(text: str) -> np.ndarray:
+            return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=np.int32)
+        queue = cls(history)
+        try:
+            with open(path, "r") as f: session = json.load(f)
+            queue.context = unpack(session['context']).copy()
+            queue.position, queue.current, queue.shuffle = session['position'], session['current'], session['shuffle']
+            queue.upcoming.extend(session['upcoming'])
+            queue.history.extend(session['history'])
+            queue.swaps = dict(unpack(session['swaps']).reshape(-1, 2).tolist())
+            queue.drawn = session['drawn']
+            queue.following = tuple(session['following']) if session['following'] else None
+        except (OSError, ValueError, KeyError, zlib.error): return cls(history) # no session or an unreadable one
+        return queue
@@ -0,0 +1,79 @@
+"""
+playback.py drives the player from libVLC's events instead of polling it.
+
+VLC calls back on its own threads, so callbacks only put (kind, value) on a queue. The Tk thread drains the queue while a
+track is playing and applies only the newest time, length and state, nothing runs while paused or stopped.
+
+The next track's media is created and parsed on a background thread while the current one plays, so moving on at the end
+of a track is a set_media swap. The time from EndReached to the next track playing is kept in Playback.transitions
+"""
+import queue, statistics, threading, time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import vlc
+import metrics
+
+class Playback:
+    EVENTS = {'EndReached': 'end', 'TimeChanged': 'time', 'LengthChanged': 'length', 'Playing': 'state',
+              'Paused': 'state', 'EncounteredError': 'error'}
+    def __init__(self, instance: vlc.Instance, timeout:int = 2000, kept:int = 100):
+        self.instance = instance
+        self.player = instance.media_player_new()
+        self.events = queue.SimpleQueue()
+        self.timeout = timeout # ms a parse may take
+        self.prepared: tuple[str, Future]|None = None
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="media")
+        self.ended: float|None = None # when the last track ended, until the next one plays
+        self.transitions: deque[float] = deque(maxlen=kept) # ms from end of track to the next one playing
+        manager = self.player.event_manager()
+        for name, kind in self.EVENTS.items():
+            manager.event_attach(getattr(vlc.EventType, 'MediaPlayer' + name), self.on_event, kind, name.lower())
+
+    def on_event(self, event, kind: str, name: str) -> None: # called on a VLC thread
+        match kind:
+            case 'time': value = event.u.new_time
+            case 'length': value = event.u.new_length
+            case _: value = name
+        if kind == 'end': self.ended = time.perf_counter()
+        elif name == 'playing' and self.ended is not None:
+            self.transitions.append(ms := (time.perf_counter() - self.ended)*1e3)
+            metrics.observe('player.transition', ms)
+            self.ended = None
+        self.events.put((kind, value))
+
+    def drain(self) -> dict[str,]:
+        """Events since the last drain, one per kind holding the newest value"""
+        events = dict()
+        while True:
+            try: kind, value = self.events.get_nowait()
+            except queue.Empty: return events
+            events[kind] = value
+
+    def clear(self) -> None:
+        self.drain()
+
+    def prepare(self, path: str) -> None:
+        """Starts creating and parsing the media for path so playing it next doesn't wait on either"""
+        if self.prepared and self.prepared[0] == path: return
+        self.prepared = (path, self.worker.submit(self._prepare, path))
+
+    def _prepare(self, path: str) -> tuple[vlc.Media, int]:
+        media = self.instance.media_new(path)
+        parsed = threading.Event()
+        media.event_manager().event_attach(vlc.EventType.MediaParsedChanged, lambda e: parsed.set())
+        media.parse_with_options(vlc.MediaParseFlag.local, self.timeout)
+        parsed.wait(self.timeout/1000)
+        return media, media.get_duration()
+
+    def media(self, path: str) -> tuple[vlc.Media, int]:
+        """The media for path and its length in ms (0 if not known yet), prepared ahead of time when it could be"""
+        prepared, self.prepared = self.prepared, None
+        if prepared and prepared[0] == path and prepared[1].done() and not prepared[1].exception():
+            return prepared[1].result()
+        return self.instance.media_new(path), 0
+
+    def latency(self) -> dict[str, float]:
+        """Track transition times in ms"""
+        if not self.transitions: return dict()
+        return {'last': self.transitions[-1], 'mean': statistics.fmean(self.transitions),
+                'max': max(self.transitions), 'count': len(self.transitions)}
@@ -1,14 +1,13 @@
+import time
+STARTED = time.perf_counter()
 from tkinter import ttk
 import tkinter as tk
-import pandas as pd
 import pathlib as pl
-import vlc, os, time
-from PIL import Image
-from PIL import ImageTk as itk
-import base64, pickle, threading
-import data_easy as data
+import queue, threading
+from collections import deque
+import metrics
+# numpy, pandas, PIL, vlc and the library modules are imported by the loader thread once the window is up
 
-## TODO: Load album images during launch if launch gets too slow
 ## TODO: Add preferences editing
 ## TODO: Add equalizer
 ## TODO: Albums Tab
@@ -18,14 +17,23 @@ import data_easy as data
 ## TODO: failsafe music playing without VLC
 ## TODO: make prev button skip to beginning of current song and then go to previous song
 
+def load_icon(name: str, size: int, col:str = 'g', cache:str = "assets/img/cache") -> tk.PhotoImage|None:
+    """Icon at its display size, resized with PIL only the first time and read natively by Tk after that"""
+    if not (cached := pl.Path(cache)/f"{name}_{col}_{size}.png").exists():
+        if not (path := pl.Path('assets/img')/f"{name}_{col}.png").exists(): return None
+        from PIL import Image
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        Image.open(path).resize((size, size)).save(cached)
+    return tk.PhotoImage(file=cached)
+
 class MusicPlayer:
-    def __init__(self, root: tk.Tk, lib: data.Library):
-        self.stopped = True
-        self.playing = False
-        self.tick_len = 300
-        self.seek_lag = 0
-        self.seeking = False
+    def __init__(self, root: tk.Tk, lib: 'data_easy.Library|None' = None):
+        self.pump_ms = 50 # how often VLC's events are applied while playing
+        self.pumping = None # pending after() id
+        self.seeking = None # pending after() id of the seek a drag of the time slider will make
         self.track_len = 0
+        self.wave = None # current track's waveform, RESOLUTION min/max columns
+        self.analysing = None # future of the current track's analysis when it wasn't cached
 
         self.root = root
         self.root.title("Music Player")
@@ -35,13 +43,7 @@ class MusicPlayer:
         p,s,xs,col = (75, 30, 20, 'g')
         t_ic = {'play':p, 'pause':p, 'next':s, 'prev':s, 'vol':xs}
         for k,v in t_ic.items():
-            if (path := pl.Path('assets/img')/f"{k}_{col}.png").exists():
-                ico = Image.open(path)
-                ico = ico.resize((v,v))
-                ico_pi = itk.PhotoImage(ico)
-                self.icons.update({k: ico_pi})
-                print(ico_pi)
-        print(self.icons)
+            if ico := load_icon(k, v, col): self.icons.update({k: ico})
 
         ## LOAD THEME
         root.tk.call('source', 'assets/forest-dark.tcl')
@@ -49,16 +51,15 @@ class MusicPlayer:
 
         self.root.minsize(width=350, height=510)
         self.root.bind("<Configure>", self.on_config)
-        self.root.update()
 
-        ## LOAD VLC PLAYER
-        self.instance = vlc.Instance()
-        self.player = self.instance.media_player_new()
-        
-        ## LOAD DATAFRAME
-        self.lib = lib
-        self.df = self.lib.tracks_df
-        self.curr_track_idx = 0
+        ## LIBRARY AND VLC PLAYER are set up by on_library once they're loaded
+        self.lib = None
+        self.core = None # core.PlayerCore, everything but the widgets
+        self.df = self.order = self.positions = None # positions: row of self.df -> display position
+        self.queue = self.covers = self.tracklist = None
+        self.loading = queue.SimpleQueue() # filled by the loader thread
+        self.pending = deque() # loader events not handled yet
+        self.next_refresh = 0.0 # when tracks streamed in so far are shown next
 
         ## FRAMES
         self.f_main = ttk.Frame(self.root)
@@ -94,7 +95,7 @@ class MusicPlayer:
         self.track_artist_label.pack(side=tk.TOP)
 
         # TRACK TIMER
-        self.last_time = 0
+        self.last_time = 0 # slider position last shown
         self.time = tk.DoubleVar()
 
         self.time_slider = tk.Scale(self.f_timer, variable=self.time, command=self.on_time,
@@ -104,12 +105,22 @@ class MusicPlayer:
         self.time_start = ttk.Label(self.f_timer, text="{:02d}:{:02d}".format(0,0))
         self.time_end = ttk.Label(self.f_timer, text='--:--.--')
 
+        self.waveform = tk.Canvas(self.f_timer, height=24, background="#313131", highlightthickness=0)
+        self.waveform.bind("<Configure>", lambda e: self.draw_waveform())
+
+        self.waveform.pack(side=tk.TOP, fill=tk.X, padx=5)
         self.time_start.pack(side=tk.LEFT, padx=5)
         self.time_end.pack(side=tk.RIGHT, padx=5)
         self.time_slider.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
-        ## SONG LIST
-        self.fill_all_artists(self.f_list)
+        ## SONG LIST (filled once the library is loaded)
+        self.f_loading = ttk.Frame(self.f_list)
+        self.loading_label = ttk.Label(self.f_loading, text="Loading library…")
+        self.loading_bar = ttk.Progressbar(self.f_loading, mode='indeterminate', length=300)
+        self.loading_label.pack(side=tk.TOP, pady=5)
+        self.loading_bar.pack(side=tk.TOP)
+        self.f_loading.pack(side=tk.TOP, fill=tk.X)
+        self.loading_bar.start()
 
         ### BUTTONS WITH ICONS
         ## Volume
@@ -121,6 +132,22 @@ class MusicPlayer:
 
         self.volume_scale.pack(side=tk.RIGHT, padx=5)
         self.volume_label.pack(side=tk.RIGHT)
+
+        ## Search
+        self.search = tk.StringVar()
+        self.search.trace_add('write', self.on_search)
+        self.search_entry = ttk.Entry(self.f_top, textvariable=self.search, width=30)
+        self.search_entry.pack(side=tk.LEFT, padx=5)
+
+        ## Shuffle
+        self.shuffle = tk.BooleanVar(value=False)
+        self.shuffle_button = ttk.Checkbutton(self.f_top, text="Shuffle", variable=self.shuffle, command=self.on_shuffle)
+        self.shuffle_button.pack(side=tk.LEFT, padx=5)
+
+        ## Lyrics, read from the track's file when the window is open
+        self.lyrics_window = self.lyrics_text = None
+        self.lyrics_button = ttk.Button(self.f_top, text="Lyrics", command=self.show_lyrics)
+        self.lyrics_button.pack(side=tk.LEFT, padx=5)
         
         # Track Control Button
         self.play_pause_button = tk.Button(self.f_ctrl, image=self.i_play, command=self.play_pause,
@@ -147,113 +174,308 @@ class MusicPlayer:
 
         self.f_ctrl.pack(side=tk.RIGHT, fill=tk.X, pady=10, padx=20, expand=True)
         self.f_list.pack(side=tk.LEFT, expand=True, fill=tk.BOTH, padx=10, pady=20)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.root.update()
+        self.first_frame_ms = (time.perf_counter() - STARTED)*1e3
+        metrics.observe('startup.first_frame', self.first_frame_ms)
+        self.load_library(lib)
+
+    def load_library(self, lib=None):
+        """Imports the heavy modules and loads the library on a background thread. It's shown as it was last time as
+        soon as that's loaded, then what changed on disk comes back to the Tk thread in batches through self.loading,
+        so the list fills and playback can start while the rest are read"""
+        def load():
+            try:
+                import numpy, covers, play_queue, playback, tracklist, vlc # warm for the Tk thread
+                import data_easy
+                library = lib or data_easy.Library(scan=False) # as it was last time, from its snapshot or index
+                self.loading.put(('library', library, vlc.Instance()))
+                if lib is None: # then only what changed on disk since
+                    progress = lambda done, total: self.loading.put(('progress', done, total))
+                    for batch in library.scan(progress=progress): self.loading.put(('batch', batch))
+                self.loading.put(('done',))
+            except Exception as e: self.loading.put(('error', e))
+        threading.Thread(target=load, name="library", daemon=True).start()
+        self.root.after(50, self.poll_loading)
+
+    def poll_loading(self, budget:float = 0.03, refresh:float = 1.0):
+        """Handles loader events for up to budget seconds per call. Streamed tracks are shown every refresh seconds, or
+        less often when showing them takes long enough to get in the way"""
+        while True:
+            try: self.pending.append(self.loading.get_nowait())
+            except queue.Empty: break
+        start, progress, streamed = time.perf_counter(), None, False
+        while self.pending and time.perf_counter() - start < budget:
+            match self.pending.popleft():
+                case ('progress', done, total): progress = (done, total)
+                case ('library', lib, instance): self.on_library(lib, instance)
+                case ('batch', batch):
+                    self.lib.apply_scan(batch)
+                    streamed = True
+                case ('done',): return self.on_loaded()
+                case ('error', e):
+                    self.loading_bar.stop()
+                    self.loading_label.config(text=f"Couldn't load the library: {e}")
+                    return
+        if progress:
+            done, total = progress
+            if self.loading_bar['mode'] != 'determinate':
+                self.loading_bar.stop()
+                self.loading_bar.config(mode='determinate', maximum=total)
+            self.loading_bar['value'] = done
+            self.loading_label.config(text=f"Reading tags… {done}/{total}")
+        if streamed and (now := time.perf_counter()) > self.next_refresh:
+            self.lib.update_frame()
+            self.refresh_tracks()
+            self.next_refresh = now + max(refresh, 4*(time.perf_counter() - now))
+        self.root.after(10 if self.pending else 50, self.poll_loading)
+
+    def on_library(self, lib, instance):
+        from covers import CoverLoader
+        from play_queue import PlayQueue
+        from core import PlayerCore, VlcBackend
+        self.lib = lib
+        self.df = self.lib.tracks_df
+        self.queue = PlayQueue.load() # picks up where the last session stopped
+        self.core = PlayerCore(VlcBackend(instance), self.queue, self.locate, self)
+        self.on_volume(self.volume.get())
+        self.shuffle.set(self.queue.shuffle)
+        self.covers = CoverLoader(self.lib.art, self.lib.frames)
+        self.fill_all_artists(self.f_list)
+
+    def on_loaded(self):
+        metrics.observe('startup.library', (time.perf_counter() - STARTED)*1e3)
+        self.lib.finish_scan()
+        self.refresh_tracks()
+        self.f_loading.destroy()
+        self.lib.watch()
+        self.lib.analyze()
+        self.root.after(1000, self.poll_library)
 
-        self.tick()
-    
     def load_album_image(self, image):
-        self.album_image = itk.PhotoImage(image)
+        self.album_image = image
         self.picture.config(borderwidth=0, relief=tk.FLAT)
+        self.picture.delete("all")
         self.picture.create_image(self.canvas_size/2,self.canvas_size/2, image = self.album_image)
 
     def fill_albums(self, frame: ttk.Frame):
         pass
     def fill_all_artists(self, frame: ttk.Frame):
-        self.scrollbar = ttk.Scrollbar(frame)
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        self.treeview = ttk.Treeview(frame, selectmode="browse",
-                                     yscrollcommand=self.scrollbar.set, columns=(1,2,3), height=10)
-        self.treeview.pack(expand=True, fill=tk.BOTH)
-        self.scrollbar.config(command=self.treeview.yview)
-
-        self.treeview.column("#0", anchor="w", width=300)
-        self.treeview.heading("#0", text="Title", anchor="w")
-        self.treeview.column(1, anchor="w", width=150)
-        self.treeview.heading(1, text="Artist", anchor="w")
-        self.treeview.column(2, anchor="w", width=150)
-        self.treeview.heading(2, text="Album", anchor="w")
-        self.treeview.column(3, anchor="center", width=40)
-        self.treeview.heading(3, text="#", anchor="center")
-        
-        self.df = self.df.sort_values(by=['albumartist', 'album', 'tracknumber', 'title']).reset_index(drop=True)
-        for i, item in self.df.iterrows():
-            artist = item.artist
-            album = 'Single' if pd.isna(item.album) else item.album
-            tracknumber = item.tracknumber if item.tracknumber > 0 else ''
-            self.treeview.insert('', index="end", iid=i, text=item.title, values=[artist, album, tracknumber])
+        from tracklist import TrackList
+        self.tracklist = TrackList(frame, on_sort=self.on_sort)
+        self.treeview = self.tracklist.treeview
+
+        self.sort_tracks()
+        self.tracklist.set_data(self.df, self.order)
 
         # Select and scroll
-        self.treeview.selection_set(0)
-        self.treeview.bind('<Double-1>', self.on_double_click)
+        self.tracklist.select(0)
+        self.tracklist.bind('<Double-1>', self.on_double_click)
+        self.tracklist.bind('<Key-q>', self.on_enqueue)
+
+    def sort_tracks(self):
+        import numpy as np
+        order = self.lib.sorts.order(*self.tracklist.sorted)
+        # tracks streamed into the store since the frame was last built aren't in it yet
+        self.order = order[order < len(self.df)] if len(order) > len(self.df) else order
+        self.positions = np.empty(len(self.df), dtype=np.int64)
+        self.positions[self.order] = np.arange(len(self.order))
+
+    def on_sort(self, column: str, descending: bool):
+        with metrics.timed('list.sort'):
+            self.sort_tracks()
+            self.on_search()
+
+    def poll_library(self):
+        if self.lib.apply_changes(self.lib.watcher.drain()): self.refresh_tracks()
+        if covers := self.covers.drain(): self.lib.keep_covers(covers)
+        self.root.after(1000, self.poll_library)
+
+    def refresh_tracks(self):
+        """Picks up library changes without losing the current track or the list's place"""
+        self.df = self.lib.tracks_df
+        self.sort_tracks()
+        top, selected = self.tracklist.top, self.tracklist.selected
+        self.on_search()
+        self.tracklist.top, self.tracklist.selected = top, selected
+        self.tracklist.set_data(self.tracklist.df, self.tracklist.order)
+
+    def on_search(self, *args):
+        import numpy as np
+        if self.lib is None: return
+        rows = self.lib.search.query(self.search.get())
+        if rows is None: self.tracklist.set_data(self.df, self.order)
+        else:
+            rows = rows[rows < len(self.df)] # tracks streamed in since the frame was last built aren't in it yet
+            self.tracklist.set_data(self.df, rows[np.argsort(self.positions[rows])]) # results in display order
+        self.tracklist.select(0)
 
     def on_double_click(self, e):
-        self.stop()
-        selected_index = int(self.treeview.focus())
-        print(selected_index)
-        if selected_index != None:
-            self.curr_track_idx = selected_index
-            self.setup_track()
+        position = self.tracklist.position_at(e.y)
+        if position != None:
+            self.stop()
+            self.queue.play(self.df['id'].to_numpy()[self.tracklist.rows()], position)
             self.play()
+
+    def on_enqueue(self, e):
+        if (row := self.tracklist.selected_row()) is not None:
+            self.queue.enqueue(int(self.df['id'].iat[row]))
+            if not self.core.stopped: self.core.prepare_next()
+
+    def on_shuffle(self):
+        if self.queue is None: return
+        self.queue.set_shuffle(self.shuffle.get())
+        if not self.core.stopped: self.core.prepare_next()
+
+    def on_close(self):
+        if self.queue: self.queue.save()
+        if self.lib: self.lib.cancel()
+        self.root.destroy()
+        if self.lib: self.lib.save() # once the window is gone, it takes a moment on a big library
+        metrics.dump()
     
     def play_pause(self):
-        self.playing = not self.playing
-        if self.playing == False:
-            self.pause()
-            self.play_pause_button.config(image=self.i_play)
-        else:
-            self.play()
-            self.play_pause_button.config(image=self.i_pause)
+        if self.lib is None: return
+        if self.core.playing: self.pause()
+        else: self.play()
 
-    def setup_track(self):
-        track_path = self.df.iloc[self.curr_track_idx]["path"]
-        media = self.instance.media_new(track_path)
-        self.player.set_media(media)
+    def locate(self, id: int) -> str|None:
+        return None if (row := self.lib.store.find(id)) is None else self.lib.store.path(row)
+
+    def show_track(self, id: int, path: str, length: int):
+        row = self.lib.store.find(id)
+        self.reset_slider()
+        self.show_length(length)
+        self.apply_analysis(path, self.lib.store.stat(row))
+        self.update_track_info(self.lib.store.value(row, 'title'), self.lib.store.value(row, 'artist'))
+        self.load_album_image(self.covers.get(cover := self.lib.cover(row)))
+        if isinstance(cover, tuple) and self.covers.known(cover) is None: self.wait_cover(id, cover)
+        if self.lyrics_window is not None: self.fill_lyrics(row)
+
+    def wait_cover(self, id: int, cover: tuple[str,str], tries:int = 100):
+        """Swaps in a cover that was still being read from its file, while its track is the current one"""
+        if self.queue.current != id or tries == 0: return
+        if self.covers.known(cover) is None: self.root.after(20, self.wait_cover, id, cover, tries - 1)
+        else: self.load_album_image(self.covers.get(cover))
+
+    def show_next(self, id: int, path: str):
+        self.covers.prefetch(self.lib.cover(self.lib.store.find(id)))
+
+    def show_stopped(self):
         self.reset_slider()
-        self.track_len = self.player.get_length()
-        self.player.play()
 
-        title = self.df.iloc[self.curr_track_idx]["title"]
-        artists = self.df.iloc[self.curr_track_idx]["artist"]
-        image = self.df.iloc[self.curr_track_idx]["image"]
-        self.update_track_info(title, artists)
-        self.load_album_image(image)
+    def apply_analysis(self, path: str, stat: tuple[int,int]):
+        """Gain and waveform of the current track, analysed right away if the background pass hasn't reached it"""
+        if (record := self.lib.analysis.get(path, stat)) is not None:
+            self.analysing = None
+            return self.show_analysis(record)
+        self.show_analysis(None)
+        future = self.analysing = self.lib.analysis.request(path, stat)
+        def check():
+            if future is not self.analysing: return # another track has started since
+            if not future.done(): return self.root.after(100, check)
+            self.analysing = None
+            if future.exception() is None: self.show_analysis(future.result())
+        self.root.after(100, check)
+
+    def show_analysis(self, record):
+        gain = float(record['gain']) if record is not None and self.lib.prefs.normalize else 0.0
+        self.wave = None if record is None else record['wave']
+        self.core.set_volume(self.volume.get(), gain)
+        self.draw_waveform()
+
+    def draw_waveform(self):
+        self.waveform.delete("all")
+        if self.wave is None: return
+        w, h = self.waveform.winfo_width(), self.waveform.winfo_height()
+        lo, hi = self.wave
+        x = [i*(w - 1)/max(1, len(hi) - 1) for i in range(len(hi))]
+        top = [(xi, h/2 - v*h/254) for xi, v in zip(x, hi.tolist())]
+        bottom = [(xi, h/2 - v*h/254) for xi, v in zip(reversed(x), reversed(lo.tolist()))]
+        self.waveform.create_polygon(top + bottom, fill="#5D5D5D", outline="")
 
     def play(self):
-        if self.stopped: self.setup_track()
-        else: self.player.play()
-        self.stopped = False
-    
+        if self.core.stopped and self.queue.current is None and len(self.tracklist):
+            self.queue.play(self.df['id'].to_numpy()[self.tracklist.rows()], self.tracklist.selected or 0)
+        if self.core.play(): self.pump()
+
     def pause(self):
-        self.player.pause()
+        self.core.pause()
 
     def stop(self):
-        self.player.stop()
-        if self.playing == True:
-            self.play_pause_button.config(image=self.i_play)
-            self.playing = False
-        self.reset_slider()
-        self.stopped = True
-
-    def reset(self):
-        self.player.set_time(0)
+        self.core.stop()
 
     def reset_slider(self):
+        self.track_len = 0
         self.last_time = 0
         self.time_start.config(text="{:02d}:{:02d}".format(0,0))
+        self.time_end.config(text='--:--.--')
         self.time.set(0)
 
+    def pump(self):
+        """Applies the backend's events on the Tk thread and reschedules itself only while a track is playing"""
+        if self.pumping: self.root.after_cancel(self.pumping)
+        self.pumping = None
+        if self.core.pump(seeking=bool(self.seeking)): self.pumping = self.root.after(self.pump_ms, self.pump)
+
+    def show_state(self, playing: bool):
+        self.play_pause_button.config(image=self.i_pause if playing else self.i_play)
+        if not playing and self.pumping:
+            self.root.after_cancel(self.pumping)
+            self.pumping = None
+
+    def show_length(self, length: int):
+        if length <= 0 or length == self.track_len: return
+        self.track_len = length
+        self.time_slider.config(to=length)
+        m, r = divmod(length, 60000)
+        self.time_end.config(text="{:02d}:{:02d}".format(m,r//1000))
+
+    def show_time(self, t: int):
+        # only move the slider by whole pixels and the label by whole seconds
+        step = max(1, self.track_len // max(1, self.time_slider.winfo_width()))
+        if abs(t - self.last_time) >= step:
+            self.last_time = t
+            self.time.set(t)
+        self.show_clock(t)
+
+    def show_clock(self, t: int):
+        m, r = divmod(max(t,0), 60000)
+        if (text := "{:02d}:{:02d}".format(m,r//1000)) != self.time_start.cget('text'): self.time_start.config(text=text)
+
     def next_song(self):
-        self.stop()
-        self.curr_track_idx = (self.curr_track_idx + 1) % len(self.df)
-        self.play()
+        if self.lib is None: return
+        if self.core.next(): self.pump()
 
     def prev_song(self):
-        self.stop()
-        self.curr_track_idx = (self.curr_track_idx - 1) % len(self.df)
-        self.play()
+        if self.lib is None: return
+        if self.core.prev(): self.pump()
+
+    def show_lyrics(self):
+        if self.lib is None or self.core.stopped or (row := self.lib.store.find(self.queue.current)) is None: return
+        if self.lyrics_window is None:
+            self.lyrics_window = tk.Toplevel(self.root)
+            self.lyrics_window.protocol("WM_DELETE_WINDOW", self.close_lyrics)
+            self.lyrics_text = tk.Text(self.lyrics_window, wrap=tk.WORD, width=60, height=30, borderwidth=0)
+            self.lyrics_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.fill_lyrics(row)
+        self.lyrics_window.lift()
+
+    def fill_lyrics(self, row: int):
+        lyrics = self.lib.lyrics(row)
+        self.lyrics_window.title(self.lib.store.value(row, 'title'))
+        self.lyrics_text.config(state=tk.NORMAL)
+        self.lyrics_text.delete('1.0', tk.END)
+        self.lyrics_text.insert('1.0', lyrics or "No lyrics in this track's tags")
+        self.lyrics_text.config(state=tk.DISABLED)
+
+    def close_lyrics(self):
+        self.lyrics_window.destroy()
+        self.lyrics_window = self.lyrics_text = None
 
     def on_volume(self, vol):
-        self.player.audio_set_volume(round(float(vol)))
+        if self.core: self.core.set_volume(float(vol))
 
     def update_track_info(self, title, artists):
         self.track_title_label.config(text=title)
@@ -262,50 +484,20 @@ class MusicPlayer:
     def on_config(self, *args):
         pass
     
-    def on_time(self, *args):
-        if self.player:
-            if self.player.is_playing():
-                self.player.pause()
-            self.seek_lag = time.time()
-            t = self.player.get_time()
-            m2, r2 = divmod(max(t,0), 60000)
-            self.time_start.config(text="{:02d}:{:02d}".format(m2,r2//1000))
-            if self.seeking == False:
-                self.seeking = True
-                self.check_seeking()
-    
-    def check_seeking(self):
-        if (time.time() - self.seek_lag)*1e3 < 300:
-            m2, r2 = divmod(max(int(self.time.get()),0), 60000)
-            self.time_start.config(text="{:02d}:{:02d}".format(m2,r2//1000))
-            self.root.after(max(10,self.tick_len/100), self.check_seeking)
-        else:
-            self.seeking = False
-            t = self.time.get()
-            self.player.set_time(int(t))
-            self.player.play()
-
-    def tick(self):
-        if self.player:
-            self.track_len = self.player.get_length()
-            m, r = divmod(self.track_len, 60000)
-            if self.track_len > 0:
-                self.time_slider.config(to=self.track_len)
-                self.time_end.config(text="{:02d}:{:02d}".format(m,r//1000))
-                t = max(self.player.get_time(), 0)
-                if t > self.last_time:
-                    self.time.set(t)
-                    m2, r2 = divmod(self.player.get_time(), 60000)
-                    self.time_start.config(text="{:02d}:{:02d}".format(m2,r2//1000))
-                    self.last_time = t
-                elif (self.track_len - self.player.get_time()) <= self.tick_len and not self.player.is_playing() and not self.stopped:
-                    self.time_start.config(text="{:02d}:{:02d}".format(m,r//1000))
-                    self.next_song()
-        self.root.after(self.tick_len, self.tick)
+    def on_time(self, value):
+        if abs(float(value) - self.last_time) < 1: return # the slider following playback, not a drag
+        self.show_clock(int(float(value)))
+        # seek once the drag settles instead of on every motion
+        if self.seeking: self.root.after_cancel(self.seeking)
+        self.seeking = self.root.after(150, self.seek)
+
+    def seek(self):
+        self.seeking = None
+        self.last_time = int(self.time.get())
+        self.core.seek(self.last_time)
         
 
 if __name__ == "__main__":
-    library = data.Library()
     root = tk.Tk()
-    music_player = MusicPlayer(root, lib=library)
+    music_player = MusicPlayer(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,88 @@
+"""
+Small audio files generated on the fly, like bench.generate makes them: silent MPEG frames or PCM with real tags, and
+hand-built ID3 tags for the layouts mutagen never writes (extended headers, whole-tag unsynchronisation)
+"""
+import io, json, struct, sys, wave
+import pathlib as pl
+import pytest
+from mutagen.id3 import ID3
+from mutagen.wave import WAVE
+from PIL import Image
+
+sys.path.insert(0, str(pl.Path(__file__).resolve().parents[1])) # the app's modules live at the top level
+
+FRAME = b'\xff\xfb\x90\x64' + bytes(413) # one silent MPEG-1 layer III frame, as in bench.py
+AUDIO = FRAME*8
+
+def synchsafe(n: int) -> bytes:
+    return bytes((n >> 21 & 0x7f, n >> 14 & 0x7f, n >> 7 & 0x7f, n & 0x7f))
+
+def raw_frame(frame_id: str, body: bytes, version:int = 4) -> bytes:
+    size = synchsafe(len(body)) if version == 4 else len(body).to_bytes(4, 'big')
+    return frame_id.encode() + size + b'\x00\x00' + body
+
+def text_frame(frame_id: str, text: str, version:int = 4) -> bytes:
+    return raw_frame(frame_id, b'\x00' + text.encode('latin-1'), version)
+
+def raw_tag(frames: list[bytes], version:int = 4, flags:int = 0, extended:bytes = b'', padding:int = 0) -> bytes:
+    body = extended + b''.join(frames) + bytes(padding)
+    return b'ID3' + bytes((version, 0, flags)) + synchsafe(len(body)) + body
+
+@pytest.fixture(scope="session")
+def cover() -> bytes:
+    data = io.BytesIO()
+    Image.new('RGB', (32, 32), (200, 40, 90)).save(data, 'JPEG')
+    return data.getvalue()
+
+@pytest.fixture
+def make_mp3(tmp_path):
+    def make(frames, name:str = "track.mp3", version:int = 4, audio:bytes = AUDIO, padding:int|None = None) -> pl.Path:
+        path = tmp_path/name
+        path.write_bytes(audio)
+        tags = ID3()
+        for frame in frames: tags.add(frame)
+        if version == 3: tags.update_to_v23()
+        tags.save(path, v2_version=version, padding=None if padding is None else lambda info: padding)
+        return path
+    return make
+
+def pcm(path: pl.Path, frames:int = 800) -> None:
+    # wave doesn't pad an odd data chunk, and neither mutagen nor data_tags can find chunks after one, so keep it even
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(1)
+        w.setframerate(8000)
+        w.writeframes(bytes(frames))
+
+@pytest.fixture
+def make_wav(tmp_path):
+    def make(frames, name:str = "track.wav") -> pl.Path:
+        path = tmp_path/name
+        pcm(path)
+        audio = WAVE(path)
+        audio.add_tags()
+        for frame in frames: audio.tags.add(frame)
+        audio.save()
+        return path
+    return make
+
+def chunk(name: bytes, data: bytes) -> bytes:
+    return name + struct.pack('<I', len(data)) + data + (b'\x00' if len(data) % 2 else b'')
+
+def riff(*chunks: bytes) -> bytes:
+    body = b'WAVE' + b''.join(chunks)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+def atom(name: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', 8 + len(data)) + name + data
+
+@pytest.fixture
+def music(tmp_path, monkeypatch) -> pl.Path:
+    """A music directory in tmp_path and a working directory with preferences pointing at it, like bench.workspace"""
+    (music := tmp_path/"music").mkdir()
+    (tmp_path/"ws/data").mkdir(parents=True)
+    (tmp_path/"ws/assets/img/albums").mkdir(parents=True)
+    prefs = {'music_directories': [str(music)], 'extensions': [".mp3", ".wav"], 'scan_workers': 2, 'watch_interval': 0.05}
+    (tmp_path/"ws/data/preferences.json").write_text(json.dumps(prefs))
+    monkeypatch.chdir(tmp_path/"ws")
+    return music
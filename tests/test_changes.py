@@ -0,0 +1,67 @@
+import os, threading, time
+import pathlib as pl
+from mutagen.id3 import TIT2
+import data_easy
+from data_easy import Library
+from data_edit import write_tags
+
+def song(make_mp3, name: str, title: str) -> str:
+    return str(make_mp3([TIT2(encoding=3, text=title)], f"music/{name}"))
+
+def settle(lib: Library, timeout:float = 5) -> None:
+    """Calls apply_changes like the player's poll until the background update is done"""
+    deadline = time.monotonic() + timeout
+    while lib.updating is not None:
+        assert time.monotonic() < deadline, "the update never finished"
+        lib.apply_changes([])
+        time.sleep(0.01)
+
+def titles(lib: Library) -> dict[str, str]:
+    return {lib.store.path(row): lib.store.value(row, 'title') for row in range(len(lib.store))}
+
+def test_files_are_read_off_the_calling_thread(music, make_mp3, monkeypatch):
+    first = song(make_mp3, "first.mp3", "First")
+    lib = Library()
+    release, read = threading.Event(), data_easy.read_metadata
+    monkeypatch.setattr(data_easy, 'read_metadata', lambda *args: release.wait(5) and read(*args))
+    new = song(make_mp3, "new.mp3", "New")
+    assert lib.apply_changes([('modify', new)]) is False # nothing to show until it's read
+    assert lib.updating is not None and new not in lib.store
+    os.remove(first)
+    lib.apply_changes([('remove', first)]) # held back until the read is done
+    assert first in lib.store
+    release.set()
+    settle(lib)
+    assert titles(lib) == {new: "New"}
+    assert new in lib.index.load() and first not in lib.index.load()
+
+def test_rewritten_and_moved_tracks_keep_their_ids(music, make_mp3):
+    edited, moved = song(make_mp3, "edited.mp3", "Edited"), song(make_mp3, "moved.mp3", "Moved")
+    lib = Library()
+    ids = {path: lib.store.value(lib.store.row(path), 'id') for path in (edited, moved)}
+    write_tags(pl.Path(edited), {'title': "Edited again"})
+    os.rename(moved, renamed := str(music/"renamed.mp3"))
+    lib.apply_changes([('modify', edited), ('rename', moved, renamed)])
+    assert titles(lib)[renamed] == "Moved" # a move isn't read again
+    assert titles(lib)[edited] == "Edited" # and a rewritten track stays as it was until it's been read
+    settle(lib)
+    assert titles(lib) == {edited: "Edited again", renamed: "Moved"}
+    assert lib.store.value(lib.store.row(edited), 'id') == ids[edited]
+    assert lib.store.value(lib.store.row(renamed), 'id') == ids[moved]
+
+def test_unchanged_files_are_not_read(music, make_mp3, monkeypatch):
+    path = song(make_mp3, "same.mp3", "Same")
+    lib = Library()
+    monkeypatch.setattr(data_easy, 'read_metadata', lambda *args: 1/0)
+    assert lib.apply_changes([('modify', path)]) is False and lib.updating is None
+
+def test_renaming_a_track_away_from_music_removes_it(music, make_mp3):
+    track, folder = song(make_mp3, "a.mp3", "A"), music/"album"
+    folder.mkdir()
+    song(make_mp3, "album/b.mp3", "B")
+    lib = Library()
+    os.rename(track, backup := track + ".bak")
+    os.rename(folder, music/"album.bak") # a directory keeps its tracks whatever it's called
+    assert lib.apply_changes([('rename', track, backup), ('rename', str(folder), str(music/"album.bak"))])
+    settle(lib)
+    assert titles(lib) == {str(music/"album.bak/b.mp3"): "B"} and backup not in lib.index.load()
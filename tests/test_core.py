@@ -0,0 +1,67 @@
+import pytest
+from core import Backend, ManualClock, NullBackend, PlayerCore, View, bench
+from play_queue import PlayQueue
+
+class Recorder(View):
+    def __init__(self):
+        self.calls = list()
+    def show_track(self, id, path, length): self.calls.append(('track', id, length))
+    def show_state(self, playing): self.calls.append(('state', playing))
+
+@pytest.fixture
+def player():
+    clock, queue, view = ManualClock(), PlayQueue(), Recorder()
+    backend = NullBackend(lambda path: 1000*int(path), clock)
+    library = {1: "1", 2: "2", 3: "3"}
+    core = PlayerCore(backend, queue, library.get, view)
+    queue.play([1, 2, 3], 0)
+    return core, backend, clock, library, view
+
+def test_a_backend_has_to_implement_everything():
+    class Partial(Backend):
+        def load(self, path): return 0
+    with pytest.raises(TypeError, match="abstract"): Partial()
+
+def test_null_backend_keeps_time():
+    clock = ManualClock()
+    backend = NullBackend(lambda path: 5000, clock)
+    assert backend.load("a") == 0 # not prepared, so the length comes with the first events
+    backend.play()
+    clock.now = 2
+    assert backend.drain() == {'state': 'playing', 'length': 5000, 'time': 2000}
+    backend.pause(True)
+    clock.now = 4
+    assert backend.drain() == {'state': 'paused'} and backend.position() == 2000
+    backend.pause(False)
+    backend.seek(4500)
+    clock.now = 5
+    assert backend.drain() == {'state': 'playing', 'length': 5000, 'time': 5000, 'end': 'endreached'}
+    backend.prepare("b")
+    assert backend.load("b") == 5000
+
+def test_tracks_end_and_move_on(player):
+    core, backend, clock, library, view = player
+    assert core.play() and backend.path == "1" and view.calls == [('track', 1, 0), ('state', True)]
+    clock.now = 0.5
+    assert core.pump() and core.length == 1000
+    clock.now = 1.1
+    assert core.pump() and backend.path == "2" and core.length == 2000 # prepared, so its length is known at once
+    assert core.prev() and backend.path == "1"
+    assert core.next() and backend.path == "2"
+    del library[3] # left the library, so it's skipped
+    assert core.next() and backend.path == "1"
+
+def test_pause_and_volume(player):
+    core, backend, clock, _, view = player
+    core.play()
+    core.play_pause()
+    assert not core.playing and view.calls[-1] == ('state', False)
+    core.play_pause()
+    assert core.playing and backend.path == "1" # resumed, not restarted
+    core.set_volume(50, gain=6.0)
+    assert backend.level == 100 and core.gain == 6.0
+    core.stop()
+    assert core.stopped and backend.position() == 0
+
+def test_bench_stays_in_step():
+    assert bench(200, 500)['transitions'] == 500
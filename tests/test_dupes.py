@@ -0,0 +1,61 @@
+import struct
+from mutagen.id3 import TIT2
+from conftest import AUDIO, FRAME, atom, chunk, raw_tag, riff, text_frame
+from data_dupes import DupeIndex, digest, payload
+from data_workers import WorkerPool
+
+def mp4(*atoms: bytes) -> bytes:
+    return atom(b'ftyp', b'M4A \x00\x00\x00\x00') + b''.join(atoms)
+
+def test_mp4_mdat(tmp_path):
+    data = mp4(atom(b'moov', bytes(40)), atom(b'mdat', b'audio'*10), atom(b'free', bytes(8)))
+    (path := tmp_path/"a.m4a").write_bytes(data)
+    [(start, stop)] = payload(str(path))
+    assert data[start:stop] == b'audio'*10
+
+def test_mp4_64_bit_and_open_ended_mdat(tmp_path):
+    wide = struct.pack('>I', 1) + b'mdat' + struct.pack('>Q', 16 + 6) + b'wide..'
+    data = mp4(wide, atom(b'moov', bytes(8)), bytes((0, 0, 0, 0)) + b'mdat' + b'to the end')
+    (path := tmp_path/"b.m4a").write_bytes(data)
+    assert [data[start:stop] for start, stop in payload(str(path))] == [b'wide..', b'to the end']
+
+def test_mp4_truncated_mdat_stops_at_the_end_of_the_file(tmp_path):
+    data = mp4(struct.pack('>I', 1000) + b'mdat' + b'cut short')
+    (path := tmp_path/"c.m4a").write_bytes(data)
+    assert [data[start:stop] for start, stop in payload(str(path))] == [b'cut short']
+
+def test_wav_data_chunk_skips_padding_and_tags(tmp_path):
+    fmt = chunk(b'fmt ', struct.pack('<HHIIHH', 1, 1, 8000, 8000, 1, 8))
+    data = riff(fmt, chunk(b'junk', b'odd'), chunk(b'data', b'pcm'*99), chunk(b'id3 ', raw_tag([text_frame('TIT2', "x")])))
+    (path := tmp_path/"a.wav").write_bytes(data)
+    [(start, stop)] = payload(str(path))
+    assert data[start:stop] == b'pcm'*99
+
+def test_mp3_tags_are_trimmed(tmp_path):
+    v2 = raw_tag([text_frame('TIT2', "Stacked")], padding=20)
+    v1 = b'TAG' + bytes(125)
+    ape = b'APETAGEX' + struct.pack('<IIII', 2000, 32 + 7, 0, 0x80000000) + bytes(8)
+    data = v2 + v2 + AUDIO + b'APETAGEX' + bytes(24) + b'apebody' + ape + v1 # the APE size counts the footer only
+    (path := tmp_path/"a.mp3").write_bytes(data)
+    assert payload(str(path)) == [(2*len(v2), 2*len(v2) + len(AUDIO))]
+
+def test_retagged_copies_hash_the_same(make_mp3):
+    one = make_mp3([TIT2(encoding=3, text="One")], "one.mp3")
+    two = make_mp3([TIT2(encoding=3, text="A much longer title")], "two.mp3", version=3, padding=500)
+    other = make_mp3([TIT2(encoding=3, text="One")], "other.mp3", audio=AUDIO + FRAME)
+    assert digest(str(one)) == digest(str(two)) != digest(str(other))
+    assert digest(str(one), 100) == digest(str(other), 100) # only the full hash tells them apart
+
+def test_find_groups_and_caches(tmp_path, make_mp3):
+    paths = [make_mp3([TIT2(encoding=3, text=name)], f"{name}.mp3") for name in ("a", "b")]
+    paths.append(make_mp3([], "c.mp3", audio=AUDIO + FRAME))
+    tracks = {str(p): (p.stat().st_size, p.stat().st_mtime_ns) for p in paths}
+    index = DupeIndex(str(tmp_path/"library.db"))
+    try:
+        assert index.find(tracks, WorkerPool(2)) == [sorted(map(str, paths[:2]))]
+        cached = index.load()
+        assert set(cached) == set(tracks) and cached[str(paths[2])][3] is None # a unique length is never hashed
+        del tracks[str(paths[1])]
+        assert index.find(tracks, WorkerPool(2)) == [] and str(paths[1]) not in index.load()
+    finally:
+        index.close()
@@ -0,0 +1,57 @@
+import mutagen.id3, mutagen.wave
+import pytest
+from mutagen.id3 import TIT2, TPE1
+from conftest import AUDIO
+from data_edit import write_tags
+from data_tags import read_tags
+
+def garble(self, path, *args, **kwargs):
+    """A save that dies half way through, after scribbling over both ends of the file"""
+    with open(path, 'r+b') as f:
+        f.write(b'\xff'*64)
+        f.seek(0, 2)
+        f.write(b'half a tag')
+    raise OSError("disk full")
+
+def test_in_place_keeps_the_audio_where_it_is(make_mp3):
+    path = make_mp3([TIT2(encoding=3, text="Old"), TPE1(encoding=3, text="Artist")], padding=500)
+    size = path.stat().st_size
+    assert write_tags(path, {'title': "New", 'tracknumber': 7, 'artist': None})[0] == size
+    fields, _, _ = read_tags(path)
+    assert fields == {'title': ["New"], 'tracknumber': ["7"]}
+    assert path.read_bytes().endswith(AUDIO)
+
+def test_v23_stays_v23(make_mp3):
+    path = make_mp3([TIT2(encoding=3, text="Old")], version=3, padding=500)
+    write_tags(path, {'artist': ["One", "Two"]})
+    assert mutagen.id3.ID3(path).version == (2, 3, 0)
+
+def test_no_room_rewrites_the_file(make_mp3):
+    path = make_mp3([TIT2(encoding=3, text="Old")], padding=0)
+    size = path.stat().st_size
+    assert write_tags(path, {'title': "A title too long for the old tag"})[0] > size
+    assert read_tags(path)[0]['title'] == ["A title too long for the old tag"]
+    assert path.read_bytes().endswith(AUDIO)
+    assert [p.name for p in path.parent.iterdir()] == [path.name]
+
+def test_failed_in_place_write_is_rolled_back(make_mp3, monkeypatch):
+    path = make_mp3([TIT2(encoding=3, text="Old")], padding=500)
+    path.write_bytes(path.read_bytes() + b'TAG' + b'v1 title'.ljust(125, b'\0'))
+    before = path.read_bytes()
+    monkeypatch.setattr(mutagen.id3.ID3, 'save', garble)
+    with pytest.raises(OSError): write_tags(path, {'title': "New"})
+    assert path.read_bytes() == before
+
+def test_failed_rewrite_leaves_the_original(make_wav, monkeypatch):
+    path = make_wav([TIT2(encoding=3, text="Old")])
+    before = path.read_bytes()
+    monkeypatch.setattr(mutagen.wave.WAVE, 'save', garble)
+    with pytest.raises(OSError): write_tags(path, {'title': "New"})
+    assert path.read_bytes() == before
+    assert [p.name for p in path.parent.iterdir()] == [path.name]
+
+def test_unknown_fields_are_refused(make_mp3):
+    path = make_mp3([TIT2(encoding=3, text="Old")], padding=500)
+    before = path.read_bytes()
+    with pytest.raises(ValueError): write_tags(path, {'rating': "5"})
+    assert path.read_bytes() == before
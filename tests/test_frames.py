@@ -0,0 +1,59 @@
+from mutagen.id3 import APIC, COMM, TIT2, USLT, PictureType
+from data_edit import write_tags
+from data_frames import FrameLoader, decode, encode, load
+from data_store import TrackStore
+from data_tags import read_tags
+import metrics
+
+def tagged(make_mp3, cover: bytes, **kwargs):
+    frames = [TIT2(encoding=3, text="Title"),
+              APIC(encoding=3, mime='image/png', type=PictureType.COVER_BACK, desc='back', data=b'png'),
+              APIC(encoding=3, mime='image/jpeg', type=PictureType.COVER_FRONT, desc='', data=cover),
+              USLT(encoding=3, lang='eng', desc='', text="la la la"),
+              COMM(encoding=3, lang='eng', desc='', text=["nice", ""])]
+    path = make_mp3(frames, **kwargs)
+    return path, encode(read_tags(path)[2])
+
+def stale() -> int:
+    return metrics.registry.snapshot()['counters'].get('frames.stale', 0)
+
+def test_encode_decode_roundtrip():
+    frames = [('APIC', 4, 1234, 5678), ('USLT', 3, 20, 11)]
+    assert encode(frames) == "APIC4:1234+5678,USLT3:20+11"
+    assert decode(encode(frames)) == frames
+    assert encode([]) is None and decode(None) == [] and decode("") == []
+
+def test_frames_load_from_their_offsets(make_mp3, cover):
+    path, text = tagged(make_mp3, cover)
+    loader, before = FrameLoader(), stale()
+    assert loader.picture(str(path), text) == cover # the front cover wins over the first picture
+    assert loader.lyrics(str(path), text) == "la la la"
+    assert loader.comments(str(path), text) == ["nice"]
+    assert loader.load(str(path), text, 'GEOB') == [] and loader.picture(str(path), None) is None
+    assert stale() == before
+
+def test_stale_offsets_fall_back_to_the_tag(make_mp3, cover):
+    path, text = tagged(make_mp3, cover, padding=0)
+    write_tags(path, {'title': "A title long enough to move every frame after it"}) # no room, so the file is rewritten
+    assert decode(encode(read_tags(path)[2])) != decode(text)
+    before = stale()
+    assert [frame.text for frame in load(str(path), text, 'USLT')] == ["la la la"]
+    assert stale() == before + 1
+    assert FrameLoader().picture(str(path), text) == cover
+
+def test_loader_keeps_a_few_files(make_mp3, cover):
+    paths = [tagged(make_mp3, cover, name=f"{n}.mp3") for n in range(3)]
+    loader = FrameLoader(size=2)
+    for path, text in paths: loader.lyrics(str(path), text)
+    assert [key[0] for key in loader.frames] == [str(p) for p, _ in paths[1:]]
+    path, text = paths[1]
+    path.unlink() # a cached file isn't read again
+    assert loader.lyrics(str(path), text) == "la la la"
+    assert list(loader.frames)[-1][0] == str(path)
+
+def test_store_keeps_offsets_per_track():
+    store = TrackStore()
+    store.extend([("/m/a.mp3", (1, 2), 1, {'title': "A", 'frames': "APIC3:10+20"}), ("/m/b.mp3", (1, 2), 2, {'title': "B"})])
+    assert 'frames' not in store.categories # nothing to share, and interned strings would never be freed
+    assert store.record(0)['frames'] == "APIC3:10+20" and 'frames' not in store.record(1)
+    assert store.value(1, 'frames') is None and store.frame()['frames'].tolist() == ["APIC3:10+20", None]
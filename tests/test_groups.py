@@ -0,0 +1,27 @@
+from data_groups import Groups
+
+def filled() -> Groups:
+    groups = Groups()
+    groups.add(1, ["Björk"], {'album': "Debut", 'albumartist': "Björk", 'tracknumber': 2, 'title': "Human"})
+    groups.add(2, ["bjork", "Bjork!"], {'album': "debut", 'albumartist': "BJORK", 'tracknumber': "1/11", 'title': "Army"})
+    groups.add(3, ["Björk", "Thom Yorke"], {'album': "Selmasongs", 'albumartist': "Björk", 'discnumber': 2})
+    groups.add(4, ["Thom Yorke"], {'title': "No album"})
+    return groups
+
+def test_tracks_are_filed_by_artist_and_album():
+    groups = filled()
+    assert len(groups) == 4 and [str(a) for a in sorted(groups.artists.values())] == ["Björk", "Thom Yorke"]
+    assert list(groups.artist("BJÖRK").tracks) == [1, 2, 3] and len(groups.artist("thom yorke")) == 2
+    assert [str(album) for album in groups.albums("bjork")] == ["Debut", "Selmasongs"]
+    assert groups.album("Björk", "DEBUT").ids == [2, 1] # in track number order, "1/11" is track 1
+    assert groups.album("Björk", "Selmasongs").ids == [3] and groups.album("Thom Yorke", "No album") is None
+
+def test_removing_and_refiling_tracks():
+    groups = filled()
+    groups.add(2, ["Björk"], {'album': "Post", 'albumartist': "Björk", 'title': "Army"}) # retagged
+    assert groups.album("Björk", "Debut").ids == [1] and groups.album("Björk", "Post").ids == [2]
+    for id in (1, 3, 4): groups.remove(id)
+    groups.remove(99) # not there
+    assert list(groups.artists) == ["bjork"] and [str(a) for a in groups.albums("Björk")] == ["Post"]
+    groups.remove(2)
+    assert len(groups) == 0 and not groups.artists and not groups.albumartists and not groups.names
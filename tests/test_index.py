@@ -0,0 +1,92 @@
+import os
+from types import SimpleNamespace
+from mutagen.id3 import TIT2, TPE1
+import pytest
+from data_edit import write_tags
+from data_easy import Library
+from data_index import LibraryIndex
+
+def track(path: str, title: str, id:int = 100000):
+    return SimpleNamespace(path=path, stat=(10, 20), id=str(id), to_record=lambda: {'title': title})
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibraryIndex(str(tmp_path/"library.db"))
+    yield index
+    index.close()
+
+def test_update_load_remove(index):
+    index.update([track("/m/a.mp3", "A"), track("/m/b.mp3", "B", 100001)])
+    assert index.load() == {"/m/a.mp3": (10, 20, "100000", {'title': "A"}), "/m/b.mp3": (10, 20, "100001", {'title': "B"})}
+    index.update([track("/m/a.mp3", "Again")])
+    index.remove(["/m/b.mp3"])
+    assert index.load() == {"/m/a.mp3": (10, 20, "100000", {'title': "Again"})}
+
+def test_only_writes_move_the_generation(index):
+    start = index.generation
+    index.update([])
+    index.remove([])
+    assert index.generation == start
+    index.update([track("/m/a.mp3", "A")])
+    index.remove(["/m/a.mp3"])
+    assert index.generation == start + 2
+
+def test_snapshot_is_dropped_once_the_index_changes(index):
+    index.update([track("/m/a.mp3", "A")])
+    index.save_snapshot({'rows': [1, 2, 3]})
+    assert index.load_snapshot() == {'rows': [1, 2, 3]}
+    index.remove(["/m/a.mp3"])
+    assert index.load_snapshot() is None
+
+def test_unreadable_snapshot(index):
+    assert index.load_snapshot() is None
+    with open(index.snapshot, 'wb') as f: f.write(b'\x80\x04not a pickle')
+    with pytest.warns(Warning, match="snapshot"): assert index.load_snapshot() is None
+
+def library(music, make_mp3, n:int = 4) -> Library:
+    for i in range(n): make_mp3([TIT2(encoding=3, text=f"Song {i}"), TPE1(encoding=3, text="Artist")], f"music/{i}.mp3")
+    return Library()
+
+def records(lib: Library) -> dict[str, tuple]:
+    return {lib.store.path(row): (lib.store.value(row, 'id'), lib.store.record(row)) for row in range(len(lib.store))}
+
+def test_warm_start_restores_the_snapshot(music, make_mp3, monkeypatch):
+    cold = library(music, make_mp3)
+    cold.save()
+    monkeypatch.setattr(LibraryIndex, 'load', lambda self: pytest.fail("read the index"))
+    warm = Library(scan=False)
+    assert records(warm) == records(cold) and len(warm.tracks_df) == 4
+    assert warm.search.query("song 2").tolist() == [warm.store.row(str(music/"2.mp3"))]
+    assert warm.groups.artist("artist") is not None and len(warm.sorts) == 4
+
+def test_warm_start_without_a_snapshot_reads_the_index(music, make_mp3):
+    cold = library(music, make_mp3)
+    cold.save()
+    cold.index.update(cold.tracks[:1]) # written after the snapshot
+    warm = Library(scan=False)
+    assert records(warm) == records(cold) and warm.search.query("song").tolist() == [0, 1, 2, 3]
+
+def test_scan_yields_only_what_changed(music, make_mp3):
+    library(music, make_mp3).save()
+    lib = Library(scan=False)
+    id = lib.store.value(lib.store.row(str(music/"1.mp3")), 'id')
+    os.remove(music/"0.mp3")
+    write_tags(music/"1.mp3", {'title': "Retagged"})
+    make_mp3([TIT2(encoding=3, text="New")], "music/new.mp3")
+    batches = list(lib.scan())
+    kind, removed = batches[0]
+    assert kind == 'remove' and sorted(removed) == [str(music/"0.mp3"), str(music/"1.mp3")]
+    assert sorted(path for kind, tracks in batches[1:] for path, *_ in tracks) == [str(music/"1.mp3"), str(music/"new.mp3")]
+    for batch in batches: lib.apply_scan(batch)
+    lib.finish_scan()
+    assert sorted(lib.store.value(row, 'title') for row in range(len(lib.store))) == ["New", "Retagged", "Song 2", "Song 3"]
+    assert lib.store.value(lib.store.row(str(music/"1.mp3")), 'id') == id # read again, but the same track
+    assert str(music/"0.mp3") not in lib.index.load() and list(Library(scan=False).scan()) == []
+
+def test_scan_reports_its_own_progress(music, make_mp3):
+    for i in range(3): make_mp3([TIT2(encoding=3, text=f"Song {i}")], f"music/{i}.mp3")
+    lib, calls = Library(scan=False), list()
+    for batch in lib.scan(progress=lambda done, total: calls.append((done, total))): lib.apply_scan(batch)
+    lib.finish_scan()
+    assert calls == [(1, 3), (2, 3), (3, 3)]
+    assert len(lib.tracks_df) == 3
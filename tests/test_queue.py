@@ -0,0 +1,42 @@
+from play_queue import PlayQueue
+
+def shuffled(n:int = 50, start:int = 7, seed:int = 0) -> PlayQueue:
+    queue = PlayQueue()
+    queue.random.seed(seed)
+    queue.set_shuffle(True)
+    queue.play(range(100, 100 + n), start)
+    return queue
+
+def test_shuffle_plays_every_track_once_a_round():
+    queue = shuffled()
+    played = [queue.current] + [queue.next() for _ in range(49)]
+    assert sorted(played) == list(range(100, 150))
+    second = [queue.next() for _ in range(50)]
+    assert sorted(second) == list(range(100, 150)) and second != played[1:] + [played[0]]
+
+def test_peek_is_what_plays_next():
+    queue = shuffled()
+    for _ in range(60):
+        coming = queue.peek()
+        assert queue.next() == coming
+
+def test_queued_tracks_come_first_and_prev_goes_back():
+    queue = PlayQueue()
+    queue.play([1, 2, 3], 0)
+    queue.enqueue(9)
+    queue.play_next(8)
+    assert [queue.next(), queue.next(), queue.next()] == [8, 9, 2]
+    assert queue.prev() == 9 and queue.next() == 2 and queue.next() == 3 and queue.next() == 1
+
+def test_shuffle_survives_a_save(tmp_path):
+    queue = shuffled(seed=3)
+    played = {queue.current, queue.next(), queue.next()}
+    queue.peek()
+    queue.save(path := str(tmp_path/"session.json"))
+    restored = PlayQueue.load(path)
+    rest = [restored.next() for _ in range(47)]
+    assert sorted(played | set(rest)) == list(range(100, 150)) and len(set(rest)) == 47
+
+def test_unreadable_session_starts_empty(tmp_path):
+    (path := tmp_path/"session.json").write_text("{not json")
+    assert len(PlayQueue.load(str(path))) == 0 and PlayQueue.load(str(tmp_path/"none.json")).current is None
@@ -0,0 +1,22 @@
+import os
+import metrics
+from data_scan import Discovery
+
+def test_finds_music_in_every_root(tmp_path):
+    for name in ("a/1.mp3", "a/deep/er/2.MP3", "a/notes.txt", "b/3.wav", "b/4.flac"):
+        (path := tmp_path/name).parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * len(name))
+    os.symlink(tmp_path/"a", tmp_path/"a/deep/loop") # followed once, not forever
+    metrics.reset()
+    discovery = Discovery([tmp_path/"a", tmp_path/"b", tmp_path/"b"], [".mp3", ".WAV"])
+    found = dict(discovery)
+    assert sorted(str(path.relative_to(tmp_path)) for path in found) == ["a/1.mp3", "a/deep/er/2.MP3", "b/3.wav"]
+    assert found[tmp_path/"b/3.wav"] == (7, os.stat(tmp_path/"b/3.wav").st_mtime_ns)
+    assert {root: count for root, (count, _) in discovery.stats.items()} == {tmp_path/"a": 2, tmp_path/"b": 1}
+    snapshot = metrics.snapshot()
+    assert snapshot['counters'][f"scan.root.files:{tmp_path/'a'}"] == 2
+    assert snapshot['timers'][f"scan.root:{tmp_path/'b'}"]['count'] == 1
+
+def test_missing_root(tmp_path):
+    discovery = Discovery([tmp_path/"gone"], [".mp3"])
+    assert list(discovery) == [] and discovery.stats[tmp_path/"gone"][0] == 0
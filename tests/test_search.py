@@ -0,0 +1,31 @@
+import random
+from data_search import SearchIndex, tokenize
+
+WORDS = ("night", "nightfall", "blue", "river", "Björk", "café", "cafeteria", "north", "AC/DC", "neon", "né")
+
+def texts(rng: random.Random) -> tuple:
+    return tuple(' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 3))) or None for _ in SearchIndex.FIELDS)
+
+def brute(rows: list[tuple], query: str) -> list[int]:
+    words = tokenize(query)
+    return [row for row, fields in enumerate(rows)
+            if all(any(token.startswith(w) for f in fields for token in tokenize(f)) for w in words)]
+
+def test_queries_match_brute_force():
+    rng = random.Random(0)
+    index, rows = SearchIndex(cached=4), [texts(rng) for _ in range(500)]
+    for row, fields in enumerate(rows): index.add(row, fields)
+    queries = ["n", "night", "NIGHT blue", "bjo", "cafe", "Café n", "ac dc", "ne", "zzz", "river river", "b n r"]
+    for _ in range(3):
+        for query in queries: assert index.query(query).tolist() == brute(rows, query), query
+        gone = set(rng.sample(range(len(rows)), 50)) # and again once rows are gone and the rest shifted down
+        index.remove({row: rows[row] for row in gone})
+        rows = [fields for row, fields in enumerate(rows) if row not in gone]
+    assert index.query("  ") is None and index.query("!?") is None
+
+def test_rows_added_later_are_found():
+    index = SearchIndex()
+    index.add(0, ("Night", "Blue", None, None))
+    assert index.query("ni").tolist() == [0]
+    index.add(1, ("Nightfall", None, None, None))
+    assert index.query("ni").tolist() == [0, 1] and index.query("nightf").tolist() == [1]
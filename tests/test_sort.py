@@ -0,0 +1,30 @@
+import operator, random
+from data_sort import SortIndex, collate
+
+def test_collation():
+    titles = ["Track 10", "the Beatles", "Zebra", "track 2", "Éclair", None, "  ", "A", "eclipse"]
+    assert sorted(titles, key=collate) == ["A", "the Beatles", "Éclair", "eclipse", "track 2", "Track 10", "Zebra", None, "  "]
+
+def expected(metas: list[dict], column: str) -> list[int]:
+    fields = SortIndex.COLUMNS[column]
+    keys = [operator.itemgetter(*fields)(SortIndex.collated(meta)) for meta in metas]
+    return sorted(range(len(metas)), key=lambda row: (keys[row], row)) # ties stay in the order tracks came
+
+def test_merged_batches_sort_like_sorting_from_scratch():
+    rng = random.Random(0)
+    names = ["The Band", "band", "Abba", "Zappa", "Björk", None]
+    metas = [{'title': f"Song {rng.randint(1, 30)}", 'artist': rng.choice(names), 'albumartist': rng.choice(names),
+              'album': rng.choice(["Live", "Greatest Hits", None]), 'tracknumber': rng.choice([0, 1, 2, 12])}
+             for _ in range(300)]
+    sorts = SortIndex()
+    for start, stop in ((0, 120), (120, 121), (121, 251), (251, 300)): # merged in batches, like a scan's
+        for row in range(start, stop): sorts.add(row, metas[row])
+        sorts.merge()
+    assert len(sorts) == 300
+    for column in SortIndex.COLUMNS:
+        assert sorts.order(column).tolist() == expected(metas, column), column
+        assert sorts.order(column, descending=True).tolist() == expected(metas, column)[::-1]
+    gone = set(rng.sample(range(300), 40))
+    sorts.remove(gone)
+    metas = [meta for row, meta in enumerate(metas) if row not in gone]
+    for column in SortIndex.COLUMNS: assert sorts.order(column).tolist() == expected(metas, column), column
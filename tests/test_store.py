@@ -0,0 +1,37 @@
+from data_store import TrackStore
+
+def tracks(n: int, start:int = 0) -> list[tuple]:
+    return [(f"/m/{i % 2}/{i}.mp3", (i, i*10), i, {'title': f"T{i}", 'artist': f"A{i}", 'tracknumber': i, 'genre': "Rock"})
+            for i in range(start, start + n)]
+
+def test_extend_grows_and_finds_tracks():
+    store = TrackStore(capacity=4)
+    assert store.extend(tracks(10)) == range(10)
+    assert store.row("/m/1/7.mp3") == 7 and store.find(7) == 7 and "/m/1/8.mp3" not in store
+    assert store.record(7) == {'title': "T7", 'tracknumber': 7, 'artist': "A7", 'genre': "Rock"}
+    assert store.stat(7) == (7, 70) and store.path(7) == "/m/1/7.mp3"
+
+def test_removing_rows():
+    store = TrackStore(capacity=4)
+    store.extend(tracks(6))
+    before = store.frame()
+    store.remove([0, 3])
+    assert [store.value(row, 'id') for row in range(len(store))] == [1, 2, 4, 5]
+    assert store.find(4) == 2 and store.find(3) is None and store.row("/m/1/5.mp3") == 3
+    assert store.paths() == {f"/m/{i % 2}/{i}.mp3": row for row, i in enumerate([1, 2, 4, 5])}
+    assert before['id'].tolist() == list(range(6)) and before['title'].tolist()[3] == "T3" # handed out before
+    assert store.frame()['artist'].tolist() == ["A1", "A2", "A4", "A5"]
+    store.extend(tracks(1, 9))
+    assert store.frame()['title'].tolist() == ["T1", "T2", "T4", "T5", "T9"]
+
+def test_compact_drops_values_no_track_uses():
+    store = TrackStore()
+    store.extend(tracks(4))
+    store.remove([1])
+    store.set(0, 'artist', "A2")
+    store.compact()
+    interned, _ = store.categories['artist']
+    assert sorted(interned.values) == ["A2", "A3"] and interned.lookup == {v: i for i, v in enumerate(interned.values)}
+    assert [store.value(row, 'artist') for row in range(3)] == ["A2", "A2", "A3"]
+    assert store.categories['genre'][0].values == ["Rock"] and store.value(2, 'album') is None
+    assert store.frame()['artist'].tolist() == ["A2", "A2", "A3"]
@@ -0,0 +1,108 @@
+import struct
+import pytest
+from mutagen.id3 import APIC, COMM, GEOB, TALB, TIT2, TPE1, TRCK, USLT
+from conftest import AUDIO, chunk, pcm, raw_frame, raw_tag, riff, text_frame
+from data_tags import read_tags, sniff
+
+def heavy(cover: bytes) -> list:
+    return [APIC(encoding=3, mime='image/jpeg', type=3, desc='', data=cover),
+            USLT(encoding=3, lang='eng', desc='', text="first line\nsecond line"),
+            COMM(encoding=3, lang='eng', desc='', text="a comment"),
+            GEOB(encoding=3, mime='application/octet-stream', filename='blob', desc='', data=bytes(300))]
+
+def light() -> list:
+    return [TIT2(encoding=3, text="Title"), TPE1(encoding=3, text="Artist"), TALB(encoding=3, text="Album"),
+            TRCK(encoding=3, text="3/12")]
+
+def test_sniff():
+    assert sniff(b'ID3\x04\x00\x00\x00\x00\x00\x00\x00\x00') == "id3"
+    assert sniff(b'\x00\x00\x00\x20ftypM4A ') == "mp4"
+    assert sniff(b'RIFF\x00\x00\x00\x00WAVE') == "wav"
+    assert sniff(bytes(12)) == "id3"
+
+@pytest.mark.parametrize('version', [3, 4])
+def test_heavy_frames_are_skipped_and_located(make_mp3, cover, version):
+    path = make_mp3(light() + heavy(cover), version=version)
+    fields, art, frames = read_tags(path)
+    assert fields == {'title': ["Title"], 'artist': ["Artist"], 'album': ["Album"], 'tracknumber': ["3"]}
+    assert art == [] # the cover is left in the file
+    assert sorted(kind for kind, *_ in frames) == ['APIC', 'COMM', 'GEOB', 'USLT']
+    data = path.read_bytes()
+    for kind, frame_version, offset, length in frames:
+        assert frame_version == version
+        assert data[offset:offset+4] == kind.encode()
+        size = data[offset+4:offset+8]
+        body = (size[0] << 21 | size[1] << 14 | size[2] << 7 | size[3]) if version == 4 else int.from_bytes(size, 'big')
+        assert length == 10 + body
+    assert data.endswith(AUDIO)
+
+@pytest.mark.parametrize('version', [3, 4])
+def test_sizes_past_127_bytes(tmp_path, version):
+    # 200 reads differently as a synchsafe and as a plain integer, so the wrong one derails the walk
+    title, album = "t"*199, "a"*400
+    path = tmp_path/"long.mp3"
+    path.write_bytes(raw_tag([text_frame('TIT2', title, version), raw_frame('APIC', bytes(200), version),
+                              text_frame('TALB', album, version)], version, padding=64) + AUDIO)
+    fields, _, frames = read_tags(path)
+    assert fields['title'] == [title] and fields['album'] == [album]
+    assert [(kind, length) for kind, _, _, length in frames] == [('APIC', 210)]
+
+def test_extended_header_v4(tmp_path):
+    extended = b'\x00\x00\x00\x06\x01\x00' # synchsafe size counting itself, one flag byte, no flags set
+    tag = raw_tag([text_frame('TIT2', "Extended"), raw_frame('USLT', b'\x00eng\x00words')], flags=0x40, extended=extended)
+    (path := tmp_path/"ext4.mp3").write_bytes(tag + AUDIO)
+    fields, _, frames = read_tags(path)
+    assert fields['title'] == ["Extended"]
+    assert frames == [('USLT', 4, 10 + len(extended) + 10 + 9, 10 + 10)]
+
+def test_extended_header_v3(tmp_path):
+    extended = b'\x00\x00\x00\x06' + b'\x00\x00' + b'\x00\x00\x00\x00' # size not counting itself, flags, padding size
+    tag = raw_tag([text_frame('TIT2', "Extended", 3), raw_frame('COMM', b'\x00eng\x00note', 3)], version=3, flags=0x40,
+                  extended=extended)
+    (path := tmp_path/"ext3.mp3").write_bytes(tag + AUDIO)
+    fields, _, frames = read_tags(path)
+    assert fields['title'] == ["Extended"]
+    assert frames == [('COMM', 3, 10 + len(extended) + 10 + 9, 10 + 9)]
+
+def test_unsynchronised_tag_is_read_whole(tmp_path, cover):
+    tag = raw_tag([text_frame('TIT2', "Unsync"), raw_frame('APIC', b'\x00image/jpeg\x00\x03\x00' + b'jpeg')], flags=0x80)
+    (path := tmp_path/"unsync.mp3").write_bytes(tag + AUDIO)
+    fields, art, frames = read_tags(path)
+    assert fields['title'] == ["Unsync"]
+    assert art == [('image/jpeg', b'jpeg')] and frames == []
+
+def test_id3v1_fills_in_missing_fields(make_mp3):
+    path = make_mp3([TIT2(encoding=3, text="From v2")])
+    v1 = b'TAG' + b'v1 title'.ljust(30, b'\0') + b'v1 artist'.ljust(30, b'\0') + b'v1 album'.ljust(30, b'\0') + b'1999'
+    path.write_bytes(path.read_bytes() + v1 + bytes(30) + b'\x00')
+    fields, _, _ = read_tags(path)
+    assert fields['title'] == ["From v2"] # v2 wins
+    assert fields['artist'] == ["v1 artist"] and fields['album'] == ["v1 album"]
+
+def test_bare_mpeg_without_tags(tmp_path):
+    (path := tmp_path/"bare.mp3").write_bytes(AUDIO)
+    assert read_tags(path) == (dict(), list(), list())
+
+def test_wav_id3_chunk(make_wav, cover):
+    path = make_wav(light() + heavy(cover)[:2])
+    fields, art, frames = read_tags(path)
+    assert fields['title'] == ["Title"] and fields['tracknumber'] == ["3"]
+    data = path.read_bytes()
+    assert {kind for kind, *_ in frames} == {'APIC', 'USLT'}
+    assert all(data[offset:offset+4] == kind.encode() for kind, _, offset, _ in frames)
+
+def test_riff_chunks_are_word_aligned(tmp_path):
+    # odd sized chunks are followed by a pad byte that isn't counted in their size
+    info = b'INFO' + chunk(b'INAM', b'Info title\0') + chunk(b'IART', b'Info artist\0')
+    tag = raw_tag([text_frame('TALB', "Id3 album"), raw_frame('USLT', b'\x00eng\x00la')])
+    data = riff(chunk(b'fmt ', struct.pack('<HHIIHH', 1, 1, 8000, 8000, 1, 8)), chunk(b'data', bytes(801)),
+                chunk(b'junk', b'odd'), chunk(b'LIST', info), chunk(b'id3 ', tag))
+    (path := tmp_path/"aligned.wav").write_bytes(data)
+    fields, _, frames = read_tags(path)
+    assert fields == {'title': ["Info title"], 'artist': ["Info artist"], 'album': ["Id3 album"]}
+    [(kind, _, offset, length)] = frames
+    assert data[offset:offset+length] == raw_frame('USLT', b'\x00eng\x00la')
+
+def test_wav_without_tags(tmp_path):
+    pcm(path := tmp_path/"plain.wav")
+    assert read_tags(path) == (dict(), list(), list())
@@ -0,0 +1,76 @@
+import itertools, os, time
+import pytest
+from data_watch import InotifyWatch, PollingWatch, Watcher, load_libc
+
+def collect(watcher: Watcher, n: int, timeout:float = 5) -> list[tuple]:
+    """Events from the watcher threads until there are n of them"""
+    events, deadline = list(), time.monotonic() + timeout
+    while len(events) < n and time.monotonic() < deadline:
+        events += watcher.drain()
+        time.sleep(0.01)
+    return events
+
+@pytest.fixture
+def root(tmp_path):
+    (root := tmp_path/"music").mkdir()
+    (root/"album").mkdir()
+    (root/"album/a.mp3").write_bytes(b"a")
+    return root
+
+@pytest.fixture
+def inotify(root):
+    if load_libc() is None: pytest.skip("no inotify here")
+    watcher = Watcher([root], [".mp3"], interval=0.01) # polls quickly once it has fallen back
+    watcher.start()
+    while root not in watcher.watches: time.sleep(0.01)
+    yield watcher
+    watcher.stop()
+
+def test_inotify_events(inotify, root):
+    a, b = str(root/"album/a.mp3"), str(root/"album/b.mp3")
+    (root/"album/notes.txt").write_text("not music")
+    (root/"album/b.mp3").write_bytes(b"b")
+    assert collect(inotify, 1) == [('modify', b)]
+    os.rename(a, c := str(root/"c.mp3"))
+    os.remove(b)
+    assert collect(inotify, 2) == [('rename', a, c), ('remove', b)]
+    os.rename(root/"album", root/"moved")
+    assert collect(inotify, 1) == [('rename', str(root/"album"), str(root/"moved"))]
+    (root/"new").mkdir()
+    (root/"new/d.mp3").write_bytes(b"d") # watched as soon as the directory is
+    assert collect(inotify, 1) == [('modify', str(root/"new/d.mp3"))]
+    os.rename(c, root.parent/"c.mp3")
+    assert collect(inotify, 1) == [('remove', c)]
+
+def test_inotify_falls_back_to_polling_when_a_directory_cant_be_watched(inotify, root, monkeypatch):
+    def full(self, top): raise OSError(28, "no space left on device")
+    monkeypatch.setattr(InotifyWatch, 'add_tree', full)
+    (root/"new").mkdir()
+    assert collect(inotify, 1) == [('rescan', root)]
+    assert isinstance(inotify.watches[root], PollingWatch)
+    (root/"new/d.mp3").write_bytes(b"d")
+    os.utime(root/"new", ns=(0, 0)) # the mtime of a directory made in the same tick may not move
+    assert collect(inotify, 1) == [('modify', str(root/"new/d.mp3"))]
+
+def test_polling_events(root):
+    watcher = Watcher([root], [".mp3"], polling=True)
+    watch = PollingWatch(watcher, root, batch=1)
+    a, b = str(root/"album/a.mp3"), str(root/"album/b.mp3")
+    ticks = itertools.count(1)
+    def poll(*touched) -> list[tuple]:
+        for path in touched: os.utime(path, ns=(0, next(ticks))) # mtimes may not move within one tick
+        watch.poll()
+        return watcher.drain()
+    assert poll() == []
+    (root/"album/b.mp3").write_bytes(b"b")
+    (root/"album/notes.txt").write_text("not music")
+    assert poll(root/"album") == [('modify', b)]
+    (root/"album/a.mp3").write_bytes(b"edited")
+    assert ('modify', a) in poll() + poll() # edits are found by the rotating slice, one file a pass here
+    os.remove(b)
+    (root/"new").mkdir()
+    (root/"new/d.mp3").write_bytes(b"d")
+    assert sorted(poll(root/"album", root)) == [('modify', str(root/"new/d.mp3")), ('remove', b)]
+    (root/"new/d.mp3").unlink()
+    (root/"new").rmdir()
+    assert poll() == [('remove', str(root/"new"))]
@@ -0,0 +1,30 @@
+import threading
+from data_workers import WorkerPool
+
+def test_results_exceptions_and_progress():
+    calls = list()
+    results = dict(WorkerPool(2).map(lambda x: 10 // x, [(i,) for i in range(5)], progress=lambda *p: calls.append(p)))
+    assert isinstance(results.pop((0,)), ZeroDivisionError) and results == {(1,): 10, (2,): 5, (3,): 3, (4,): 2}
+    assert calls == [(i, 5) for i in range(1, 6)]
+
+def test_only_a_window_of_jobs_is_in_flight():
+    release, started = threading.Event(), list()
+    def job(i):
+        started.append(i)
+        release.wait(5)
+    results = WorkerPool(2).map(job, [(i,) for i in range(100)], window=3)
+    threading.Timer(0.2, release.set).start()
+    next(results)
+    assert len(started) <= 2*3 + 1
+    assert len(list(results)) == 99
+
+def test_cancel_stops_this_and_later_maps():
+    pool = WorkerPool(1)
+    results = pool.map(lambda i: i, [(i,) for i in range(100)], window=1)
+    next(results)
+    pool.cancel()
+    assert len(list(results)) <= 2 # at most what was already submitted
+    assert list(pool.map(lambda i: i, [(1,)])) == []
+
+def test_process_pool():
+    assert dict(WorkerPool(2, "process").map(pow, [(2, i) for i in range(4)])) == {(2, i): 2**i for i in range(4)}
@@ -0,0 +1,147 @@
+"""
+tracklist.py is the track list shown next to the player controls.
+
+Only the rows in view (plus a small buffer) exist as Treeview items. Scrolling rewrites those items from the DataFrame
+instead of inserting every track, so filling or refilling the list takes the same time at 100 or 100k tracks
+"""
+from tkinter import ttk
+import tkinter as tk
+import numpy as np
+import pandas as pd
+import metrics
+
+class TrackList:
+    # (column, heading, anchor, width, SortIndex column it sorts by)
+    COLUMNS = (("#0", "Title", "w", 300, 'title'), (1, "Artist", "w", 150, 'artist'), (2, "Album", "w", 150, 'album'),
+               (3, "#", "center", 40, 'tracknumber'))
+    def __init__(self, frame: ttk.Frame, buffer:int = 2, on_sort=None):
+        self.on_sort = on_sort # called as on_sort(column, descending) when a heading is clicked
+        self.sorted = ('album', False) # (column, descending)
+        self.df: pd.DataFrame = None
+        self.order = None # display position -> DataFrame row, None shows the rows in order
+        self.top = 0 # display position of the first materialized row
+        self.visible = 10
+        self.buffer = buffer
+        self.selected: int|None = None # display position
+        self.rowheight = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        self.header = 0
+
+        self.scrollbar = ttk.Scrollbar(frame, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.treeview = ttk.Treeview(frame, selectmode="browse", columns=(1,2,3), height=self.visible)
+        self.treeview.pack(expand=True, fill=tk.BOTH)
+        for col, text, anchor, width, key in self.COLUMNS:
+            self.treeview.column(col, anchor=anchor, width=width)
+            self.treeview.heading(col, text=text, anchor=anchor, command=lambda key=key: self.sort_by(key))
+
+        self.treeview.bind('<Configure>', self.on_resize)
+        self.treeview.bind('<<TreeviewSelect>>', self.on_select)
+        self.treeview.bind('<MouseWheel>', lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.treeview.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.treeview.bind('<Button-5>', lambda e: self.scroll(3))
+        self.treeview.bind('<Up>', lambda e: self.move(-1))
+        self.treeview.bind('<Down>', lambda e: self.move(1))
+        self.treeview.bind('<Prior>', lambda e: self.move(-self.visible))
+        self.treeview.bind('<Next>', lambda e: self.move(self.visible))
+        self.treeview.bind('<Home>', lambda e: self.select(0))
+        self.treeview.bind('<End>', lambda e: self.select(len(self)-1))
+
+    def __len__(self):
+        if self.df is None: return 0
+        return len(self.order) if self.order is not None else len(self.df)
+
+    def bind(self, sequence: str, func) -> None:
+        self.treeview.bind(sequence, func, add='+')
+
+    def sort_by(self, column: str) -> None:
+        """Sorts by a column, or the other way round if it's already sorted by it"""
+        self.sorted = (column, self.sorted == (column, False))
+        for col, text, _, _, key in self.COLUMNS:
+            arrow = (" ▼" if self.sorted[1] else " ▲") if key == column else ""
+            self.treeview.heading(col, text=text + arrow)
+        if self.on_sort: self.on_sort(*self.sorted)
+
+    @metrics.timed('list.fill')
+    def set_data(self, df: pd.DataFrame, order=None) -> None:
+        self.df, self.order = df, order
+        self.top = max(0, min(self.top, len(self)-self.visible))
+        self.selected = None if self.selected is None or self.selected >= len(self) else self.selected
+        self.render()
+
+    def row(self, pos: int|None) -> int|None:
+        """DataFrame row shown at a display position"""
+        if pos is None or not 0 <= pos < len(self): return None
+        return int(self.order[pos]) if self.order is not None else pos
+
+    def rows(self) -> np.ndarray:
+        """DataFrame rows in display order"""
+        return self.order if self.order is not None else np.arange(len(self))
+
+    def position_at(self, y: int) -> int|None:
+        iid = self.treeview.identify_row(y)
+        return self.top + int(iid) if iid else None
+
+    def row_at(self, y: int) -> int|None:
+        return self.row(self.position_at(y))
+
+    def selected_row(self) -> int|None:
+        return self.row(self.selected)
+
+    def values(self, row: int) -> tuple[str, list]:
+        item = self.df.iloc[row]
+        album = 'Single' if pd.isna(item.album) else item.album
+        tracknumber = item.tracknumber if item.tracknumber > 0 else ''
+        return item.title, [item.artist, album, tracknumber]
+
+    @metrics.timed('list.render')
+    def render(self) -> None:
+        count = max(0, min(self.visible + self.buffer, len(self) - self.top))
+        items = self.treeview.get_children()
+        for i in range(len(items), count): self.treeview.insert('', index="end", iid=str(i))
+        if items[count:]: self.treeview.delete(*items[count:])
+        for i in range(count):
+            text, values = self.values(self.row(self.top + i))
+            self.treeview.item(str(i), text=text, values=values)
+        self.treeview.yview_moveto(0)
+        if self.selected is not None and self.top <= self.selected < self.top + count:
+            self.treeview.selection_set(iid := str(self.selected - self.top))
+            self.treeview.focus(iid)
+        elif self.treeview.selection(): self.treeview.selection_remove(*self.treeview.selection())
+        total = max(len(self), 1)
+        self.scrollbar.set(self.top/total, min(1, (self.top + self.visible)/total))
+
+    def scroll(self, rows: int) -> str:
+        top = max(0, min(self.top + rows, len(self) - self.visible))
+        if top != self.top:
+            self.top = top
+            self.render()
+        return "break"
+
+    def yview(self, *args) -> None:
+        match args:
+            case ("moveto", fraction): self.scroll(int(float(fraction)*len(self)) - self.top)
+            case ("scroll", n, "pages"): self.scroll(int(n)*self.visible)
+            case ("scroll", n, _): self.scroll(int(n))
+
+    def select(self, pos: int) -> str:
+        """Selects a display position and scrolls it into view"""
+        if not len(self): return "break"
+        self.selected = max(0, min(pos, len(self)-1))
+        if self.selected < self.top: self.top = self.selected
+        elif self.selected >= self.top + self.visible: self.top = self.selected - self.visible + 1
+        self.render()
+        return "break"
+
+    def move(self, step: int) -> str:
+        return self.select((self.selected if self.selected is not None else self.top - step) + step)
+
+    def on_select(self, e) -> None:
+        if selection := self.treeview.selection(): self.selected = self.top + int(selection[0])
+
+    def on_resize(self, e) -> None:
+        if not self.header and (bbox := self.treeview.bbox("0")): self.header = bbox[1]
+        visible = max(1, (e.height - (self.header or self.rowheight)) // self.rowheight)
+        if visible != self.visible:
+            self.visible = visible
+            self.top = max(0, min(self.top, len(self) - self.visible))
+            self.render()